@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gnss_array")
+
+# Entry files of the cache: single arrays (.npy) and groups of named arrays (.npz)
+ENTRY_SUFFIXES = ('.npy', '.npz')
+
+class FileCache:
+    """
+    On-disk cache of arrays derived from input files, with LRU eviction
+
+    Entries are content addressed: keys are built from the content hashes of
+    the input files and the parameters of the computation, so a changed input
+    or parameter never hits a stale entry.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=64, max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # One small file per input path, so parallel workers never rewrite each other's fingerprints
+        self.fingerprint_dir = os.path.join(cache_dir, "fingerprints")
+        os.makedirs(self.fingerprint_dir, exist_ok=True)
+
+    def fingerprint(self, path):
+        """
+        Content hash of an input file
+
+        The hash is recomputed only when the file's size or mtime changed
+        since it was last fingerprinted.
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        index_file = self._fingerprint_file(path)
+
+        known = self._read_json(index_file)
+        if known and known[:3] == [path, stat.st_size, stat.st_mtime_ns]:
+            return known[3]
+
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+
+        self._write_json(index_file, [path, stat.st_size, stat.st_mtime_ns, digest])
+        return digest
+
+    def prune_fingerprints(self):
+        """Remove the fingerprints of input files that no longer exist; returns the number removed"""
+        removed = 0
+        for name in os.listdir(self.fingerprint_dir):
+            if not name.endswith('.json'):
+                continue  # Being written by another process
+            index_file = os.path.join(self.fingerprint_dir, name)
+            known = self._read_json(index_file)
+            if known and os.path.exists(known[0]):
+                continue
+            try:
+                os.remove(index_file)
+                removed += 1
+            except FileNotFoundError:
+                pass  # Pruned by another process
+        return removed
+
+    def whole_file(self, path, size):
+        """
+        True if reading the first size bytes of an input reads all of it (size None: all is read)
+
+        Keys describe whole files. A file being written only grows, so if it
+        still has size bytes after a key was taken, the key describes those bytes.
+        """
+        return size is None or os.path.getsize(path) == size
+
+    def key(self, kind, *paths, **params):
+        """
+        Cache key for data of a given kind derived from input files
+
+        Args:
+            kind: Stage name and version, e.g. 'nav-v1'
+            paths: Input files the data is computed from
+            params: Parameters of the computation (JSON-serializable)
+        """
+        if len(paths) == 1 and not params:
+            return f"{kind}-{os.path.getsize(paths[0])}-{self.fingerprint(paths[0])}"
+
+        inputs = [[os.path.getsize(path), self.fingerprint(path)] for path in paths]
+        digest = hashlib.sha1(json.dumps([inputs, params], sort_keys=True).encode()).hexdigest()
+        return f"{kind}-{digest}"
+
+    def load(self, key):
+        """Load a cached array (memory-mapped), or None on a miss"""
+        entry = self._entry_path(key)
+        try:
+            array = np.load(entry, mmap_mode='r')
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # Mark as recently used
+        os.utime(entry)
+        return array
+
+    def save(self, key, array):
+        """Store an array under key and evict least recently used entries"""
+        entry = self._entry_path(key)
+        tmp_file = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_file, entry)
+        self.evict()
+
+    def load_arrays(self, key):
+        """Load a group of named arrays stored with save_arrays, or None on a miss"""
+        entry = self._entry_path(key, '.npz')
+        try:
+            with np.load(entry) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # Mark as recently used
+        os.utime(entry)
+        return arrays
+
+    def save_arrays(self, key, arrays):
+        """Store a dict of named arrays under key and evict least recently used entries"""
+        entry = self._entry_path(key, '.npz')
+        tmp_file = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_file, entry)
+        self.evict()
+
+    def entries(self):
+        """
+        Cache entries, most recently used first
+
+        Returns:
+            list: (key, bytes, last used as a POSIX timestamp) tuples
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(ENTRY_SUFFIXES):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue  # Evicted by another process
+                entries.append((os.path.splitext(name)[0], stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+        return entries
+
+    def clear(self, prefix=''):
+        """Remove the entries whose key starts with prefix (all by default); returns the number removed"""
+        removed = 0
+        for key, _, _ in self.entries():
+            if key.startswith(prefix):
+                removed += self._remove(key)
+        return removed
+
+    def evict(self):
+        """Remove least recently used entries beyond max_entries / max_bytes, and stale fingerprints"""
+        total_bytes = 0
+        for count, (key, size, _) in enumerate(self.entries(), 1):
+            total_bytes += size
+            if count > self.max_entries or total_bytes > self.max_bytes:
+                self._remove(key)
+        self.prune_fingerprints()
+
+    def _remove(self, key):
+        removed = 0
+        for suffix in ENTRY_SUFFIXES:
+            try:
+                os.remove(self._entry_path(key, suffix))
+                removed += 1
+            except FileNotFoundError:
+                pass  # Already evicted by another process
+        return removed
+
+    def _entry_path(self, key, suffix='.npy'):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def _fingerprint_file(self, path):
+        return os.path.join(self.fingerprint_dir, hashlib.sha1(path.encode()).hexdigest() + '.json')
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path, value):
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp_file, path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and clear the cache of parsed inputs and pipeline stages")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="list entries, most recently used first")
+    clear = commands.add_parser('clear', help="remove entries")
+    clear.add_argument('prefix', nargs='?', default='', help="only keys starting with this, e.g. 'nmea' (default: all)")
+    evict = commands.add_parser('evict', help="remove least recently used entries beyond the limits")
+    evict.add_argument('--max-entries', type=int, default=64)
+    evict.add_argument('--max-bytes', type=int, default=1 << 30)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        cache = FileCache(args.cache_dir)
+        entries = cache.entries()
+        for key, size, last_used in entries:
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_used))} {size:>12}  {key}")
+        print(f"{len(entries)} entries, {sum(size for _, size, _ in entries)} bytes in {args.cache_dir}")
+    elif args.command == 'clear':
+        print(f"Removed {FileCache(args.cache_dir).clear(args.prefix)} entries")
+    else:
+        FileCache(args.cache_dir, args.max_entries, args.max_bytes).evict()
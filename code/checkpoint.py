@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+
+# Bump when the checkpoint contents change to ignore older checkpoints
+CHECKPOINT_VERSION = 3
+
+def prefix_fingerprint(path, size=None):
+    """
+    Size and content hash of the first `size` bytes of a file
+
+    Args:
+        path: Input file
+        size: Number of bytes to hash, None for the whole file
+
+    Returns:
+        dict: {'size': bytes hashed, 'sha1': hex digest}
+    """
+    return PrefixHasher(path).fingerprint(size)
+
+class PrefixHasher:
+    """
+    prefix_fingerprint of a growing file, keeping the hash state between calls
+
+    A prefix at least as long as the last one hashed only reads the bytes
+    added since; a shorter one is hashed again from the start.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.size = 0  # Bytes hashed into sha1
+        self.sha1 = hashlib.sha1()
+
+    def fingerprint(self, size=None):
+        """See prefix_fingerprint"""
+        if size is None:
+            size = os.path.getsize(self.path)
+        if size < self.size:
+            self.size, self.sha1 = 0, hashlib.sha1()
+
+        remaining = size - self.size
+        with open(self.path, 'rb') as f:
+            f.seek(self.size)
+            while remaining > 0:
+                chunk = f.read(min(1 << 20, remaining))
+                if not chunk:
+                    break
+                self.sha1.update(chunk)
+                remaining -= len(chunk)
+        self.size = size - remaining
+        # hexdigest leaves the running hash open for more bytes
+        return {'size': self.size, 'sha1': self.sha1.hexdigest()}
+
+class Checkpoint:
+    """
+    Progress of an output file, saved next to it as <output>.checkpoint.json
+
+    Records the input file fingerprints, the settings the output was written
+    with and how many input epochs and output rows are completely written.
+    Inputs that are still growing (NMEA, RINEX observations of a running
+    receiver) only have to start with the fingerprinted bytes; the other
+    inputs have to be unchanged.
+    """
+    def __init__(self, output_file):
+        self.path = os.path.splitext(output_file)[0] + '.checkpoint.json'
+        self.state = None  # Format: {'version', 'inputs', 'settings', 'epochs', 'last_time', 'rows', 'restart', 'complete'}
+        self.hashers = {}  # Format: {input path: PrefixHasher}, so each run reads an input once
+
+    def load(self):
+        """Read the saved state; returns None (and keeps no state) if there is none"""
+        self.hashers = {}  # Inputs are verified from their first byte again
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = None
+        if state is not None and state.get('version') != CHECKPOINT_VERSION:
+            state = None
+        self.state = state
+        return state
+
+    def start(self, inputs, growing, settings):
+        """
+        Begin a new output from the first epoch
+
+        Args:
+            inputs: {role: path} of the input files
+            growing: Roles of inputs that may have data appended later
+            settings: JSON-serializable settings the output depends on
+        """
+        self.hashers = {}
+        self.state = {
+            'version': CHECKPOINT_VERSION,
+            'inputs': {role: dict(self.fingerprint(path), path=os.path.abspath(path),
+                                  growing=role in growing)
+                       for role, path in inputs.items()},
+            'settings': settings,
+            'epochs': 0,  # Input epochs completely written
+            'last_time': None,  # Time of the last written epoch, seconds since the GPS epoch
+            'rows': {},  # Format: {output table: rows written}
+            'restart': {'epochs': 0, 'rows': {}},  # Where to continue once the inputs have grown
+            'complete': False,  # All epochs of the fingerprinted inputs are written
+        }
+        self.save()
+
+    def resumable(self, inputs, settings):
+        """
+        Check whether the saved output can be continued with these inputs
+
+        Returns:
+            str: Reason the output has to start over, or None if it can be resumed
+        """
+        if self.state is None:
+            return "no checkpoint"
+        if self.state['settings'] != settings:
+            return "settings changed"
+        if set(self.state['inputs']) != set(inputs):
+            return "different inputs"
+
+        for role, path in inputs.items():
+            known = self.state['inputs'][role]
+            if os.path.abspath(path) != known['path']:
+                return f"{role} file changed to {path}"
+            size = os.path.getsize(path)
+            if size < known['size'] or (size != known['size'] and not known['growing']):
+                return f"{role} file {path} changed"
+            if self.fingerprint(path, known['size'])['sha1'] != known['sha1']:
+                return f"{role} file {path} changed"
+        return None
+
+    def up_to_date(self, inputs):
+        """True if the output is complete and no input has grown since (call after resumable)"""
+        return self.state['complete'] and all(os.path.getsize(path) == self.state['inputs'][role]['size']
+                                              for role, path in inputs.items())
+
+    def advance(self, inputs, sizes, epochs, last_time, rows, complete, restart=None):
+        """
+        Record that the outputs are complete up to `epochs` input epochs
+
+        Args:
+            inputs: {role: path} of the input files
+            sizes: {role: size} of the inputs when they were read; growing
+                   inputs are fingerprinted up to this size
+            epochs: Input epochs completely written
+            last_time: Time of the last written epoch
+            rows: {output table: rows written}
+            complete: True if all epochs read from the inputs are written
+            restart: (epochs, rows) to continue from once the inputs have
+                     grown, if earlier than (epochs, rows): the last epochs
+                     written may change as growing inputs are completed and
+                     are then written again
+        """
+        for role, path in inputs.items():
+            if self.state['inputs'][role]['growing']:
+                self.state['inputs'][role].update(self.fingerprint(path, sizes[role]))
+        self.state['epochs'] = epochs
+        self.state['last_time'] = last_time
+        self.state['rows'] = rows
+        restart_epochs, restart_rows = (epochs, rows) if restart is None else restart
+        self.state['restart'] = {'epochs': restart_epochs, 'rows': restart_rows}
+        self.state['complete'] = complete
+        self.save()
+
+    def fingerprint(self, path, size=None):
+        """prefix_fingerprint of an input, continuing from the prefix hashed before"""
+        hasher = self.hashers.get(path)
+        if hasher is None:
+            hasher = self.hashers[path] = PrefixHasher(path)
+        return hasher.fingerprint(size)
+
+    def save(self):
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.state, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.path)
@@ -0,0 +1,240 @@
+import gzip
+import io
+import shutil
+import subprocess
+import threading
+
+# Bytes read from the compressed file at a time
+CHUNK_SIZE = 1 << 20
+
+GZIP_MAGIC = b"\x1f\x8b"
+COMPRESS_MAGIC = b"\x1f\x9d"
+CRINEX_LABEL = b"COMPACT RINEX FORMAT"
+
+COMPRESSION_SUFFIXES = ('.gz', '.Z')
+
+def strip_compression_suffix(path):
+    """File name without a .gz/.Z suffix, e.g. 'brdc3620.24n.gz' -> 'brdc3620.24n'"""
+    for suffix in COMPRESSION_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+def is_plain(path):
+    """True if the file is neither gzip/compress nor Hatanaka compressed"""
+    with open(path, 'rb') as f:
+        head = f.read(80)
+    return not (head.startswith((GZIP_MAGIC, COMPRESS_MAGIC)) or CRINEX_LABEL in head)
+
+def open_binary(path, size=None):
+    """
+    Open a possibly compressed file as a stream of its decompressed bytes
+
+    gzip (.gz), Unix compress (.Z) and Hatanaka compact RINEX (.crx, .24d),
+    including Hatanaka inside gzip/compress, are detected from the content
+    and decompressed in chunks while the stream is read; nothing is written
+    to disk.
+
+    Args:
+        path: Path to the file
+        size: Read only the first size bytes of the file, e.g. of a file still
+              being written; None to read to its end
+
+    Returns:
+        Binary file object
+    """
+    raw = open(path, 'rb')
+    magic = raw.read(2)
+    raw.seek(0)
+    if size is not None:
+        raw = io.BufferedReader(_ChunkReader(_prefix_chunks(raw, size)), CHUNK_SIZE)
+
+    if magic == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=raw)
+    elif magic == COMPRESS_MAGIC:
+        stream = io.BufferedReader(_ChunkReader(_unlzw_chunks(raw)), CHUNK_SIZE)
+    else:
+        stream = io.BufferedReader(raw, CHUNK_SIZE)
+
+    if not isinstance(stream, io.BufferedReader):
+        stream = io.BufferedReader(stream, CHUNK_SIZE)
+    if CRINEX_LABEL in stream.peek(80)[:80]:
+        stream = io.BufferedReader(_ChunkReader(_crx2rnx_chunks(stream)), CHUNK_SIZE)
+    return stream
+
+def open_text(path, size=None):
+    """Open a possibly compressed file for reading text lines, see open_binary"""
+    return io.TextIOWrapper(open_binary(path, size), encoding='latin-1')
+
+class _ChunkReader(io.RawIOBase):
+    """Raw stream over a generator of byte chunks"""
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            self.pending = next(self.chunks, b"")
+            if not self.pending:
+                return 0
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.chunks.close()
+        super().close()
+
+def _prefix_chunks(raw, size):
+    """The first size bytes of a file, in chunks"""
+    try:
+        while size > 0:
+            chunk = raw.read(min(CHUNK_SIZE, size))
+            if not chunk:
+                break
+            size -= len(chunk)
+            yield chunk
+    finally:
+        raw.close()
+
+def _unlzw_chunks(raw):
+    """
+    Decompress a Unix compress (.Z) stream, yielding the output in chunks
+
+    LZW codes start at 9 bits and grow up to the maximum given in the header.
+    Whenever the code size changes or the table is cleared, the rest of the
+    current group of eight codes is skipped, as the original compress does.
+    """
+    try:
+        header = raw.read(3)
+        if len(header) < 3 or header[:2] != COMPRESS_MAGIC:
+            raise ValueError("Not a compress (.Z) file")
+        flags = header[2]
+        max_bits = flags & 0x1f
+        block_mode = flags & 0x80
+        if flags & 0x60 or not 9 <= max_bits <= 16:
+            raise ValueError("Unsupported compress (.Z) header")
+        if max_bits == 9:
+            max_bits = 10  # 9 means 10 in practice
+
+        data = raw.read(CHUNK_SIZE)
+        pos = 0  # Position in data
+        consumed = 0  # Input bytes consumed before data
+        mark = 0  # Input bytes consumed at the start of the current code group
+
+        bits = 9
+        mask = (1 << bits) - 1
+        end = 256 if block_mode else 255  # Last code in the table
+        table = [bytes([i]) for i in range(256)]
+        if block_mode:
+            table.append(b"")  # Clear code
+
+        buf = 0
+        left = 0
+        prev = None
+        out = []
+        out_size = 0
+
+        while True:
+            if prev is not None and end >= mask and bits < max_bits:
+                # Skip to the end of the code group, then widen the codes
+                rem = (consumed + pos - mark) % bits
+                if rem:
+                    pos += bits - rem
+                buf = left = 0
+                bits += 1
+                mask = (1 << bits) - 1
+                mark = consumed + pos
+
+            # Next code, least significant bits first
+            while left < bits:
+                if pos >= len(data):
+                    consumed += len(data)
+                    pos -= len(data)
+                    data = raw.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    continue
+                buf |= data[pos] << left
+                pos += 1
+                left += 8
+            if left < bits:
+                break  # End of input
+            code = buf & mask
+            buf >>= bits
+            left -= bits
+
+            if code == 256 and block_mode:
+                rem = (consumed + pos - mark) % bits
+                if rem:
+                    pos += bits - rem
+                buf = left = 0
+                bits = 9
+                mask = (1 << bits) - 1
+                end = 256
+                del table[257:]
+                mark = consumed + pos
+                prev = None
+                continue
+
+            if code <= end and (prev is not None or code < 256):
+                entry = table[code]
+            elif prev is not None and code == end + 1:
+                entry = table[prev] + table[prev][:1]
+            else:
+                raise ValueError("Invalid compress (.Z) data")
+
+            if prev is not None and end < mask:
+                end += 1
+                table.append(table[prev] + entry[:1])
+            prev = code
+
+            out.append(entry)
+            out_size += len(entry)
+            if out_size >= CHUNK_SIZE:
+                yield b"".join(out)
+                out = []
+                out_size = 0
+
+        if out:
+            yield b"".join(out)
+    finally:
+        raw.close()
+
+def _crx2rnx_chunks(stream):
+    """
+    Convert Hatanaka compact RINEX to RINEX, yielding the output in chunks
+
+    The data is streamed through the CRX2RNX program, which has to be on the PATH.
+    """
+    program = shutil.which('crx2rnx') or shutil.which('CRX2RNX')
+    if program is None:
+        stream.close()
+        raise RuntimeError("Hatanaka-compressed input needs the CRX2RNX program of RNXCMP on the PATH "
+                           "(https://terras.gsi.go.jp/ja/crx2rnx.html; the hatanaka package also installs it)")
+
+    process = subprocess.Popen([program, '-'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def feed():
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                process.stdin.write(chunk)
+        except (BrokenPipeError, ValueError):
+            pass  # Reader stopped early
+        finally:
+            process.stdin.close()
+            stream.close()
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        yield from iter(lambda: process.stdout.read(CHUNK_SIZE), b"")
+    finally:
+        process.stdout.close()
+        if process.wait() not in (0, None) and not feeder.is_alive():
+            print(f"CRX2RNX exited with status {process.returncode}")
@@ -0,0 +1,386 @@
+import os
+import numpy as np
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from compression import open_binary, open_text, strip_compression_suffix
+
+GPS_EPOCH = datetime(1980, 1, 6)
+
+# GPS - UTC (leap seconds), format: [(UTC date from which it applies, seconds)]
+LEAP_SECONDS = [
+    (datetime(1981, 7, 1), 1), (datetime(1982, 7, 1), 2), (datetime(1983, 7, 1), 3),
+    (datetime(1985, 7, 1), 4), (datetime(1988, 1, 1), 5), (datetime(1990, 1, 1), 6),
+    (datetime(1991, 1, 1), 7), (datetime(1992, 7, 1), 8), (datetime(1993, 7, 1), 9),
+    (datetime(1994, 7, 1), 10), (datetime(1996, 1, 1), 11), (datetime(1997, 7, 1), 12),
+    (datetime(1999, 1, 1), 13), (datetime(2006, 1, 1), 14), (datetime(2009, 1, 1), 15),
+    (datetime(2012, 7, 1), 16), (datetime(2015, 7, 1), 17), (datetime(2017, 1, 1), 18),
+]
+GPS_UTC_LEAP_SECONDS = LEAP_SECONDS[-1][1]  # Current GPS - UTC
+
+# GPS time (seconds since the GPS epoch) at which each LEAP_SECONDS entry applies
+_LEAP_GPS_SECONDS = np.array([(date - GPS_EPOCH).total_seconds() + leap for date, leap in LEAP_SECONDS])
+_LEAP_OFFSETS = np.array([0] + [leap for _, leap in LEAP_SECONDS], dtype=np.float64)
+
+# Broadcast orbit parameters in RINEX navigation record order
+EPHEMERIS_FIELDS = (
+    # Line 1: Clock parameters
+    'clock_bias', 'clock_drift', 'clock_drift_rate',
+    # Line 2
+    'IODE', 'Crs', 'delta_n', 'M0',
+    # Line 3
+    'Cuc', 'e', 'Cus', 'sqrt_a',
+    # Line 4
+    'toe', 'Cic', 'OMEGA0', 'Cis',
+    # Line 5
+    'i0', 'Crc', 'omega', 'OMEGA_dot',
+    # Line 6
+    'idot', 'codes', 'week', 'L2P_flag',
+    # Line 7
+    'accuracy', 'health', 'Tgd', 'IODC',
+    # Line 8
+    'transmission_time', 'fit_interval',
+)
+
+# GNSS-SDR gps_ephemeris.xml element names for the EPHEMERIS_FIELDS they map to
+GNSS_SDR_XML_FIELDS = {
+    'af0': 'clock_bias', 'af1': 'clock_drift', 'af2': 'clock_drift_rate',
+    'IODE_SF2': 'IODE', 'Crs': 'Crs', 'delta_n': 'delta_n', 'M_0': 'M0',
+    'Cuc': 'Cuc', 'ecc': 'e', 'Cus': 'Cus', 'sqrtA': 'sqrt_a',
+    'toe': 'toe', 'Cic': 'Cic', 'OMEGA_0': 'OMEGA0', 'Cis': 'Cis',
+    'i_0': 'i0', 'Crc': 'Crc', 'omega': 'omega', 'OMEGAdot': 'OMEGA_dot',
+    'idot': 'idot', 'code_on_L2': 'codes', 'L2_P_data_flag': 'L2P_flag',
+    'SV_accuracy': 'accuracy', 'SV_health': 'health', 'TGD': 'Tgd', 'IODC': 'IODC',
+    'tow': 'transmission_time', 'fit_interval_flag': 'fit_interval',
+}
+
+# Bump when the parsed table layout changes to invalidate cached tables
+NAV_CACHE_VERSION = 1
+
+# One row per ephemeris record: PRN, epoch (seconds since GPS epoch) and parameters
+EPHEMERIS_DTYPE = np.dtype([('prn', 'U3'), ('time', 'f8')] +
+                           [(name, 'f8') for name in EPHEMERIS_FIELDS])
+
+def to_seconds(timestamp):
+    """Convert a naive datetime to seconds since the GPS epoch (no leap seconds)"""
+    return (timestamp - GPS_EPOCH).total_seconds()
+
+def leap_seconds(utc_timestamp):
+    """GPS - UTC in seconds at a naive UTC datetime"""
+    leap = 0
+    for date, seconds in LEAP_SECONDS:
+        if utc_timestamp < date:
+            break
+        leap = seconds
+    return leap
+
+def utc_to_seconds(utc_timestamp):
+    """Convert a naive UTC datetime (e.g. of NMEA) to GPS seconds since the GPS epoch"""
+    return to_seconds(utc_timestamp) + leap_seconds(utc_timestamp)
+
+def seconds_to_utc(seconds):
+    """
+    UTC times, as seconds since the GPS epoch without leap seconds, of GPS times
+
+    Inverse of utc_to_seconds; from_seconds of the result gives the UTC datetime.
+
+    Args:
+        seconds: GPS seconds since the GPS epoch, scalar or array
+
+    Returns:
+        Same shape as seconds
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    return seconds - _LEAP_OFFSETS[np.searchsorted(_LEAP_GPS_SECONDS, seconds, side='right')]
+
+def from_seconds(seconds):
+    """Convert seconds since the GPS epoch back to a naive datetime"""
+    return GPS_EPOCH + timedelta(seconds=float(seconds))
+
+def to_time_of_week(seconds):
+    """
+    GPS seconds of week for times in seconds since the GPS epoch
+
+    This is the time argument of the orbit functions, which take differences
+    to toe, itself given in seconds of week.
+    """
+    return np.asarray(seconds, dtype=np.float64) % 604800
+
+class EphemerisStore:
+    """Broadcast ephemeris parsed once and indexed by PRN for time lookups"""
+    def __init__(self):
+        self.table = np.zeros(0, dtype=EPHEMERIS_DTYPE)  # Sorted by PRN, then time
+        self.index = {}  # Format: {prn: (start, stop)} row range in table
+        self.is_loaded = False
+
+    def load_data(self, broadcast_file, cache=None):
+        """
+        Load all GPS records of an ephemeris file into the store
+
+        Args:
+            broadcast_file: Path to a RINEX navigation file, or a GNSS-SDR
+                            gps_ephemeris.xml (selected by the .xml extension),
+                            optionally .gz or .Z compressed
+            cache: Optional FileCache; the parsed table is reused while the file is unchanged
+        """
+        xml = strip_compression_suffix(broadcast_file).endswith('.xml')
+        parser = parse_gnss_sdr_xml if xml else parse_rinex_nav
+
+        if cache is None:
+            self.set_table(parser(broadcast_file))
+            return
+
+        key = cache.key(f"nav-v{NAV_CACHE_VERSION}", broadcast_file)
+        table = cache.load(key)
+        if table is None or table.dtype != EPHEMERIS_DTYPE:
+            table = parser(broadcast_file)
+            cache.save(key, table)
+        self.set_table(table)
+
+    def set_table(self, table):
+        """Sort an ephemeris table by PRN and time and rebuild the PRN index"""
+        # lexsort is stable, so duplicate epochs keep their file order
+        order = np.lexsort((table['time'], table['prn']))
+        self.table = table[order]
+
+        self.index = {}
+        prns, starts, counts = np.unique(self.table['prn'], return_index=True, return_counts=True)
+        for prn, start, count in zip(prns, starts, counts):
+            self.index[str(prn)] = (int(start), int(start + count))
+
+        self.is_loaded = True
+
+    @property
+    def prns(self):
+        return sorted(self.index.keys())
+
+    def records(self, prn):
+        """Time-sorted ephemeris records for a PRN (a view into the table)"""
+        if prn not in self.index:
+            return self.table[:0]
+        start, stop = self.index[prn]
+        return self.table[start:stop]
+
+    def ephemeris(self, record):
+        """Convert one table record into the dict used by compute_satellite_position"""
+        eph_data = {name: float(record[name]) for name in EPHEMERIS_FIELDS}
+        eph_data['epoch'] = from_seconds(record['time'])
+        return eph_data
+
+    def bracketing(self, prn, target_time):
+        """
+        Find the ephemeris records before and after target time
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            target_time: Target timestamp (datetime object)
+
+        Returns:
+            tuple: (before_epoch, before_eph, after_epoch, after_eph), all None if not found
+        """
+        records = self.records(prn)
+        i = np.searchsorted(records['time'], to_seconds(target_time), side='right') - 1
+
+        if i < 0 or i + 1 >= len(records):
+            return None, None, None, None
+
+        before_eph = self.ephemeris(records[i])
+        after_eph = self.ephemeris(records[i + 1])
+        return before_eph['epoch'], before_eph, after_eph['epoch'], after_eph
+
+    def interpolate(self, prn, times, max_hold=0):
+        """
+        Batch version of bracketing followed by linear parameter interpolation
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            times: Target times in seconds since the GPS epoch
+            max_hold: Outside the first/last record, use that record unchanged
+                      for up to this many seconds (0 disables)
+
+        Returns:
+            tuple: (dict of parameter arrays, valid mask); parameters are NaN
+                   where no record applies
+        """
+        records = self.records(prn)
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        eph_params = {name: np.full(len(times), np.nan) for name in EPHEMERIS_FIELDS}
+        if not len(records):
+            return eph_params, np.zeros(len(times), dtype=bool)
+
+        i = np.searchsorted(records['time'], times, side='right') - 1
+        valid = (i >= 0) & (i + 1 < len(records))
+
+        # Hold the edge records within max_hold of the covered span
+        hold_first = (i < 0) & (records['time'][0] - times < max_hold)
+        hold_last = (i + 1 >= len(records)) & (times - records['time'][-1] < max_hold)
+
+        i = np.clip(i, 0, len(records) - 1)
+        before = records[i]
+        after = records[np.minimum(i + 1, len(records) - 1)]
+        span = after['time'] - before['time']
+        t = np.where(valid, (times - before['time']) / np.where(span > 0, span, 1), 0.0)
+
+        for name in EPHEMERIS_FIELDS:
+            value = before[name] + (after[name] - before[name]) * t
+            value = np.where(hold_first, records[name][0], np.where(hold_last, records[name][-1], value))
+            eph_params[name] = np.where(valid | hold_first | hold_last, value, np.nan)
+        return eph_params, valid | hold_first | hold_last
+
+    def closest(self, prn, target_time, max_diff=3600):
+        """
+        Find the ephemeris record closest to target time
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            target_time: Target timestamp (datetime object)
+            max_diff: Records further than this from target time (seconds) are ignored
+
+        Returns:
+            tuple: (closest_epoch, eph), both None if not found
+        """
+        records = self.records(prn)
+        times = records['time']
+        t = to_seconds(target_time)
+        i = np.searchsorted(times, t, side='left')
+
+        best = None
+        min_diff = max_diff
+        # The earlier neighbour wins ties, and within equal epochs the first record in file order
+        for j in (i - 1, i):
+            if 0 <= j < len(times) and abs(times[j] - t) < min_diff:
+                min_diff = abs(times[j] - t)
+                best = np.searchsorted(times, times[j], side='left')
+
+        if best is None:
+            return None, None
+
+        eph = self.ephemeris(records[best])
+        return eph['epoch'], eph
+
+def parse_rinex_nav(broadcast_file):
+    """
+    Parse the GPS records of a RINEX 2 or 3 navigation file
+
+    Args:
+        broadcast_file: Path to broadcast ephemeris file
+
+    Returns:
+        numpy structured array with EPHEMERIS_DTYPE, in file order
+    """
+    rows = []
+    version = 3.0
+
+    with open_text(broadcast_file) as f:
+        # Read version from header, skip the rest
+        for line in f:
+            if "RINEX VERSION / TYPE" in line:
+                version = float(line[:9])
+            if "END OF HEADER" in line:
+                break
+
+        current_block = []
+        for line in f:
+            if not line.strip():
+                continue
+
+            if _is_record_start(line, version):
+                # Only GPS records are kept; other systems reset the block
+                current_block = [line] if version < 3 or line[0] == 'G' else []
+            elif current_block:
+                current_block.append(line)
+
+                if len(current_block) == 8:
+                    try:
+                        rows.append(_parse_nav_block(current_block, version))
+                    except (ValueError, IndexError) as e:
+                        print(f"Error processing ephemeris block: {current_block[0].strip()} - {str(e)}")
+                    current_block = []
+
+    return np.array(rows, dtype=EPHEMERIS_DTYPE)
+
+def _is_record_start(line, version):
+    """Check whether a navigation data line starts a new satellite record"""
+    if version >= 3:
+        return line[0] != ' '
+    return line[:2].strip().isdigit()
+
+def _parse_nav_block(data_lines, version):
+    """Parse one 8-line GPS navigation record into a table row"""
+    first_line = data_lines[0]
+
+    if version >= 3:
+        prn = first_line[0:3]
+        epoch = datetime(int(first_line[3:8]), int(first_line[9:11]), int(first_line[12:14]),
+                         int(first_line[15:17]), int(first_line[18:20]), int(first_line[21:23]))
+        fields = [first_line[23:]] + [line[4:] for line in data_lines[1:]]
+    else:
+        prn = f"G{int(first_line[0:2]):02d}"
+        year = int(first_line[3:5])
+        year += 2000 if year < 80 else 1900
+        epoch = datetime(year, int(first_line[6:8]), int(first_line[9:11]),
+                         int(first_line[12:14]), int(first_line[15:17])) \
+            + timedelta(seconds=float(first_line[17:22]))
+        fields = [first_line[22:]] + [line[3:] for line in data_lines[1:]]
+
+    # Fixed 19-character columns, Fortran 'D' exponents, blank fields read as zero
+    values = []
+    for line_idx, text in enumerate(fields):
+        for k in range(3 if line_idx == 0 else 4):
+            field = text[k * 19:(k + 1) * 19].strip()
+            values.append(float(field.replace('D', 'E')) if field else 0.0)
+
+    return (prn, to_seconds(epoch)) + tuple(values[:len(EPHEMERIS_FIELDS)])
+
+def parse_gnss_sdr_xml(ephemeris_file, reference_time=None):
+    """
+    Parse a GNSS-SDR gps_ephemeris.xml (boost serialization) file
+
+    The file is streamed with iterparse, one satellite element at a time;
+    each one is removed from the tree once parsed.
+
+    Args:
+        ephemeris_file: Path to gps_ephemeris.xml
+        reference_time: Datetime near the session, used to resolve the 10-bit
+                        week number rollover; defaults to the file's mtime
+
+    Returns:
+        numpy structured array with EPHEMERIS_DTYPE, in file order
+    """
+    if reference_time is None:
+        mtime = os.path.getmtime(ephemeris_file)
+        reference_time = datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None)
+    reference_week = to_seconds(reference_time) // 604800
+
+    rows = []
+    open_elements = []  # From the root down to the element being parsed
+    with open_binary(ephemeris_file) as f:
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                open_elements.append(elem)
+                continue
+            open_elements.pop()
+            if elem.tag != 'second':
+                continue
+
+            values = {child.tag: child.text for child in elem}
+            try:
+                eph_data = {field: float(values[tag]) for tag, field in GNSS_SDR_XML_FIELDS.items()}
+
+                # Broadcast week number is modulo 1024; take the rollover closest to the reference
+                week = int(values['WN']) % 1024
+                week += 1024 * round((reference_week - week) / 1024)
+                eph_data['week'] = week
+
+                # Record epoch is the time of clock, as in RINEX navigation files
+                epoch_seconds = week * 604800 + float(values['toc'])
+                rows.append((f"G{int(values['PRN']):02d}", epoch_seconds) +
+                            tuple(eph_data[name] for name in EPHEMERIS_FIELDS))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error processing ephemeris element for PRN {values.get('PRN')}: {str(e)}")
+
+            # Remove the map <item> holding the record, so the tree does not grow with the file
+            elem.clear()
+            if len(open_elements) >= 2:
+                open_elements[-2].remove(open_elements[-1])
+
+    return np.array(rows, dtype=EPHEMERIS_DTYPE)
@@ -0,0 +1,282 @@
+import abc
+import numpy as np
+from ephemeris import EPHEMERIS_FIELDS, to_time_of_week
+from orbit import OrbitArcs, compute_satellite_positions
+from position_memo import combine_fingerprints, orbit_fingerprint, process_memo
+
+class EphemerisStrategy(abc.ABC):
+    """
+    How satellite positions are evaluated from the records of an EphemerisStore
+
+    A strategy picks (or blends) ephemeris parameters for each PRN and time;
+    positions() then evaluates them over whole arrays. Strategies share the
+    store they are given, so several can be compared on one parsed table:
+
+        store = EphemerisStore()
+        store.load_data('brdc3620.24n')
+        nearest = NearestEphemeris(store).positions(times, prns)
+        interpolated = InterpolatedEphemeris(store).positions(times, prns)
+    """
+    name = None  # Strategy name used on the command line and in cache keys
+
+    def __init__(self, ephemeris_store):
+        self.ephemeris_store = ephemeris_store
+        self._record_keys = {}  # Format: {prn: (IODE, orbit fingerprint) of each record}
+
+    @abc.abstractmethod
+    def sources(self, prn, times):
+        """
+        Records the parameters of one PRN at many times are taken from
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            times: Times in seconds since the GPS epoch
+
+        Returns:
+            tuple: (first, second) indices into ephemeris_store.records(prn);
+                   parameters blend the two records, equal indices mean one
+                   record used unchanged, -1 where no record applies
+        """
+
+    def parameters(self, prn, times):
+        """
+        Ephemeris parameters of one PRN at many times
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            times: Times in seconds since the GPS epoch
+
+        Returns:
+            tuple: (dict of EPHEMERIS_FIELDS arrays, valid mask); parameters
+                   are NaN where no record applies
+        """
+        first, _ = self.sources(prn, times)
+        return self._records_at(self.ephemeris_store.records(prn), first)
+
+    def settings(self):
+        """Parameters that change the positions, e.g. for cache keys"""
+        return {'strategy': self.name}
+
+    def prn_positions(self, prn, times, quantize=True):
+        """
+        (N, 3) ECEF positions of one PRN, NaN where no record applies
+
+        Positions already in the process's PositionMemo (see position_memo)
+        are reused; parameters are only computed for the others. With
+        quantize False the positions are those at the times as given, so a
+        memo that rounds times to its quantum is not used.
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        positions = np.full((len(times), 3), np.nan)
+        memo = process_memo()
+        if memo is None or (memo.quantum and not quantize):
+            eph_params, valid = self.parameters(prn, times)
+            if valid.any():
+                positions[valid] = compute_satellite_positions({name: eph_params[name][valid] for name in eph_params},
+                                                               to_time_of_week(times[valid]))
+            return positions
+
+        times = memo.quantize(times)
+        first, second = self.sources(prn, times)
+        rows = np.flatnonzero(first >= 0)
+        if not len(rows):
+            return positions
+
+        iode, fingerprint = self._source_keys(prn, first[rows], second[rows])
+        keys = memo.keys(prn, iode, fingerprint, times[rows])
+        known, found = memo.lookup(keys)
+        if not found.all():
+            missing = ~found
+            eph_params, _ = self.parameters(prn, times[rows[missing]])
+            known[missing] = compute_satellite_positions(eph_params, to_time_of_week(times[rows[missing]]))
+            memo.store(keys[missing], known[missing])
+        positions[rows] = known
+        return positions
+
+    def positions(self, times, prns):
+        """
+        Satellite positions for many (time, PRN) pairs
+
+        Args:
+            times: Times in seconds since the GPS epoch, one per pair
+            prns: Satellite PRNs (e.g., 'G26'), one per pair
+
+        Returns:
+            numpy array: (N, 3) ECEF coordinates in meters, NaN where no record applies
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        prns = np.atleast_1d(np.asarray(prns))
+        positions = np.full((len(prns), 3), np.nan)
+        for prn in np.unique(prns):
+            mask = prns == prn
+            positions[mask] = self.prn_positions(str(prn), times[mask])
+        return positions
+
+    def _records_at(self, records, index):
+        """Parameters of records[index], NaN where index is -1"""
+        valid = index >= 0
+        selected = records[np.maximum(index, 0)] if len(records) else None
+        eph_params = {}
+        for name in EPHEMERIS_FIELDS:
+            eph_params[name] = (np.where(valid, selected[name], np.nan) if selected is not None
+                                else np.full(len(index), np.nan))
+        return eph_params, valid
+
+    def _source_keys(self, prn, first, second):
+        """IODE and orbit parameter fingerprint of the records positions are computed from"""
+        if prn not in self._record_keys:
+            records = self.ephemeris_store.records(prn)
+            self._record_keys[prn] = (records['IODE'], orbit_fingerprint(records))
+        iode, fingerprint = self._record_keys[prn]
+        return iode[first], np.where(first == second, fingerprint[first],
+                                     combine_fingerprints(fingerprint[first], fingerprint[second]))
+
+class NearestEphemeris(EphemerisStrategy):
+    """Record whose epoch is closest to the time, within max_diff seconds (as tools_wo_interpolate)"""
+    name = 'nearest'
+
+    def __init__(self, ephemeris_store, max_diff=3600):
+        super().__init__(ephemeris_store)
+        self.max_diff = max_diff
+
+    def settings(self):
+        return {'strategy': self.name, 'max_diff': self.max_diff}
+
+    def sources(self, prn, times):
+        records = self.ephemeris_store.records(prn)
+        epochs = records['time']
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        if not len(records):
+            return np.full(len(times), -1), np.full(len(times), -1)
+
+        i = np.searchsorted(epochs, times, side='left')
+        before = np.maximum(i - 1, 0)
+        after = np.minimum(i, len(epochs) - 1)
+        # The earlier neighbour wins ties
+        use_before = (i == len(epochs)) | ((i > 0) & (times - epochs[before] <= epochs[after] - times))
+        nearest = np.where(use_before, before, after)
+        # Within equal epochs, the first record in file order
+        nearest = np.searchsorted(epochs, epochs[nearest], side='left')
+        index = np.where(np.abs(epochs[nearest] - times) < self.max_diff, nearest, -1)
+        return index, index
+
+class InterpolatedEphemeris(EphemerisStrategy):
+    """Linear interpolation of the parameters of the bracketing records (as tools)"""
+    name = 'interpolate'
+
+    def __init__(self, ephemeris_store, max_hold=0):
+        super().__init__(ephemeris_store)
+        self.max_hold = max_hold  # Hold the first/last record this many seconds outside the span
+
+    def settings(self):
+        return {'strategy': self.name, 'max_hold': self.max_hold}
+
+    def sources(self, prn, times):
+        # The selection of EphemerisStore.interpolate
+        records = self.ephemeris_store.records(prn)
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        if not len(records):
+            return np.full(len(times), -1), np.full(len(times), -1)
+
+        i = np.searchsorted(records['time'], times, side='right') - 1
+        bracketed = (i >= 0) & (i + 1 < len(records))
+        hold_first = (i < 0) & (records['time'][0] - times < self.max_hold)
+        hold_last = (i + 1 >= len(records)) & (times - records['time'][-1] < self.max_hold)
+
+        first = np.where(bracketed, i, np.where(hold_first, 0, np.where(hold_last, len(records) - 1, -1)))
+        second = np.where(bracketed, i + 1, first)
+        return first, second
+
+    def parameters(self, prn, times):
+        return self.ephemeris_store.interpolate(prn, times, max_hold=self.max_hold)
+
+class ValidEphemeris(EphemerisStrategy):
+    """
+    Record a receiver would use: healthy, already transmitted and within its fit interval
+
+    Of the healthy records transmitted at or before the time, whose toe is
+    within half the fit interval (4 h unless the record gives a longer one)
+    of the time, the most recently transmitted one is used.
+    """
+    name = 'valid'
+
+    def __init__(self, ephemeris_store, require_healthy=True):
+        super().__init__(ephemeris_store)
+        self.require_healthy = require_healthy
+
+    def settings(self):
+        return {'strategy': self.name, 'require_healthy': self.require_healthy}
+
+    def sources(self, prn, times):
+        records = self.ephemeris_store.records(prn)
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        if not len(records):
+            return np.full(len(times), -1), np.full(len(times), -1)
+
+        # toe and transmission time of each record in seconds since the GPS epoch
+        toe = records['week'] * 604800 + records['toe']
+        transmitted = records['week'] * 604800 + records['transmission_time']
+        transmitted = np.where(records['transmission_time'] - records['toe'] > 302400,
+                               transmitted - 604800, transmitted)
+        fit_hours = np.where(records['fit_interval'] >= 4, records['fit_interval'], 4)
+
+        # Records in order of transmission, then toe; the candidates for a time are
+        # those transmitted at or before it, and the latest valid one is used
+        rank = np.lexsort((toe, transmitted))
+        transmitted, toe, reach = transmitted[rank], toe[rank], fit_hours[rank] * 1800
+        healthy = records['health'][rank] == 0 if self.require_healthy else np.ones(len(rank), dtype=bool)
+        # No record at or before a position is valid after this time
+        valid_until = np.maximum.accumulate(toe + reach)
+
+        index = np.full(len(times), -1)
+        candidate = np.searchsorted(transmitted, times, side='right') - 1
+        open_ = np.flatnonzero(candidate >= 0)
+        while len(open_):
+            j = candidate[open_]
+            usable = healthy[j] & (np.abs(times[open_] - toe[j]) <= reach[j])
+            index[open_[usable]] = rank[j[usable]]
+            # Step back to the previous candidate where one can still be valid
+            open_, j = open_[~usable], j[~usable] - 1
+            keep = j >= 0
+            open_, j = open_[keep], j[keep]
+            keep = valid_until[j] >= times[open_]
+            open_ = open_[keep]
+            candidate[open_] = j[keep]
+        return index, index
+
+class OrbitFitEphemeris(EphemerisStrategy):
+    """
+    Chebyshev orbit arcs fitted to another strategy's positions (see OrbitArcs)
+
+    Arcs are cut at the store's ephemeris epochs, where the parameters of the
+    record-based strategies change.
+    """
+    name = 'orbit-fit'
+
+    def __init__(self, ephemeris_store, base=None, window=900, tolerance=0.01):
+        super().__init__(ephemeris_store)
+        self.base = base if base is not None else InterpolatedEphemeris(ephemeris_store)
+        self.window = window
+        self.tolerance = tolerance
+        # The arcs are fitted to positions at the sampled times, never at memo-rounded ones
+        self.orbit_arcs = OrbitArcs(lambda prn, times: self.base.prn_positions(prn, times, quantize=False),
+                                    window=window, tolerance=tolerance,
+                                    breakpoints=lambda prn: ephemeris_store.records(prn)['time'])
+
+    def settings(self):
+        return {'strategy': self.name, 'base': self.base.settings(),
+                'window': self.window, 'tolerance': self.tolerance}
+
+    def sources(self, prn, times):
+        return self.base.sources(prn, times)
+
+    def parameters(self, prn, times):
+        return self.base.parameters(prn, times)
+
+    def prn_positions(self, prn, times, quantize=True):
+        # The arcs are continuous in time, so nothing is rounded to a memo quantum
+        return self.orbit_arcs.positions(prn, times)
+
+# Strategies by name, e.g. for command-line options
+EPHEMERIS_STRATEGIES = {strategy.name: strategy for strategy in
+                        (NearestEphemeris, InterpolatedEphemeris, ValidEphemeris, OrbitFitEphemeris)}
@@ -0,0 +1,123 @@
+import numpy as np
+
+# WGS84 ellipsoid parameters
+WGS84_A = 6378137.0  # Semi-major axis (m)
+WGS84_F = 1 / 298.257223563  # Flattening
+WGS84_B = WGS84_A * (1 - WGS84_F)  # Semi-minor axis (m)
+WGS84_E = np.sqrt(1 - (WGS84_B / WGS84_A) ** 2)  # First eccentricity
+WGS84_E2 = WGS84_E ** 2
+
+def lla_to_ecef(lat, lon, alt):
+    """
+    Convert geodetic coordinates to ECEF coordinates
+
+    Args:
+        lat: Latitude(s) in degrees, scalar or array
+        lon: Longitude(s) in degrees, scalar or array
+        alt: Height(s) above the ellipsoid in meters, scalar or array
+
+    Returns:
+        numpy array: (..., 3) ECEF coordinates in meters
+    """
+    lat_rad = np.radians(lat)
+    lon_rad = np.radians(lon)
+    sin_lat = np.sin(lat_rad)
+    cos_lat = np.cos(lat_rad)
+
+    # Radius of curvature in prime vertical
+    N = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+
+    return np.stack([(N + alt) * cos_lat * np.cos(lon_rad),
+                     (N + alt) * cos_lat * np.sin(lon_rad),
+                     (N * (1 - WGS84_E2) + alt) * sin_lat], axis=-1)
+
+def ecef_to_lla(ecef, tolerance=1e-12, max_iterations=10):
+    """
+    Convert ECEF coordinates to geodetic coordinates
+
+    Latitude is found by fixed-point iteration, which converges to
+    `tolerance` radians within a few steps for points near the Earth. Each
+    point stops iterating once it has converged, so its result does not
+    depend on the other points converted with it.
+
+    Args:
+        ecef: (..., 3) ECEF coordinates in meters
+        tolerance: Convergence limit for the latitude (rad)
+        max_iterations: Maximum number of iterations
+
+    Returns:
+        tuple: (lat, lon, alt) arrays, degrees and meters
+    """
+    ecef = np.asarray(ecef, dtype=np.float64)
+    x, y, z = ecef[..., 0], ecef[..., 1], ecef[..., 2]
+    p = np.hypot(x, y)
+
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+    active = np.ones(np.shape(lat), dtype=bool)
+    for _ in range(max_iterations):
+        sin_lat = np.sin(lat)
+        N = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+        lat_new = np.arctan2(z + WGS84_E2 * N * sin_lat, p)
+        converged = np.abs(lat_new - lat) < tolerance
+        lat = np.where(active, lat_new, lat)
+        active &= ~converged
+        if not active.any():
+            break
+
+    # Height along the normal, well conditioned at all latitudes
+    sin_lat = np.sin(lat)
+    alt = p * np.cos(lat) + z * sin_lat - WGS84_A * np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    return np.degrees(lat), np.degrees(lon), alt
+
+def ecef_to_enu(vectors, lat, lon):
+    """
+    Rotate ECEF vectors into the local east-north-up frame
+
+    Args:
+        vectors: (..., 3) ECEF vectors, e.g. satellite minus receiver position
+        lat: Latitude(s) of the local frame in degrees
+        lon: Longitude(s) of the local frame in degrees
+
+    Returns:
+        numpy array: (..., 3) east, north, up components
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    lat_rad = np.radians(lat)
+    lon_rad = np.radians(lon)
+    sin_lat, cos_lat = np.sin(lat_rad), np.cos(lat_rad)
+    sin_lon, cos_lon = np.sin(lon_rad), np.cos(lon_rad)
+    dx, dy, dz = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+
+    east = -sin_lon * dx + cos_lon * dy
+    north = -sin_lat * cos_lon * dx - sin_lat * sin_lon * dy + cos_lat * dz
+    up = cos_lat * cos_lon * dx + cos_lat * sin_lon * dy + sin_lat * dz
+    return np.stack([east, north, up], axis=-1)
+
+def azimuth_elevation(receiver_ecef, satellite_ecef, receiver_lla=None):
+    """
+    Azimuth and elevation of satellites seen from receivers
+
+    Args:
+        receiver_ecef: (..., 3) receiver ECEF positions in meters
+        satellite_ecef: (..., 3) satellite ECEF positions in meters, broadcast
+                        against receiver_ecef
+        receiver_lla: Optional (lat, lon) of the receivers in degrees, e.g.
+                      from ecef_to_lla once per epoch; computed if not given
+
+    Returns:
+        tuple: (azimuth, elevation) arrays in degrees, azimuth in [0, 360)
+               clockwise from north
+    """
+    receiver_ecef = np.asarray(receiver_ecef, dtype=np.float64)
+    if receiver_lla is None:
+        lat, lon, _ = ecef_to_lla(receiver_ecef)
+    else:
+        lat, lon = receiver_lla[0], receiver_lla[1]
+    enu = ecef_to_enu(np.asarray(satellite_ecef, dtype=np.float64) - receiver_ecef, lat, lon)
+    east, north, up = enu[..., 0], enu[..., 1], enu[..., 2]
+
+    azimuth = np.degrees(np.arctan2(east, north)) % 360
+    azimuth = np.where(azimuth == 360, 0.0, azimuth)  # -0.0 and tiny negative angles
+    elevation = np.degrees(np.arctan2(up, np.hypot(east, north)))
+    return azimuth, elevation
@@ -1,77 +1,700 @@
-from tools import parse_nmea_data
+from tools import read_nmea_tables
 from tools import parse_broadcast_ephemeris
 from tools import get_carrier_phase_rss
+from tools import carrier_phase_rss
 from tools import RinexCache
-from tools import lla_to_ecef
-import csv
+from geodesy import azimuth_elevation, ecef_to_lla, lla_to_ecef
+from ephemeris_strategies import EPHEMERIS_STRATEGIES, InterpolatedEphemeris, OrbitFitEphemeris
+from ephemeris import GPS_EPOCH, EphemerisStore, from_seconds, seconds_to_utc
+from cache import DEFAULT_CACHE_DIR, FileCache
+from compression import strip_compression_suffix
+from table_io import TABLE_FORMATS, append_table, remove_table, table_format, truncate_table
+from checkpoint import Checkpoint
+from position_memo import PositionMemo, SharedPositionMemo, process_memo, set_process_memo
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import configparser
+import contextlib
+import glob
+import hashlib
+import os
+import re
+import time
 import numpy as np
 
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
 
+OUTPUT_HEADER = ['Timestamp', 'Rx_X', 'Rx_Y', 'Rx_Z', 'PRN', 'Sat_X', 'Sat_Y', 'Sat_Z',
+                 'Elevation', 'Azimuth', 'Carrier_Phase(cycles)', 'RSS(dBHz)']
+
+# Normalized layout: receiver state once per epoch, observations refer to it by 'Epoch'
+EPOCH_COLUMNS = ['Epoch', 'Timestamp', 'Rx_X', 'Rx_Y', 'Rx_Z', 'Lat', 'Lon', 'Alt']
+OBSERVATION_COLUMNS = ['Epoch', 'PRN', 'Sat_X', 'Sat_Y', 'Sat_Z',
+                       'Elevation', 'Azimuth', 'Carrier_Phase(cycles)', 'RSS(dBHz)']
+
+# Bump when the satellite position computation changes to invalidate cached positions
+POSITIONS_CACHE_VERSION = 3
+
+# Epochs computed and appended between two checkpoints
+CHECKPOINT_EPOCHS = 600
+
+# Job options and their defaults; paths are relative to the job file
+JOB_DEFAULTS = {
+    'root': None,  # Session directory holding the antenna directories
+    'output_dir': 'data',  # One <antenna>.<output_format> per antenna is written here
+    'output_format': 'csv',  # csv, parquet, h5, hdf5 or npz
+    'broadcast_ephemeris': None,  # Broadcast ephemeris file, found in root if not given
+    'session_ephemeris': False,  # Use each antenna's gps_ephemeris.xml instead
+    'antennas': None,  # Antenna names to process (e.g. ['ant0', 'ant2']), None for all
+    'workers': None,  # Parallel processes, None for one per antenna up to the CPU count
+    'batch': True,  # Compute all rows at once, False for the per-row reference loop
+    'layout': 'flat',  # flat: one table, normalized: <antenna>_epochs and <antenna>_observations
+    'resume': False,  # Continue interrupted or grown outputs from their checkpoints
+    'cache_dir': DEFAULT_CACHE_DIR,
+    'cache': True,  # Reuse parsed inputs and satellite positions from cache_dir
+    'ephemeris_strategy': 'orbit-fit',  # nearest, interpolate, valid or orbit-fit (see make_strategy)
+    'position_memo': True,  # Share computed satellite positions between the antennas (see position_memo)
+    'memo_quantum': 0,  # Round position times to multiples of this (s) to share more, 0 for exact times
+    'max_phase_gap': 1.0,  # Max seconds from an NMEA epoch to the RINEX epoch its phase/RSS come from, 0 for no limit
+}
+
+def process_antenna(nmea_file, rinex_obs_file, ephemeris_file, output_file,
+                    use_session_ephemeris=False, cache_dir=DEFAULT_CACHE_DIR, batch=True,
+                    layout='flat', resume=False, use_cache=True, ephemeris_strategy='orbit-fit',
+                    max_phase_gap=1.0):
+    """
+    Write the CSV of one antenna session
+
+    Epochs are processed and appended in blocks of CHECKPOINT_EPOCHS; after
+    each block a checkpoint (see checkpoint.Checkpoint) records the input
+    fingerprints and how far the output is complete.
+
+    Args:
+        nmea_file: GNSS-SDR nmea_pvt.nmea of the session
+        rinex_obs_file: RINEX observation file of the session
+        ephemeris_file: Broadcast ephemeris file, or the session's gps_ephemeris.xml
+                        when use_session_ephemeris is set
+        output_file: Output table, .csv, .parquet, .h5/.hdf5 or .npz (see table_io.write_table)
+        use_session_ephemeris: True for the ephemeris GNSS-SDR decoded in this session.
+                               It holds one record per satellite, used within its 2h
+                               validity around toe.
+        cache_dir: FileCache directory for the stage cache
+        batch: Compute all rows at once (batch_columns) instead of one epoch and
+               satellite at a time (per_row_columns); the rows are the same
+        layout: 'flat' for one table with OUTPUT_HEADER columns, 'normalized' for
+                an epochs and an observations table next to output_file (see
+                normalized_files; read back with table_io.NormalizedTable)
+        resume: Continue an output interrupted earlier, or extend it with the
+                epochs appended to growing NMEA/RINEX files since, as recorded
+                in its checkpoint; otherwise the output is written from the start
+        use_cache: Reuse parsed NMEA, RINEX and ephemeris tables and satellite
+                   positions from the stage cache in cache_dir while the inputs
+                   and parameters are unchanged (see cache.py to inspect or clear it)
+        ephemeris_strategy: How satellite positions are evaluated from the
+                            ephemeris records, see make_strategy
+        max_phase_gap: Carrier phase and RSS come from the RINEX epoch closest to
+                       each NMEA epoch if it is at most this many seconds away,
+                       otherwise they are 0.0 (0 for no limit)
+
+    Returns:
+        dict: Summary with the number of epochs, new epochs and rows written
+    """
+    # Output tables and their files
+    if layout == 'normalized':
+        table_files = dict(zip(('epochs', 'observations'), normalized_files(output_file)))
+    else:
+        table_files = {'rows': output_file}
+    main_table = 'observations' if layout == 'normalized' else 'rows'
+
+    inputs = {'nmea': nmea_file, 'rinex_obs': rinex_obs_file, 'ephemeris': ephemeris_file}
+    # A memo quantum rounds the position times, so it changes the output
+    memo = process_memo()
+    memo_quantum = memo.quantum if memo is not None else 0
+    settings = {'layout': layout, 'format': table_format(output_file), 'batch': batch,
+                'use_session_ephemeris': use_session_ephemeris, 'ephemeris_strategy': ephemeris_strategy,
+                'max_phase_gap': max_phase_gap,
+                'memo_quantum': memo_quantum}
+    checkpoint = Checkpoint(output_file)
+    first_epoch = 0
+    rows = {}  # Format: {output table: rows written}
+
+    if resume:
+        checkpoint.load()
+        reason = checkpoint.resumable(inputs, settings)
+        if reason is None and not all(os.path.exists(path) for path in table_files.values()):
+            reason = "output missing"
+        if reason is None:
+            state = checkpoint.state
+            # Rows written after the last checkpoint belong to an unfinished block
+            for name, path in table_files.items():
+                truncate_table(path, state['rows'].get(name, 0))
+            if checkpoint.up_to_date(inputs):
+                print(f"{output_file} is up to date ({state['epochs']} epochs)")
+                return {'epochs': state['epochs'], 'new_epochs': 0, 'rows': state['rows'].get(main_table, 0),
+                        'output_file': ', '.join(table_files.values())}
+            # The last epoch written may have been incomplete in the growing NMEA file
+            restart = state['restart']
+            for name, path in table_files.items():
+                truncate_table(path, restart['rows'].get(name, 0))
+            first_epoch, rows = restart['epochs'], dict(restart['rows'])
+            print(f"Resuming {output_file} after epoch {first_epoch}")
+        else:
+            print(f"Starting {output_file} over: {reason}")
+
+    if first_epoch == 0:
+        for path in table_files.values():
+            remove_table(path)
+        checkpoint.start(inputs, growing=('nmea', 'rinex_obs'), settings=settings)
+
+    # Growing inputs are read, and fingerprinted, up to their size now
+    sizes = {role: os.path.getsize(path) for role, path in inputs.items()}
+
+    # Parsed inputs and satellite positions are reused from the stage cache while
+    # their input files and parameters are unchanged
+    cache = FileCache(cache_dir) if use_cache else None
 
-def main():
-    # File paths
-    nmea_file = "/Users/wangzhicheng/Desktop/gnss-sdr/12_27_4_ants/12_27_ant0/nmea_pvt.nmea"
-    broadcast_file = "/Users/wangzhicheng/Desktop/gnss-sdr/12_27_4_ants/BRDM00DLR_S_20243620000_01D_MN.rnx"
-    rinex_obs_file = "/Users/wangzhicheng/Desktop/gnss-sdr/12_27_4_ants/12_27_ant0/GSDR362k49.24O"
-    output_file = "/Users/wangzhicheng/Desktop/gnss-sdr/code/data/ant0.csv"
-    
     # Initialize RINEX cache
     print("Loading RINEX observation data...")
-    rinex_cache = RinexCache()
-    rinex_cache.load_data(rinex_obs_file)
-    
-    # Parse NMEA data
+    rinex_cache = RinexCache(max_gap=max_phase_gap or None)
+    rinex_cache.load_data(rinex_obs_file, cache=cache, size=sizes['rinex_obs'])
+
+    # Parse NMEA data into an epoch table and a satellite table
     print("Parsing NMEA data...")
-    nmea_data = parse_nmea_data(nmea_file)
-    print(f"Found {len(nmea_data)} NMEA data groups")
-    
-    # Prepare CSV file
-    header = ['Timestamp', 'Rx_X', 'Rx_Y', 'Rx_Z', 'PRN', 'Sat_X', 'Sat_Y', 'Sat_Z', 
-              'Elevation', 'Azimuth', 'Carrier_Phase(cycles)', 'RSS(dBHz)']
-    
+    nmea_epochs, nmea_satellites = read_nmea_tables(nmea_file, cache=cache, size=sizes['nmea'])
+    print(f"Found {len(nmea_epochs)} NMEA epochs, {max(len(nmea_epochs) - first_epoch, 0)} new")
+
+    # Only the satellite rows of the epochs written in this run
+    nmea_satellites = nmea_satellites[np.searchsorted(nmea_satellites['epoch'], first_epoch):]
+
+    # Satellite positions of these rows for the batch pipeline, cached by their
+    # times and PRNs, so a resume computes the new epochs only
+    position_params = {'strategy': ephemeris_strategy, 'window': 900, 'tolerance': 0.01,
+                       'max_hold': 7200 if use_session_ephemeris else 0}
+    sat_ecef = None
+    if cache is not None and batch:
+        times = nmea_epochs['time'][nmea_satellites['epoch']]
+        prns = np.char.add('G', np.char.zfill(nmea_satellites['prn'].astype(str), 2))
+        satellites = hashlib.sha1(times.tobytes() + prns.astype('U3').tobytes()).hexdigest()
+        positions_key = cache.key(f"positions-v{POSITIONS_CACHE_VERSION}", ephemeris_file,
+                                  satellites=satellites, memo_quantum=memo_quantum, **position_params)
+        sat_ecef = cache.load(positions_key)
+
+    strategy = None
+    if sat_ecef is None or not batch:
+        # Parse broadcast ephemeris once, indexed by PRN (cached across runs)
+        print("Loading broadcast ephemeris...")
+        ephemeris_store = EphemerisStore()
+        ephemeris_store.load_data(ephemeris_file, cache=cache)
+        strategy = make_strategy(ephemeris_store, **position_params)
+
+        if cache is not None and batch:
+            sat_ecef = strategy.positions(times, prns)
+            cache.save(positions_key, sat_ecef)
+    else:
+        print("Using cached satellite positions")
+
+    # Append blocks of epochs, each followed by a checkpoint
     print("Processing data and writing to CSV...")
-    rows_written = 0
-    
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        
-        for data_idx, data in enumerate(nmea_data):
-            print(f"\nProcessing NMEA group {data_idx + 1}/{len(nmea_data)}")
-            print(f"Timestamp: {data['timestamp']}")
-            print(f"Available satellites: {data['satellites']}")
-            
-            # Convert receiver position to ECEF
-            rx_x, rx_y, rx_z = lla_to_ecef(data['lat'], data['lon'], data['alt'])
-            
-            # Get satellite positions
-            sat_positions = parse_broadcast_ephemeris(broadcast_file, data['timestamp'], data['satellites'])
-            
-            # Process each satellite
-            for prn in data['satellites']:
-                if prn in sat_positions:
-                    sat_pos = sat_positions[prn]
-                    carrier_phase, rss = get_carrier_phase_rss(rinex_cache, data['timestamp'], prn)
-                    
-                    # Gets elevation and azimuth, or NaN if not available
-                    elevation = data['elevation_angles'].get(prn, float('nan'))
-                    azimuth = data['azimuth_angles'].get(prn, float('nan'))
-                    
-                    # Write data row with elevation and azimuth
-                    writer.writerow([
-                        data['timestamp'].strftime('%Y-%m-%d %H:%M:%S.%f'),
-                        rx_x, rx_y, rx_z,
-                        prn,
-                        sat_pos['x'], sat_pos['y'], sat_pos['z'],
-                        elevation, azimuth,
-                        carrier_phase,
-                        rss
-                    ])
-                    rows_written += 1
-                else:
-                    print(f"No position data found for satellite {prn}")
-    
-    print(f"\nData processing complete. Wrote {rows_written} rows to {output_file}")
+    new_rows = 0
+    # A resume writes the rows that may change as the inputs grow again instead of
+    # continuing after them: the last epoch, whose $GPRMC group may be cut short in
+    # a growing NMEA file, and the epochs after the midpoint of the last two RINEX
+    # epochs, whose phase comes from a RINEX epoch that may be incomplete or is
+    # still the 0.0 placeholder until the growing RINEX file has their epoch
+    last_epoch = len(nmea_epochs) - 1
+    rinex_epochs = rinex_cache.epochs
+    tail_start = (rinex_epochs[-2] + rinex_epochs[-1]) / 2 if len(rinex_epochs) > 1 else -np.inf
+    restart_epoch = max(first_epoch, min(int(np.searchsorted(nmea_epochs['time'], tail_start, side='right')),
+                                         last_epoch))
+    bounds = sorted({*range(first_epoch, last_epoch, CHECKPOINT_EPOCHS), restart_epoch, last_epoch,
+                     len(nmea_epochs)})
+    bounds = [bound for bound in bounds if bound >= first_epoch]
+    restart = None
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if start == restart_epoch:
+            restart = (start, dict(rows))
+        block_epochs, block_satellites, block_sat_ecef = epoch_block(nmea_epochs, nmea_satellites,
+                                                                     start, stop, sat_ecef)
+
+        if layout == 'normalized':
+            epochs, observations = batch_tables(block_epochs, block_satellites, strategy, rinex_cache,
+                                                sat_ecef=block_sat_ecef)
+            epochs['Epoch'] += start
+            observations['Epoch'] += start
+            tables = {'epochs': epochs, 'observations': observations}
+        elif batch:
+            tables = {'rows': batch_columns(block_epochs, block_satellites, strategy, rinex_cache,
+                                            sat_ecef=block_sat_ecef)}
+        else:
+            tables = {'rows': per_row_columns(block_epochs, block_satellites, strategy, rinex_cache)}
+
+        # Writer chosen by the extension: .csv, .parquet, .h5/.hdf5 or .npz
+        for name, columns in tables.items():
+            append_table(table_files[name], columns)
+            rows[name] = rows.get(name, 0) + len(columns['Timestamp' if name == 'rows' else 'Epoch'])
+        new_rows += len(tables[main_table]['Timestamp' if main_table == 'rows' else 'Epoch'])
+        checkpoint.advance(inputs, sizes, stop, float(nmea_epochs['time'][stop - 1]), rows,
+                           complete=stop == len(nmea_epochs), restart=restart)
+
+    written = ', '.join(table_files.values())
+    print(f"\nData processing complete. Wrote {new_rows} rows to {written}")
+    if strategy is None:
+        orbit_summary = "Satellite positions from cache"
+    elif isinstance(strategy, OrbitFitEphemeris):
+        orbit_summary = strategy.orbit_arcs.summary()
+    else:
+        orbit_summary = f"Satellite positions from the {strategy.name} ephemeris strategy"
+    print(orbit_summary)
+    if memo is not None:
+        print(memo.summary())
+    return {'epochs': len(nmea_epochs), 'new_epochs': max(len(nmea_epochs) - first_epoch, 0),
+            'rows': rows.get(main_table, 0), 'orbit_arcs': orbit_summary, 'output_file': written}
+
+def make_strategy(ephemeris_store, strategy='orbit-fit', window=900, tolerance=0.01, max_hold=0):
+    """
+    Ephemeris strategy by name, see ephemeris_strategies
+
+    Args:
+        ephemeris_store: Loaded EphemerisStore, shared by the strategy
+        strategy: 'nearest' (closest record within 1 h), 'interpolate' (bracketing
+                  records), 'valid' (healthy record within its fit interval) or
+                  'orbit-fit' (Chebyshev arcs over 'interpolate')
+        window, tolerance: Orbit arc window (s) and fit tolerance (m) of 'orbit-fit'
+        max_hold: Hold the first/last record this many seconds ('interpolate', 'orbit-fit')
+    """
+    if strategy == 'orbit-fit':
+        return OrbitFitEphemeris(ephemeris_store, InterpolatedEphemeris(ephemeris_store, max_hold=max_hold),
+                                 window=window, tolerance=tolerance)
+    if strategy == 'interpolate':
+        return InterpolatedEphemeris(ephemeris_store, max_hold=max_hold)
+    if strategy not in EPHEMERIS_STRATEGIES:
+        raise ValueError(f"Unknown ephemeris strategy {strategy!r}, use one of {', '.join(EPHEMERIS_STRATEGIES)}")
+    return EPHEMERIS_STRATEGIES[strategy](ephemeris_store)
+
+def epoch_block(nmea_epochs, nmea_satellites, start, stop, sat_ecef=None):
+    """
+    Epochs start to stop of the NMEA tables, with the satellite rows renumbered to the block
+
+    Returns:
+        tuple: (epochs, satellites) like read_nmea_tables, and the rows of
+               sat_ecef for these satellites (None without sat_ecef)
+    """
+    lo, hi = np.searchsorted(nmea_satellites['epoch'], [start, stop])
+    satellites = nmea_satellites[lo:hi].copy()
+    satellites['epoch'] -= start
+    return nmea_epochs[start:stop], satellites, None if sat_ecef is None else sat_ecef[lo:hi]
+
+def per_row_columns(nmea_epochs, nmea_satellites, strategy, rinex_cache):
+    """
+    Output rows computed one epoch and one satellite at a time
+
+    Reference for batch_columns, with progress messages for every epoch.
+    Arguments as for batch_columns.
+
+    Returns:
+        dict: {OUTPUT_HEADER name: numpy array}
+    """
+    # Satellite table rows of each epoch
+    bounds = np.searchsorted(nmea_satellites['epoch'], np.arange(len(nmea_epochs) + 1))
+
+    # Receiver positions of all epochs in ECEF
+    receiver_ecef = lla_to_ecef(nmea_epochs['lat'], nmea_epochs['lon'], nmea_epochs['alt'])
+
+    rows = []
+
+    for data_idx, epoch in enumerate(nmea_epochs):
+        timestamp = from_seconds(epoch['time'])  # GPS time
+        utc_timestamp = from_seconds(seconds_to_utc(epoch['time']))
+        satellites = nmea_satellites[bounds[data_idx]:bounds[data_idx + 1]]
+        prns = [f"G{prn:02d}" for prn in satellites['prn']]
+        print(f"\nProcessing NMEA group {data_idx + 1}/{len(nmea_epochs)}")
+        print(f"Timestamp: {utc_timestamp}")
+        print(f"Available satellites: {prns}")
+
+        rx_x, rx_y, rx_z = receiver_ecef[data_idx].tolist()
+
+        # Get satellite positions
+        sat_positions = parse_broadcast_ephemeris(strategy.ephemeris_store, timestamp, prns,
+                                                  strategy=strategy)
+
+        # Process each satellite
+        for prn in prns:
+            if prn in sat_positions:
+                sat_pos = sat_positions[prn]
+                carrier_phase, rss = get_carrier_phase_rss(rinex_cache, timestamp, prn)
+
+                # Elevation and azimuth are filled in below
+                rows.append([
+                    utc_timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                    rx_x, rx_y, rx_z,
+                    prn,
+                    sat_pos['x'], sat_pos['y'], sat_pos['z'],
+                    None, None,
+                    carrier_phase,
+                    rss
+                ])
+            else:
+                print(f"No position data found for satellite {prn}")
+
+    # Elevation and azimuth of all rows from the receiver and satellite positions,
+    # instead of the whole degrees reported in $GPGSV
+    positions = np.array([row[1:4] + row[5:8] for row in rows]).reshape(-1, 6)
+    azimuth, elevation = azimuth_elevation(positions[:, :3], positions[:, 3:])
+    for row, el, az in zip(rows, elevation.tolist(), azimuth.tolist()):
+        row[8:10] = el, az
+
+    columns = {name: np.array([row[i] for row in rows]) for i, name in enumerate(OUTPUT_HEADER)}
+    columns['Timestamp'] = columns['Timestamp'].astype('datetime64[us]')
+    return columns
+
+def batch_columns(nmea_epochs, nmea_satellites, strategy, rinex_cache, sat_ecef=None):
+    """
+    Output rows of all (epoch, PRN) pairs computed at once
+
+    Satellite positions, observation lookups and geometry run over whole
+    arrays; the rows are the same as those of per_row_columns.
+
+    Args:
+        nmea_epochs, nmea_satellites: Tables from read_nmea_tables
+        strategy: EphemerisStrategy evaluating the satellite positions (see make_strategy)
+        rinex_cache: Loaded RinexCache
+        sat_ecef: Optional (N, 3) satellite positions of the nmea_satellites rows,
+                  e.g. from the stage cache; strategy is then not used
+
+    Returns:
+        dict: {OUTPUT_HEADER name: numpy array}, Timestamp as datetime64[us]
+    """
+    epochs, observations = batch_tables(nmea_epochs, nmea_satellites, strategy, rinex_cache, sat_ecef=sat_ecef)
+    return flatten_tables(epochs, observations)
+
+def batch_tables(nmea_epochs, nmea_satellites, strategy, rinex_cache, sat_ecef=None):
+    """
+    Normalized output: an epochs table and an observations table
+
+    Receiver state is computed and stored once per epoch; each observation
+    row refers to its epoch by the integer 'Epoch' id (the NMEA epoch index).
+    Arguments as for batch_columns.
+
+    Returns:
+        tuple: (epochs, observations) dicts of numpy arrays, with the
+               EPOCH_COLUMNS and OBSERVATION_COLUMNS
+    """
+    # One entry per (epoch, PRN) pair
+    epoch_ids = nmea_satellites['epoch']
+    times = nmea_epochs['time'][epoch_ids]
+    prns = np.char.add('G', np.char.zfill(nmea_satellites['prn'].astype(str), 2))
+
+    if sat_ecef is None:
+        sat_ecef = strategy.positions(times, prns)
+    found = np.isfinite(sat_ecef).all(axis=1)
+    for epoch_id, prn in zip(epoch_ids[~found].tolist(), prns[~found].tolist()):
+        print(f"No position data found for satellite {prn} at {from_seconds(seconds_to_utc(nmea_epochs['time'][epoch_id]))}")
+    epoch_ids, times, prns, sat_ecef = epoch_ids[found], times[found], prns[found], sat_ecef[found]
+
+    # Receiver position and local frame once per epoch
+    receiver_ecef = lla_to_ecef(nmea_epochs['lat'], nmea_epochs['lon'], nmea_epochs['alt'])
+    frame_lat, frame_lon, _ = ecef_to_lla(receiver_ecef)
+    azimuth, elevation = azimuth_elevation(receiver_ecef[epoch_ids], sat_ecef,
+                                           receiver_lla=(frame_lat[epoch_ids], frame_lon[epoch_ids]))
+    carrier_phase, rss = carrier_phase_rss(rinex_cache, times, prns)
+
+    # UTC timestamps as in the NMEA input, same rounding to microseconds as from_seconds
+    microseconds = np.round(seconds_to_utc(nmea_epochs['time']) * 1e6).astype(np.int64)
+    timestamps = np.datetime64(GPS_EPOCH, 'us') + microseconds.astype('timedelta64[us]')
+
+    epochs = dict(zip(EPOCH_COLUMNS, [np.arange(len(nmea_epochs), dtype=np.int32), timestamps,
+                                      *receiver_ecef.T, nmea_epochs['lat'], nmea_epochs['lon'],
+                                      nmea_epochs['alt']]))
+    observations = dict(zip(OBSERVATION_COLUMNS, [epoch_ids.astype(np.int32), prns, *sat_ecef.T,
+                                                  elevation, azimuth, carrier_phase, rss]))
+    return epochs, observations
+
+def flatten_tables(epochs, observations):
+    """Flat OUTPUT_HEADER columns from the normalized tables of batch_tables"""
+    rows = observations['Epoch']  # Epoch ids are the rows of the epochs table
+    return {name: observations[name] if name in observations else epochs[name][rows]
+            for name in OUTPUT_HEADER}
+
+def normalized_files(output_file):
+    """Epochs and observations files of the normalized layout, e.g. ant0_epochs.npz, ant0_observations.npz"""
+    root, extension = os.path.splitext(output_file)
+    return f"{root}_epochs{extension}", f"{root}_observations{extension}"
+
+def find_antennas(session_root):
+    """
+    Antenna directories of a session, e.g. 12_27_4_ants/12_27_ant0 ... 12_27_ant3
+
+    Returns:
+        dict: {antenna name ('ant0', ...): directory}, ordered by antenna number
+    """
+    antennas = []
+    for name in os.listdir(session_root):
+        match = re.search(r"ant(\d+)$", name)
+        if match and os.path.isdir(os.path.join(session_root, name)):
+            antennas.append((int(match.group(1)), os.path.join(session_root, name)))
+    return {f"ant{number}": directory for number, directory in sorted(antennas)}
+
+def find_session_files(antenna_dir):
+    """
+    Input files GNSS-SDR wrote for one antenna
+
+    Returns:
+        dict: 'nmea', 'rinex_obs' and 'session_ephemeris' paths, None where missing
+    """
+    def first(patterns):
+        for pattern in patterns:
+            for suffix in ('', '.gz', '.Z'):
+                matches = sorted(glob.glob(os.path.join(antenna_dir, pattern + suffix)))
+                if matches:
+                    return matches[0]
+        return None
+
+    return {
+        'nmea': first(['*.nmea']),
+        'rinex_obs': first(['*.[0-9][0-9][Oo]', '*.[0-9][0-9][Dd]', '*.rnx', '*.crx']),
+        'session_ephemeris': first(['gps_ephemeris.xml']),
+    }
+
+def find_broadcast_ephemeris(session_root):
+    """Broadcast ephemeris file in the session directory (brdc*.24n, BRDM*.rnx, ...), or None"""
+    for name in sorted(os.listdir(session_root)):
+        base = strip_compression_suffix(name)
+        if re.search(r"\.\d\d[nN]$", base) or re.search(r"_[MG]N\.rnx$", base):
+            return os.path.join(session_root, name)
+    return None
+
+def load_job(job_file):
+    """
+    Read job options from a TOML or INI file, [session] table/section
+
+    Example (INI; in TOML, quote the strings and write antennas as a list):
+
+        [session]
+        root = 12_27_4_ants
+        output_dir = data
+        antennas = ant0, ant2
+        workers = 4
+
+    Returns:
+        dict: Options with JOB_DEFAULTS filled in, paths relative to the job file
+    """
+    if job_file.endswith('.toml'):
+        if tomllib is None:
+            raise RuntimeError("TOML job files need Python 3.11+ (tomllib); use an INI file instead")
+        with open(job_file, 'rb') as f:
+            section = tomllib.load(f).get('session', {})
+    else:
+        parser = configparser.ConfigParser()
+        if not parser.read(job_file):
+            raise FileNotFoundError(job_file)
+        section = dict(parser['session']) if parser.has_section('session') else {}
+        for key in ('session_ephemeris', 'batch', 'resume', 'cache', 'position_memo'):
+            if key in section:
+                section[key] = parser.getboolean('session', key)
+        if 'workers' in section:
+            section['workers'] = parser.getint('session', 'workers')
+        for key in ('memo_quantum', 'max_phase_gap'):
+            if key in section:
+                section[key] = parser.getfloat('session', key)
+        if 'antennas' in section:
+            section['antennas'] = [name.strip() for name in section['antennas'].split(',') if name.strip()]
+
+    unknown = set(section) - set(JOB_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown job options in {job_file}: {', '.join(sorted(unknown))}")
+
+    options = dict(JOB_DEFAULTS, **section)
+    base_dir = os.path.dirname(os.path.abspath(job_file))
+    for key in ('root', 'output_dir', 'broadcast_ephemeris', 'cache_dir'):
+        if options[key] is not None:
+            options[key] = os.path.join(base_dir, os.path.expanduser(options[key]))
+    return options
+
+def plan_job(options):
+    """
+    Resolve the per-antenna inputs and outputs of a job
+
+    Returns:
+        list: (antenna name, process_antenna keyword arguments) tuples
+    """
+    root = options['root']
+    antennas = find_antennas(root)
+    if options['antennas']:
+        missing = set(options['antennas']) - set(antennas)
+        if missing:
+            raise ValueError(f"Antennas not found in {root}: {', '.join(sorted(missing))}")
+        antennas = {name: directory for name, directory in antennas.items() if name in options['antennas']}
+    if not antennas:
+        raise ValueError(f"No antenna directories (…ant0, …ant1, …) found in {root}")
+
+    broadcast_file = None
+    if not options['session_ephemeris']:
+        broadcast_file = options['broadcast_ephemeris'] or find_broadcast_ephemeris(root)
+        if broadcast_file is None:
+            raise ValueError(f"No broadcast ephemeris file found in {root}; "
+                             f"give broadcast_ephemeris or use the session ephemeris")
+
+    table_format(f"output.{options['output_format']}")  # Raises for unknown formats
+    if options['ephemeris_strategy'] not in EPHEMERIS_STRATEGIES:
+        raise ValueError(f"Unknown ephemeris strategy {options['ephemeris_strategy']!r}, "
+                         f"use one of {', '.join(EPHEMERIS_STRATEGIES)}")
+    if options['layout'] not in ('flat', 'normalized'):
+        raise ValueError(f"Unknown layout {options['layout']!r}, use flat or normalized")
+    if options['layout'] == 'normalized' and not options['batch']:
+        raise ValueError("The normalized layout is only written by the batch pipeline")
+
+    tasks = []
+    for name, directory in antennas.items():
+        files = find_session_files(directory)
+        ephemeris_file = files['session_ephemeris'] if options['session_ephemeris'] else broadcast_file
+        missing = [label for label, path in (('NMEA', files['nmea']), ('RINEX observation', files['rinex_obs']),
+                                             ('ephemeris', ephemeris_file)) if path is None]
+        if missing:
+            print(f"Skipping {name}: no {', '.join(missing)} file in {directory}")
+            continue
+        tasks.append((name, {
+            'nmea_file': files['nmea'],
+            'rinex_obs_file': files['rinex_obs'],
+            'ephemeris_file': ephemeris_file,
+            'output_file': os.path.join(options['output_dir'], f"{name}.{options['output_format']}"),
+            'use_session_ephemeris': options['session_ephemeris'],
+            'cache_dir': options['cache_dir'],
+            'batch': options['batch'],
+            'layout': options['layout'],
+            'resume': options['resume'],
+            'use_cache': options['cache'],
+            'ephemeris_strategy': options['ephemeris_strategy'],
+            'max_phase_gap': options['max_phase_gap'],
+        }))
+    return tasks
+
+def run_job(options):
+    """
+    Process all antennas of a job in parallel processes
+
+    Each antenna writes <output_dir>/<antenna>.<output_format>; its progress messages go
+    to <output_dir>/<antenna>.log.
+
+    Returns:
+        list: Summary dict per antenna, in antenna order
+    """
+    tasks = plan_job(options)
+    os.makedirs(options['output_dir'], exist_ok=True)
+    workers = min(options['workers'] or os.cpu_count() or 1, max(len(tasks), 1))
+
+    # With several antennas, parallel workers share one position memo in shared memory
+    # and a single worker keeps its own; a single antenna has nothing to share
+    position_memo = options['position_memo'] and len(tasks) > 1
+    shared_memo = None
+    if position_memo and workers > 1:
+        shared_memo = SharedPositionMemo(quantum=options['memo_quantum'])
+    memo_args = (position_memo, options['memo_quantum'],
+                 shared_memo.share() if shared_memo is not None else None)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=memo_args) as pool:
+            futures = [(name, kwargs, pool.submit(_process_antenna_logged, kwargs)) for name, kwargs in tasks]
+            summaries = []
+            for name, kwargs, future in futures:
+                summary = {'antenna': name, 'output_file': kwargs['output_file']}
+                try:
+                    summary.update(future.result())
+                except Exception as e:
+                    summary['error'] = str(e)
+                summaries.append(summary)
+    finally:
+        if shared_memo is not None:
+            shared_memo.close()
+    return summaries
+
+def _init_worker(position_memo, memo_quantum, shared_memo):
+    """Set up the position memo of a pool worker: none, its own, or the job's shared one"""
+    if not position_memo:
+        set_process_memo(None)
+    elif shared_memo is not None:
+        set_process_memo(SharedPositionMemo(*shared_memo))
+    else:
+        set_process_memo(PositionMemo(quantum=memo_quantum))
+
+def _process_antenna_logged(kwargs):
+    """process_antenna with its messages written to a log file next to the output"""
+    log_file = os.path.splitext(kwargs['output_file'])[0] + '.log'
+    start = time.perf_counter()
+    with open(log_file, 'w') as log, contextlib.redirect_stdout(log):
+        summary = process_antenna(**kwargs)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+def print_summary(summaries):
+    """Print one line per antenna"""
+    print(f"{'Antenna':<8} {'Epochs':>7} {'New':>7} {'Rows':>8} {'Time (s)':>9}  Output")
+    for summary in summaries:
+        if 'error' in summary:
+            print(f"{summary['antenna']:<8} failed: {summary['error']}")
+            continue
+        print(f"{summary['antenna']:<8} {summary['epochs']:>7} {summary['new_epochs']:>7} {summary['rows']:>8} "
+              f"{summary['seconds']:>9.1f}  {summary['output_file']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute receiver/satellite geometry, carrier phase and RSS for every antenna of a session")
+    parser.add_argument('session', help="session directory holding ant0..antN directories (e.g. 12_27_4_ants), "
+                                        "or a .toml/.ini job file")
+    parser.add_argument('--output-dir', help=f"directory for the antenna tables (default: {JOB_DEFAULTS['output_dir']})")
+    parser.add_argument('--format', dest='output_format', choices=sorted({ext[1:] for ext in TABLE_FORMATS}),
+                        help="output table format (default: csv)")
+    parser.add_argument('--layout', choices=['flat', 'normalized'],
+                        help="flat: one row per observation with the receiver state repeated (default); "
+                             "normalized: <antenna>_epochs and <antenna>_observations tables")
+    parser.add_argument('--broadcast-ephemeris', help="broadcast ephemeris file (default: found in the session directory)")
+    parser.add_argument('--session-ephemeris', action='store_true', default=None,
+                        help="use each antenna's gps_ephemeris.xml instead of the broadcast ephemeris")
+    parser.add_argument('--antennas', help="comma-separated antenna names, e.g. ant0,ant2 (default: all)")
+    parser.add_argument('--workers', type=int, help="parallel processes (default: one per antenna)")
+    parser.add_argument('--resume', action='store_true', default=None,
+                        help="continue interrupted outputs and process only epochs added since the last run")
+    parser.add_argument('--ephemeris-strategy', choices=list(EPHEMERIS_STRATEGIES),
+                        help="nearest: closest record within 1 h; interpolate: bracketing records; "
+                             "valid: healthy record within its fit interval; "
+                             "orbit-fit: Chebyshev arcs over interpolate (default)")
+    parser.add_argument('--max-phase-gap', type=float,
+                        help="seconds from an NMEA epoch to the nearest RINEX epoch beyond which carrier "
+                             f"phase and RSS are 0.0 (default: {JOB_DEFAULTS['max_phase_gap']}, 0 for no limit)")
+    parser.add_argument('--no-memo', dest='position_memo', action='store_false', default=None,
+                        help="compute every satellite position instead of sharing them between antennas")
+    parser.add_argument('--memo-quantum', type=float,
+                        help="share positions of times within this many seconds, evaluated at the "
+                             "rounded time (default: 0, exact times only)")
+    parser.add_argument('--no-cache', dest='cache', action='store_false', default=None,
+                        help="parse all inputs and compute all positions again instead of using the stage cache")
+    parser.add_argument('--per-row', dest='batch', action='store_false', default=None,
+                        help="compute one epoch and satellite at a time (slow reference for the batch pipeline)")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.session):
+        options = dict(JOB_DEFAULTS, root=args.session)
+    else:
+        options = load_job(args.session)
+
+    # Command-line options override the job file
+    for key in ('output_dir', 'output_format', 'layout', 'broadcast_ephemeris', 'session_ephemeris',
+                'workers', 'batch', 'resume', 'cache', 'ephemeris_strategy', 'position_memo', 'memo_quantum',
+                'max_phase_gap'):
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+    if args.antennas:
+        options['antennas'] = [name.strip() for name in args.antennas.split(',') if name.strip()]
+    if options['root'] is None:
+        parser.error(f"{args.session} does not set the session root")
+
+    start = time.perf_counter()
+    summaries = run_job(options)
+    print_summary(summaries)
+    print(f"Processed {len(summaries)} antennas in {time.perf_counter() - start:.1f} s")
+    return 1 if any('error' in summary for summary in summaries) else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,410 @@
+import numpy as np
+from datetime import datetime, timedelta
+from compression import CHUNK_SIZE, open_binary
+from ephemeris import GPS_EPOCH, leap_seconds
+
+# Value of each byte as a hex digit, -256 if it is not one
+_HEX_VALUES = np.full(256, -256, dtype=np.int64)
+for _digits, _first in ((b"0123456789", 0), (b"ABCDEF", 10), (b"abcdef", 10)):
+    _HEX_VALUES[np.frombuffer(_digits, dtype=np.uint8)] = np.arange(_first, _first + len(_digits))
+
+# Epoch table: one row per valid $GPRMC/$GPGGA fix
+NMEA_EPOCH_DTYPE = np.dtype([
+    ('time', np.float64),  # GPS seconds since the GPS epoch (UTC + leap seconds)
+    ('lat', np.float64),   # Degrees
+    ('lon', np.float64),   # Degrees
+    ('alt', np.float64),   # Meters above mean sea level
+    ('fix', np.int8),      # GGA fix quality
+    ('hdop', np.float32),
+])
+
+# Satellite table: one row per satellite in view ($GPGSV) and epoch
+NMEA_SATELLITE_DTYPE = np.dtype([
+    ('epoch', np.int32),  # Row in the epoch table
+    ('prn', np.int8),
+    ('elevation', np.float32),  # Degrees, NaN if not given
+    ('azimuth', np.float32),    # Degrees, NaN if not given
+    ('snr', np.float32),        # dB-Hz, NaN if not tracked
+])
+
+# Epochs converted from Python rows to arrays at a time
+TABLE_BLOCK_EPOCHS = 4096
+
+# Bump when the table layout or parsing changes to invalidate cached tables
+NMEA_CACHE_VERSION = 2
+
+def nmea_checksum(body):
+    """XOR of all bytes of a sentence between '$' and '*'"""
+    checksum = 0
+    for byte in body:
+        checksum ^= byte
+    return checksum
+
+def check_nmea_sentence(line):
+    """
+    Validate the checksum of one NMEA line
+
+    Args:
+        line: Raw line (bytes), with or without the line ending
+
+    Returns:
+        str: Sentence from '$' up to, not including, the '*', or None if
+             the checksum is missing or wrong
+    """
+    line = line.strip()
+    star = line.rfind(b'*')
+    if line[:1] != b'$' or star < 1 or len(line) - star != 3:
+        return None
+    try:
+        if int(line[star + 1:], 16) != nmea_checksum(line[1:star]):
+            return None
+    except ValueError:
+        return None
+    return line[:star].decode('latin-1')
+
+def read_nmea_sentences(nmea_file, size=None):
+    """
+    Stream the sentences of an NMEA file whose checksum is valid
+
+    The file is read in large chunks and the checksums of all complete lines
+    of a chunk are computed at once, so memory stays constant however long
+    the session is. Sentences without a '*hh' checksum or with a wrong one
+    are reported and skipped.
+
+    Args:
+        nmea_file: Path to NMEA file, optionally compressed
+        size: Read only the first size bytes of the file, None for all of it
+
+    Yields:
+        str: Sentence from '$' up to, not including, the '*'
+    """
+    with open_binary(nmea_file, size) as f:
+        pending = b""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            block = pending + chunk
+            # Keep a partial last line for the next chunk
+            cut = block.rfind(b"\n") + 1 if chunk else len(block)
+            pending = block[cut:]
+            yield from _checked_sentences(block[:cut])
+            if not chunk:
+                break
+
+def _checked_sentences(block):
+    """Sentences of complete lines in block whose checksum is valid"""
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    if not len(buffer):
+        return
+
+    ends = np.flatnonzero(buffer == ord('\n'))
+    if not len(ends) or ends[-1] != len(buffer) - 1:
+        ends = np.append(ends, len(buffer))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # First and last non-blank byte of each line, and its last '*'
+    text = np.flatnonzero(buffer > ord(' '))
+    if not len(text):
+        return
+    first = text[np.minimum(np.searchsorted(text, starts), len(text) - 1)]
+    last = text[np.maximum(np.searchsorted(text, ends) - 1, 0)]
+    blank = (first >= ends) | (last < starts)
+    stars = np.flatnonzero(buffer == ord('*'))
+    star = stars[np.maximum(np.searchsorted(stars, ends) - 1, 0)] if len(stars) else starts
+    starts = first
+    valid = ~blank & (star > starts) & (last - star == 2) & (buffer[starts] == ord('$'))
+
+    padded = np.append(buffer, np.zeros(3, dtype=np.uint8))
+    expected = _HEX_VALUES[padded[star + 1]] * 16 + _HEX_VALUES[padded[star + 2]]
+    valid &= expected >= 0
+
+    # XOR of each body; reduceat needs increasing, non-empty ranges
+    bodies = valid & (star > starts + 1)
+    bounds = np.column_stack((starts[bodies] + 1, star[bodies])).ravel()
+    checksum = np.zeros(len(starts), dtype=np.int64)
+    if len(bounds):
+        checksum[bodies] = np.bitwise_xor.reduceat(buffer, bounds)[::2]
+    valid &= checksum == expected
+
+    for start, stop, end, ok, skip in zip(starts.tolist(), star.tolist(), (last + 1).tolist(),
+                                          valid.tolist(), blank.tolist()):
+        if ok:
+            yield block[start:stop].decode('latin-1')
+        elif not skip:
+            print(f"Invalid NMEA sentence: {block[start:end].decode('latin-1')}")
+
+def read_nmea_groups(nmea_file, size=None):
+    """
+    Stream the checksum-valid sentences of an NMEA file grouped by epoch
+
+    A group starts at each $GPRMC sentence; sentences before the first one
+    form a group of their own.
+
+    Args:
+        nmea_file: Path to NMEA file
+        size: Read only the first size bytes of the file, None for all of it
+
+    Yields:
+        list: Sentences of one epoch, see read_nmea_sentences
+    """
+    current_group = []
+
+    for line in read_nmea_sentences(nmea_file, size):
+        # Start of a new group when we see RMC message
+        if line.startswith('$GPRMC') and current_group:
+            yield current_group
+            current_group = []
+        current_group.append(line)
+
+    if current_group:
+        yield current_group
+
+def iter_nmea_data(nmea_file):
+    """
+    Stream NMEA epochs, one dict per $GPRMC-started group of sentences
+
+    Args:
+        nmea_file: Path to NMEA file
+
+    Yields:
+        dict: Parsed epoch, see process_nmea_group
+    """
+    for group in read_nmea_groups(nmea_file):
+        try:
+            parsed_data = process_nmea_group(group)
+            if parsed_data:
+                yield parsed_data
+        except (ValueError, IndexError) as e:
+            print(f"Error processing NMEA group: {e}")
+
+def parse_nmea_data(nmea_file):
+    """Parse NMEA file to extract timestamp, position and satellite information"""
+    return list(iter_nmea_data(nmea_file))
+
+def read_nmea_tables(nmea_file, cache=None, size=None):
+    """
+    Parse an NMEA file into an epoch table and a satellite table
+
+    Columnar alternative to parse_nmea_data: one row per valid epoch in
+    `epochs` (NMEA_EPOCH_DTYPE) and one row per satellite in view and epoch in
+    `satellites` (NMEA_SATELLITE_DTYPE), whose 'epoch' column indexes
+    `epochs`. The satellites of an epoch are collected from all pages of its
+    $GPGSV sequence, in the order they are listed.
+
+    Args:
+        nmea_file: Path to NMEA file
+        cache: Optional FileCache; the tables are reused while the file is unchanged
+        size: Read only the first size bytes of the file, None for all of it;
+              the cache is only used while that is the whole file
+
+    Returns:
+        tuple: (epochs, satellites) numpy structured arrays
+    """
+    if cache is not None and cache.whole_file(nmea_file, size):
+        key = cache.key(f"nmea-v{NMEA_CACHE_VERSION}", nmea_file)
+        tables = cache.load_arrays(key)
+        if (tables is not None and tables['epochs'].dtype == NMEA_EPOCH_DTYPE and
+                cache.whole_file(nmea_file, size)):
+            return tables['epochs'], tables['satellites']
+        epochs, satellites = read_nmea_tables(nmea_file, size=size)
+        # Not saved if the file has grown past size since the key was taken
+        if cache.whole_file(nmea_file, size):
+            cache.save_arrays(key, {'epochs': epochs, 'satellites': satellites})
+        return epochs, satellites
+
+    epoch_parts, satellite_parts = [], []
+    epoch_rows, satellite_rows = [], []
+    n_epochs = 0
+
+    for group in read_nmea_groups(nmea_file, size):
+        try:
+            parsed = _nmea_table_rows(group)
+        except (ValueError, IndexError) as e:
+            print(f"Error processing NMEA group: {e}")
+            continue
+        if parsed is None:
+            continue
+
+        epoch_row, satellites = parsed
+        epoch_rows.append(epoch_row)
+        satellite_rows.extend((n_epochs, prn) + values for prn, values in satellites.items())
+        n_epochs += 1
+
+        # Convert to arrays as we go, so long sessions are not held as Python tuples
+        if len(epoch_rows) == TABLE_BLOCK_EPOCHS:
+            epoch_parts.append(np.array(epoch_rows, dtype=NMEA_EPOCH_DTYPE))
+            satellite_parts.append(np.array(satellite_rows, dtype=NMEA_SATELLITE_DTYPE))
+            epoch_rows, satellite_rows = [], []
+
+    epoch_parts.append(np.array(epoch_rows, dtype=NMEA_EPOCH_DTYPE))
+    satellite_parts.append(np.array(satellite_rows, dtype=NMEA_SATELLITE_DTYPE))
+    return np.concatenate(epoch_parts), np.concatenate(satellite_parts)
+
+def _nmea_table_rows(group):
+    """Epoch row and {prn: (elevation, azimuth, snr)} of one group, or None without a valid fix"""
+    rmc = group[0].split(',')
+    if rmc[0] != '$GPRMC' or len(rmc) < 10 or rmc[2] != 'A':
+        return None
+    _, seconds = nmea_time(rmc[9], rmc[1])
+
+    gga = None
+    satellites = {}
+    page = 0
+    for line in group[1:]:
+        if gga is None and line.startswith('$GPGGA'):
+            gga = line.split(',')
+        elif line.startswith('$GPGSV'):
+            gsv = line.split(',')
+            number = int(gsv[2])
+            if number == 1:
+                satellites = {}  # A new sequence replaces any earlier one
+            elif number != page + 1:
+                print(f"Skipping out of sequence GSV page {number}/{gsv[1]}")
+                continue
+            page = number
+
+            # Blocks of PRN, elevation, azimuth, SNR; NMEA 4.1 appends a signal ID
+            for j in range(4, 4 + (len(gsv) - 4) // 4 * 4, 4):
+                if gsv[j] and 0 < int(gsv[j]) < 128:
+                    satellites[int(gsv[j])] = (float(gsv[j + 1] or 'nan'), float(gsv[j + 2] or 'nan'),
+                                               float(gsv[j + 3] or 'nan'))
+
+    if gga is None or len(gga) < 10:
+        return None
+    try:
+        lat = convert_nmea_to_decimal(float(gga[2]), gga[3])
+        lon = convert_nmea_to_decimal(float(gga[4]), gga[5])
+        alt = float(gga[9])
+    except ValueError:
+        return None
+
+    epoch_row = (seconds, lat, lon, alt, int(gga[6] or 0), float(gga[8] or 'nan'))
+    return epoch_row, satellites
+
+# NMEA dates (ddmmyy) decoded so far, format: {date_str: (UTC datetime at 00:00, GPS microseconds since the GPS epoch)}
+_nmea_dates = {}
+
+def nmea_time(date_str, time_str):
+    """
+    Decode the date (ddmmyy) and UTC time (hhmmss.sss) fields of an NMEA sentence
+
+    Gives the same datetime as datetime.strptime(date_str + time_str,
+    "%d%m%y%H%M%S.%f"), but only the first sentence of each date is parsed
+    with strptime; the time of day is decoded with integer arithmetic.
+
+    The seconds are GPS time, which the ephemerides and RINEX observations
+    use: the UTC time plus the leap seconds of the date (GPS_UTC_LEAP_SECONDS
+    since 2017).
+
+    Args:
+        date_str: Date field, e.g. '271224'
+        time_str: Time field, e.g. '024348.39'
+
+    Returns:
+        tuple: (UTC datetime, GPS seconds since the GPS epoch as float)
+
+    Raises:
+        ValueError: if a field is not a valid date or time
+    """
+    date = _nmea_dates.get(date_str)
+    if date is None:
+        day = datetime.strptime(date_str, "%d%m%y")
+        microseconds = (day - GPS_EPOCH + timedelta(seconds=leap_seconds(day))) // timedelta(microseconds=1)
+        date = _nmea_dates[date_str] = (day, microseconds)
+
+    if (not 8 <= len(time_str) <= 13 or time_str[6] != '.' or
+            not time_str[:6].isdigit() or not time_str[7:].isdigit()):
+        raise ValueError(f"time data {time_str!r} does not match format 'hhmmss.sss'")
+    hour = int(time_str[:2])
+    minute = int(time_str[2:4])
+    second = int(time_str[4:6])
+    microsecond = int(time_str[7:].ljust(6, '0'))
+
+    # Raises ValueError for an hour, minute or second out of range, as strptime does
+    timestamp = date[0].replace(hour=hour, minute=minute, second=second, microsecond=microsecond)
+    microseconds = date[1] + ((hour * 60 + minute) * 60 + second) * 1000000 + microsecond
+    # Integer division is correctly rounded, so this equals utc_to_seconds(timestamp)
+    return timestamp, microseconds / 1000000
+
+def process_nmea_group(group):
+    """Process a group of NMEA messages that belong together"""
+    if len(group) < 3:  # Need at least RMC, GGA and GSA
+        return None
+        
+    try:
+        # Parse RMC line for timestamp and validity
+        rmc_parts = group[0].split(',')
+        if len(rmc_parts) < 10 or rmc_parts[2] != 'A':
+            return None
+            
+        time_str = rmc_parts[1]
+        date_str = rmc_parts[9]
+        
+        # Parse GGA line for position
+        gga_parts = group[1].split(',')
+        if len(gga_parts) < 10:
+            return None
+            
+        try:
+            lat = float(gga_parts[2])
+            lat_dir = gga_parts[3]
+            lon = float(gga_parts[4])
+            lon_dir = gga_parts[5]
+            alt = float(gga_parts[9])
+        except ValueError:
+            return None
+        
+        # Convert coordinates
+        lat_dec = convert_nmea_to_decimal(lat, lat_dir)
+        lon_dec = convert_nmea_to_decimal(lon, lon_dir)
+        
+        # Process all GSV messages to get complete satellite info
+        satellites = []
+        signal_strength = {}
+        elevation_angles = {}    
+        azimuth_angles = {}     
+        
+        for line in group:
+            if line.startswith('$GPGSV'):
+                gsv_parts = line.split(',')
+                # Process satellite info from GSV message
+                for j in range(4, len(gsv_parts)-1, 4):
+                    if j+3 < len(gsv_parts):
+                        prn = gsv_parts[j]
+                        if prn:
+                            sat_id = f"G{prn}"
+                            satellites.append(sat_id)
+                            # Add ele, azi, rss
+                            try:
+                                elevation_angles[sat_id] = float(gsv_parts[j+1])
+                                azimuth_angles[sat_id] = float(gsv_parts[j+2])
+                                signal_strength[sat_id] = float(gsv_parts[j+3])
+                            except (ValueError, IndexError):
+                                continue
+        
+        # Build timestamp
+        timestamp, seconds = nmea_time(date_str, time_str)
+        
+        return {
+            'timestamp': timestamp,
+            'time': seconds,  # Seconds since the GPS epoch
+            'lat': lat_dec,
+            'lon': lon_dec,
+            'alt': alt,
+            'satellites': satellites,
+            'signal_strength': signal_strength,
+            'elevation_angles': elevation_angles,    
+            'azimuth_angles': azimuth_angles        
+        }
+        
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Error processing NMEA group: {e}")
+
+def convert_nmea_to_decimal(coord, direction):
+    """Convert NMEA coordinate format to decimal degrees"""
+    degrees = int(coord / 100)
+    minutes = coord - degrees * 100
+    decimal = degrees + minutes / 60
+    
+    if direction in ['S', 'W']:
+        decimal = -decimal
+    return decimal
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import os
+import re
+import termios
+import tty
+from nmea import check_nmea_sentence, nmea_time, process_nmea_group
+
+# Longest line accepted from a live source (bytes)
+MAX_LINE_LENGTH = 4096
+
+async def open_nmea_source(source):
+    """
+    Open a live NMEA source for reading
+
+    Args:
+        source: 'host:port' or 'tcp://host:port' for a TCP server (e.g. the
+                gnss-sdr NMEA TCP output or serve_nmea_replay), otherwise the
+                path of a serial device or pseudo-terminal
+
+    Returns:
+        tuple: (asyncio.StreamReader, connection to close() when done)
+    """
+    match = re.fullmatch(r"(?:tcp://)?([^/:]*):(\d+)", source)
+    if match:
+        return await asyncio.open_connection(match.group(1) or '127.0.0.1', int(match.group(2)),
+                                             limit=MAX_LINE_LENGTH)
+
+    fd = os.open(source, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    if os.isatty(fd):
+        tty.setraw(fd, termios.TCSANOW)  # No echo or line editing on the device
+    reader = asyncio.StreamReader(limit=MAX_LINE_LENGTH)
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                                os.fdopen(fd, 'rb', 0))
+    return reader, transport
+
+async def ingest_nmea(source, queue, max_latency=0.5, reconnect_delay=None):
+    """
+    Read NMEA epochs from a live source into an asyncio.Queue
+
+    Sentences are checksum-validated and grouped from one $GPRMC to the next.
+    A group is handed on as soon as it is complete: at the last page of its
+    $GPGSV sequence, at the next $GPRMC, or when no line has arrived for
+    max_latency seconds. Each epoch is parsed with process_nmea_group.
+
+    A bounded queue (asyncio.Queue(maxsize=...)) gives backpressure: while it
+    is full, reading pauses and the source is held back by TCP/pty flow
+    control instead of buffering without limit.
+
+    Args:
+        source: See open_nmea_source
+        queue: asyncio.Queue receiving epoch dicts, then None when the source ends
+        max_latency: Longest time (s) a started group waits for more sentences
+        reconnect_delay: Seconds to wait before reconnecting after the source
+                         closes or fails, None to stop instead
+    """
+    while True:
+        try:
+            reader, connection = await open_nmea_source(source)
+            try:
+                await _read_epochs(reader, queue, max_latency)
+            finally:
+                connection.close()
+        except OSError as e:
+            print(f"NMEA source {source} failed: {e}")
+
+        if reconnect_delay is None:
+            await queue.put(None)
+            return
+        print(f"Reconnecting to {source} in {reconnect_delay} s")
+        await asyncio.sleep(reconnect_delay)
+
+async def _read_epochs(reader, queue, max_latency):
+    """Group the sentences from reader into epochs until it ends"""
+    group = []
+
+    async def flush():
+        if not group:
+            return
+        try:
+            parsed_data = process_nmea_group(group)
+            if parsed_data:
+                await queue.put(parsed_data)
+        except (ValueError, IndexError) as e:
+            print(f"Error processing NMEA group: {e}")
+        group.clear()
+
+    while True:
+        try:
+            line = await asyncio.wait_for(reader.readline(), max_latency if group else None)
+        except asyncio.TimeoutError:
+            await flush()
+            continue
+        except ValueError:
+            # readline has dropped the line, or the part of it that had arrived; the rest
+            # then comes in as an invalid sentence. The epoch it was part of is incomplete
+            print("Skipping over-long NMEA line")
+            group.clear()
+            continue
+        if not line:
+            await flush()
+            return
+
+        sentence = check_nmea_sentence(line)
+        if sentence is None:
+            if line.strip():
+                print(f"Invalid NMEA sentence: {line.decode('latin-1').strip()}")
+            continue
+
+        if sentence.startswith('$GPRMC'):
+            await flush()
+            group.append(sentence)
+        elif group:
+            group.append(sentence)
+            fields = sentence.split(',')
+            if fields[0] == '$GPGSV' and len(fields) > 2 and fields[1] == fields[2]:
+                await flush()  # Last page of the satellites in view closes the epoch
+
+async def serve_nmea_replay(nmea_file, host='127.0.0.1', port=0, speed=1.0, loop_file=False):
+    """
+    Stand-in for a live receiver: serve a recorded NMEA file over TCP
+
+    Every client gets the file from the start, one $GPRMC group at a time at
+    its original rate (scaled by speed), taken from the RMC timestamps.
+
+    Args:
+        nmea_file: Path to an NMEA file, e.g. nmea_pvt.nmea
+        host: Interface to listen on
+        port: TCP port, 0 for any free port (see server.sockets[0].getsockname())
+        speed: Replay rate relative to real time
+        loop_file: Start over at the end of the file instead of closing the connection
+
+    Returns:
+        asyncio.Server, already serving
+    """
+    groups = _replay_groups(nmea_file)
+
+    async def replay(reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                start_time = None
+                for seconds, data in groups:
+                    if start_time is None and seconds is not None:
+                        start_time, start_seconds = loop.time(), seconds
+                    if start_time is not None:
+                        delay = start_time + (seconds - start_seconds) / speed - loop.time()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    writer.write(data)
+                    await writer.drain()
+                if not loop_file:
+                    break
+        except ConnectionError:
+            pass  # Client went away
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(replay, host, port)
+
+def _replay_groups(nmea_file):
+    """(seconds since the GPS epoch or None, raw bytes) of each $GPRMC group of a file"""
+    groups = []
+    last_seconds = None
+    with open(nmea_file, 'rb') as f:
+        for line in f:
+            if line.startswith(b'$GPRMC') or not groups:
+                fields = line.split(b',')
+                try:
+                    last_seconds = nmea_time(fields[9].decode(), fields[1].decode())[1]
+                except (IndexError, ValueError, UnicodeDecodeError):
+                    pass  # Keep the time of the previous group
+                groups.append([last_seconds, b""])
+            groups[-1][1] += line
+    return groups
+
+async def _print_epochs(source, max_latency):
+    queue = asyncio.Queue(maxsize=100)
+    ingest = asyncio.create_task(ingest_nmea(source, queue, max_latency))
+    while (data := await queue.get()) is not None:
+        print(f"{data['timestamp']} lat {data['lat']:.7f} lon {data['lon']:.7f} alt {data['alt']:.3f} "
+              f"satellites {data['satellites']}")
+    await ingest
+
+async def _replay(nmea_file, host, port, speed, loop_file):
+    server = await serve_nmea_replay(nmea_file, host, port, speed, loop_file)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"Replaying {nmea_file} on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live NMEA ingest and replay")
+    commands = parser.add_subparsers(dest='command', required=True)
+    listen = commands.add_parser('listen', help="print epochs from a TCP port or serial/pty device")
+    listen.add_argument('source', help="host:port or device path")
+    listen.add_argument('--max-latency', type=float, default=0.5)
+    replay = commands.add_parser('replay', help="serve an NMEA file at its original rate")
+    replay.add_argument('nmea_file')
+    replay.add_argument('--host', default='127.0.0.1')
+    replay.add_argument('--port', type=int, default=10110)
+    replay.add_argument('--speed', type=float, default=1.0)
+    replay.add_argument('--loop', action='store_true', help="start over at the end of the file")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'listen':
+            asyncio.run(_print_epochs(args.source, args.max_latency))
+        else:
+            asyncio.run(_replay(args.nmea_file, args.host, args.port, args.speed, args.loop))
+    except KeyboardInterrupt:
+        pass
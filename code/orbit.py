@@ -0,0 +1,190 @@
+import numpy as np
+
+# WGS-84 constants
+MU = 3.986005e14  # Earth's gravitational constant (m^3/s^2)
+OMEGA_E = 7.2921151467e-5  # Earth's rotation rate (rad/s)
+
+# Ephemeris parameters the satellite position depends on
+ORBIT_FIELDS = ('sqrt_a', 'e', 'i0', 'omega', 'OMEGA0', 'M0', 'delta_n',
+                'OMEGA_dot', 'idot', 'Cuc', 'Cus', 'Crc', 'Crs', 'Cic', 'Cis', 'toe')
+
+def compute_satellite_positions(eph_data, times):
+    """
+    Compute satellite positions for many ephemeris records and times at once
+
+    Array version of compute_satellite_position: every step, including the
+    Kepler iteration, runs over whole arrays.
+
+    Parameters:
+    eph_data: Mapping or structured array with the ephemeris parameters
+              (sqrt_a, e, i0, ...), each a scalar or an array of length N
+    times: GPS time(s) for position calculation, scalar or array of length N
+
+    Returns:
+    numpy array: (N, 3) ECEF coordinates in meters
+    """
+    time = np.asarray(times, dtype=np.float64)
+    params = {name: np.asarray(eph_data[name], dtype=np.float64) for name in ORBIT_FIELDS}
+    shape = np.broadcast_shapes(time.shape, *(p.shape for p in params.values()))
+    time = np.broadcast_to(time, shape).ravel()
+    p = {name: np.broadcast_to(value, shape).ravel() for name, value in params.items()}
+
+    e = p['e']
+    toe = p['toe']
+
+    # Time from ephemeris reference epoch, corrected for week crossovers
+    dt = time - toe
+    dt = np.where(dt > 302400, dt - 604800, np.where(dt < -302400, dt + 604800, dt))
+
+    # Mean motion and mean anomaly
+    a = p['sqrt_a'] * p['sqrt_a']
+    n = np.sqrt(MU / (a * a * a)) + p['delta_n']
+    M = p['M0'] + n * dt
+
+    # Solve Kepler's equation iteratively, freezing each element once it has converged
+    E = M.copy()
+    active = np.ones(E.shape, dtype=bool)
+    for _ in range(8):
+        E_new = M + e * np.sin(E)
+        converged = np.abs(E_new - E) < 1e-12
+        update = active & ~converged
+        E[update] = E_new[update]
+        active = update
+        if not active.any():
+            break
+
+    # True anomaly and argument of latitude
+    nu = np.arctan2(np.sqrt(1 - e * e) * np.sin(E), np.cos(E) - e)
+    phi = nu + p['omega']
+
+    # Second harmonic perturbations
+    cos2phi = np.cos(2 * phi)
+    sin2phi = np.sin(2 * phi)
+    du = p['Cuc'] * cos2phi + p['Cus'] * sin2phi
+    dr = p['Crc'] * cos2phi + p['Crs'] * sin2phi
+    di = p['Cic'] * cos2phi + p['Cis'] * sin2phi
+
+    # Corrected argument of latitude, radius, inclination and longitude of ascending node
+    u = phi + du
+    r = a * (1 - e * np.cos(E)) + dr
+    i = p['i0'] + di + p['idot'] * dt
+    OMEGA = p['OMEGA0'] + (p['OMEGA_dot'] - OMEGA_E) * dt - OMEGA_E * toe
+
+    # Positions in orbital plane
+    x_prime = r * np.cos(u)
+    y_prime = r * np.sin(u)
+
+    # Earth-fixed coordinates
+    cos_OMEGA = np.cos(OMEGA)
+    sin_OMEGA = np.sin(OMEGA)
+    cos_i = np.cos(i)
+    positions = np.empty((len(time), 3))
+    positions[:, 0] = x_prime * cos_OMEGA - y_prime * cos_i * sin_OMEGA
+    positions[:, 1] = x_prime * sin_OMEGA + y_prime * cos_i * cos_OMEGA
+    positions[:, 2] = y_prime * np.sin(i)
+
+    return positions
+
+class OrbitArcs:
+    """
+    Chebyshev polynomial fits of satellite positions over fixed time windows
+
+    Each PRN's orbit is split into windows of `window` seconds (further cut at
+    the model's breakpoints, e.g. ephemeris epochs). On first use a window is
+    sampled from the position model, fitted with the lowest degree that meets
+    `tolerance`, and afterwards evaluated with a few multiply-adds per epoch.
+    Windows that cannot meet the tolerance fall back to the exact model.
+    """
+    def __init__(self, model, window=900, tolerance=1e-3, max_degree=15, breakpoints=None):
+        self.model = model  # model(prn, times) -> (N, 3) ECEF positions, NaN where unavailable
+        self.window = window  # Fit window length (s)
+        self.tolerance = tolerance  # Maximum fit error (m)
+        self.max_degree = max_degree
+        self.breakpoints = breakpoints  # breakpoints(prn) -> sorted times the model may kink at
+        self.arcs = {}  # Format: {(prn, start): (stop, degree, coefficients, max_error)}
+
+    def positions(self, prn, times):
+        """
+        Satellite positions of one PRN at many times
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            times: Times in seconds, same time scale as the model
+
+        Returns:
+            numpy array: (N, 3) ECEF coordinates in meters, NaN where unavailable
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        starts, stops = self._arc_bounds(prn, times)
+        positions = np.full((len(times), 3), np.nan)
+
+        for start in np.unique(starts):
+            mask = starts == start
+            stop = stops[mask][0]
+            key = (prn, start)
+            if key not in self.arcs:
+                self.arcs[key] = self._fit(prn, start, stop)
+
+            _, _, coefficients, _ = self.arcs[key]
+            if coefficients is None:
+                positions[mask] = self.model(prn, times[mask])
+            else:
+                x = (2 * times[mask] - (start + stop)) / (stop - start)
+                positions[mask] = np.polynomial.chebyshev.chebval(x, coefficients).T
+
+        return positions
+
+    def fit_report(self):
+        """List of fitted arcs: dicts with prn, start, stop, degree and max_error (m)"""
+        return [{'prn': prn, 'start': start, 'stop': stop, 'degree': degree, 'max_error': max_error}
+                for (prn, start), (stop, degree, _, max_error) in sorted(self.arcs.items())]
+
+    def summary(self):
+        """One-line summary of the fitted arcs"""
+        report = self.fit_report()
+        fitted = [arc for arc in report if arc['degree'] is not None]
+        max_error = max((arc['max_error'] for arc in fitted), default=float('nan'))
+        return (f"{len(fitted)}/{len(report)} orbit arcs within {self.tolerance} m "
+                f"(max fit error {max_error:.3e} m)")
+
+    def _arc_bounds(self, prn, times):
+        """Start and stop time of the window containing each time"""
+        starts = np.floor(times / self.window) * self.window
+        stops = starts + self.window
+
+        if self.breakpoints is not None:
+            breaks = np.asarray(self.breakpoints(prn), dtype=np.float64)
+            if len(breaks):
+                j = np.searchsorted(breaks, times, side='right')
+                lower = np.where(j > 0, breaks[np.maximum(j - 1, 0)], -np.inf)
+                upper = np.where(j < len(breaks), breaks[np.minimum(j, len(breaks) - 1)], np.inf)
+                starts = np.maximum(starts, lower)
+                stops = np.minimum(stops, upper)
+
+        return starts, stops
+
+    def _fit(self, prn, start, stop):
+        """Fit one window, returning (stop, degree, coefficients, max_error)"""
+        n_nodes = self.max_degree + 1
+        nodes = np.cos(np.pi * (np.arange(n_nodes) + 0.5) / n_nodes)
+        checks = np.linspace(-1, 1, 4 * n_nodes + 1)[1:-1]
+
+        def to_time(x):
+            return start + (x + 1) * (stop - start) / 2
+
+        samples = self.model(prn, to_time(nodes))
+        expected = self.model(prn, to_time(checks))
+        if not (np.isfinite(samples).all() and np.isfinite(expected).all()):
+            return stop, None, None, float('nan')
+
+        max_error = float('nan')
+        for degree in range(1, self.max_degree + 1):
+            coefficients = np.polynomial.chebyshev.chebfit(nodes, samples, degree)
+            fitted = np.polynomial.chebyshev.chebval(checks, coefficients).T
+            max_error = float(np.max(np.linalg.norm(fitted - expected, axis=1)))
+            if max_error <= self.tolerance:
+                return stop, degree, coefficients, max_error
+
+        print(f"Orbit arc for {prn} at {start} not within {self.tolerance} m "
+              f"(error {max_error:.3e} m), using exact model")
+        return stop, None, None, max_error
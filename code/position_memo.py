@@ -0,0 +1,253 @@
+import contextlib
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from orbit import ORBIT_FIELDS
+
+# Memo table slot: key (PRN and IODE, orbit parameter fingerprint, time) and ECEF position
+MEMO_DTYPE = np.dtype([
+    ('used', np.uint64),  # 1 once the slot holds an entry
+    ('prn_iode', np.uint64),  # PRN code << 32 | IODE
+    ('params', np.uint64),  # Fingerprint of the ORBIT_FIELDS values
+    ('time', np.uint64),  # Quantized time, or the bits of the exact time
+    ('position', np.float64, 3),
+])
+
+# Slots tried after a key's home slot before giving up (lookup: missing, store: dropped)
+MAX_PROBES = 32
+
+class PositionMemo:
+    """
+    Satellite positions already computed, keyed by (PRN, IODE, quantized GPS time)
+
+    The antennas of a session see the same satellites at nearly the same
+    times, so their runs can share the positions computed by
+    EphemerisStrategy.prn_positions. Besides PRN and IODE, keys hold a
+    fingerprint of the orbit parameters of the record (or the two blended
+    records) the position was computed from, so records of another
+    ephemeris file with the same IODE never hit a wrong entry.
+
+    With quantum 0 positions are shared only between identical times and
+    the memo does not change any result. With a quantum (s), times are
+    rounded to multiples of it and positions are evaluated at the rounded
+    time: about 3.9 mm of satellite motion per microsecond of rounding.
+
+    The table is a fixed-size open addressing hash table in a numpy array,
+    looked up and filled a whole batch at a time, and allocated on the
+    first store. Once a position finds no free slot within MAX_PROBES, the
+    memo is full: it reports so and is no longer used by this process, as
+    every miss would probe MAX_PROBES slots without storing anything.
+    """
+    def __init__(self, slots=1 << 18, quantum=0, buffer=None, lock=None):
+        self.slots = slots
+        self.quantum = quantum
+        # Format: MEMO_DTYPE array, in buffer (e.g. shared memory) if given, else None until the first store
+        self.table = np.ndarray(slots, dtype=MEMO_DTYPE, buffer=buffer) if buffer is not None else None
+        self.lock = lock  # Held around table access when other processes use the table too
+        self.hits = 0  # Positions found by this process
+        self.misses = 0  # Positions this process had to compute
+        self.full = False  # A position could not be stored; the memo is no longer looked up or filled
+
+    def quantize(self, times):
+        """Times the positions are evaluated at: rounded to the quantum, unchanged if it is 0"""
+        times = np.asarray(times, dtype=np.float64)
+        if not self.quantum:
+            return times
+        return np.round(times / self.quantum) * self.quantum
+
+    def keys(self, prn, iode, fingerprint, times):
+        """
+        Memo keys of one PRN's positions
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            iode: IODE of the ephemeris record of each position
+            fingerprint: orbit_fingerprint of the parameters of each position
+            times: Times from quantize, seconds since the GPS epoch
+
+        Returns:
+            numpy array: (N, 3) uint64 keys (prn_iode, params, time)
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        keys = np.empty((len(times), 3), dtype=np.uint64)
+        prn_code = (ord(prn[0]) << 8) | int(prn[1:])
+        iode = np.round(np.asarray(iode, dtype=np.float64)).astype(np.int64) & 0xffffffff
+        keys[:, 0] = (np.uint64(prn_code) << np.uint64(32)) | iode.astype(np.uint64)
+        keys[:, 1] = fingerprint
+        if self.quantum:
+            keys[:, 2] = np.round(times / self.quantum).astype(np.int64).view(np.uint64)
+        else:
+            keys[:, 2] = times.view(np.uint64)
+        return keys
+
+    def lookup(self, keys):
+        """
+        Positions stored for keys
+
+        Returns:
+            tuple: ((N, 3) positions, NaN where missing; found mask)
+        """
+        if self.table is None or self.full:
+            self.misses += len(keys)
+            return np.full((len(keys), 3), np.nan), np.zeros(len(keys), dtype=bool)
+
+        with self._locked():
+            slots = self._find(keys)
+            positions = np.full((len(keys), 3), np.nan)
+            found = slots >= 0
+            positions[found] = self.table['position'][slots[found]]
+        self.hits += int(found.sum())
+        self.misses += int((~found).sum())
+        return positions, found
+
+    def store(self, keys, positions):
+        """Store computed positions under their keys; keys already present are kept"""
+        if self.full:
+            return
+        if self.table is None:
+            self.table = np.zeros(self.slots, dtype=MEMO_DTYPE)
+
+        positions = np.asarray(positions, dtype=np.float64)
+        with self._locked():
+            home = self._home(keys)
+            pending = np.arange(len(keys))
+            for probe in range(MAX_PROBES):
+                if not len(pending):
+                    break
+                slots = (home[pending] + probe) % self.slots
+                entries = self.table[slots]
+                used = entries['used'] != 0
+                done = used & self._matches(entries, keys[pending])
+
+                # One pending key per free slot; the others probe on
+                free = np.flatnonzero(~used)
+                _, first = np.unique(slots[free], return_index=True)
+                claim = free[first]
+                target = slots[claim]
+                self.table['prn_iode'][target] = keys[pending[claim], 0]
+                self.table['params'][target] = keys[pending[claim], 1]
+                self.table['time'][target] = keys[pending[claim], 2]
+                self.table['position'][target] = positions[pending[claim]]
+                self.table['used'][target] = 1
+
+                done[claim] = True
+                pending = pending[~done]
+
+        if len(pending):
+            self.full = True
+            print(f"Position memo full: {len(pending)} positions not stored, "
+                  f"memo no longer used ({self.slots} slots)")
+
+    def entries(self):
+        """Number of stored positions"""
+        if self.table is None:
+            return 0
+        with self._locked():
+            return int(np.count_nonzero(self.table['used']))
+
+    def summary(self):
+        """One-line summary of this process's memo use"""
+        return (f"Position memo: {self.hits} positions reused, {self.misses} computed, "
+                f"{self.entries()}/{self.slots} slots used" + (" (full)" if self.full else ""))
+
+    def _find(self, keys):
+        """Slot holding each key, -1 if it is not stored"""
+        home = self._home(keys)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        for probe in range(MAX_PROBES):
+            if not len(pending):
+                break
+            slots = (home[pending] + probe) % self.slots
+            entries = self.table[slots]
+            used = entries['used'] != 0
+            match = used & self._matches(entries, keys[pending])
+            result[pending[match]] = slots[match]
+            # An empty slot ends the probe sequence
+            pending = pending[used & ~match]
+        return result
+
+    def _home(self, keys):
+        """First slot tried for each key"""
+        h = keys[:, 0] * np.uint64(0x9e3779b97f4a7c15)
+        h ^= keys[:, 1]
+        h ^= keys[:, 2] * np.uint64(0xbf58476d1ce4e5b9)
+        h ^= h >> np.uint64(31)
+        return (h % np.uint64(self.slots)).astype(np.int64)
+
+    @staticmethod
+    def _matches(entries, keys):
+        return ((entries['prn_iode'] == keys[:, 0]) & (entries['params'] == keys[:, 1]) &
+                (entries['time'] == keys[:, 2]))
+
+    def _locked(self):
+        return self.lock if self.lock is not None else contextlib.nullcontext()
+
+class SharedPositionMemo(PositionMemo):
+    """
+    PositionMemo whose table lives in multiprocessing.shared_memory
+
+    The creating process passes share() to its workers, which attach to
+    the same table without copying it:
+
+        memo = SharedPositionMemo()
+        pool = ProcessPoolExecutor(initializer=attach, initargs=(memo.share(),))
+        ...
+        memo.close()  # Frees the table once the workers are done
+
+    where attach(share) calls set_process_memo(SharedPositionMemo(*share)).
+    """
+    def __init__(self, slots=1 << 18, quantum=0, name=None, lock=None):
+        self.owner = name is None  # The creating process removes the table on close
+        # New shared memory is zero filled, i.e. all slots are free
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner,
+                                              size=slots * MEMO_DTYPE.itemsize if self.owner else 0)
+        super().__init__(slots, quantum, buffer=self.shm.buf,
+                         lock=lock if lock is not None else multiprocessing.Lock())
+
+    def share(self):
+        """Arguments that attach another process to this table"""
+        return self.slots, self.quantum, self.shm.name, self.lock
+
+    def close(self):
+        """Detach from the table, and remove it in the creating process"""
+        self.table = None  # Release the buffer before closing the shared memory
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def orbit_fingerprint(eph_params):
+    """64-bit FNV-1a hash of the ORBIT_FIELDS values of each record (or parameter row)"""
+    fingerprint = None
+    for name in ORBIT_FIELDS:
+        bits = np.ascontiguousarray(eph_params[name], dtype=np.float64).view(np.uint64)
+        if fingerprint is None:
+            fingerprint = np.full(bits.shape, 0xcbf29ce484222325, dtype=np.uint64)
+        fingerprint = (fingerprint ^ bits) * np.uint64(0x100000001b3)
+    return fingerprint
+
+def combine_fingerprints(first, second):
+    """Fingerprint of parameters blended from two records"""
+    return (first * np.uint64(0x9e3779b97f4a7c15)) ^ second
+
+# Memo used by EphemerisStrategy.prn_positions in this process, None for none;
+# main.run_job sets one up when several antennas are processed
+_process_memo = None
+
+def process_memo():
+    """The memo satellite positions of this process are shared through, or None"""
+    return _process_memo
+
+def set_process_memo(memo):
+    """
+    Replace the memo of this process
+
+    Args:
+        memo: PositionMemo, SharedPositionMemo, or None to compute every position
+
+    Returns:
+        The previous memo
+    """
+    global _process_memo
+    previous, _process_memo = _process_memo, memo
+    return previous
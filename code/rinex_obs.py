@@ -0,0 +1,905 @@
+import json
+import mmap
+import os
+import time
+import numpy as np
+from datetime import datetime
+from compression import CHUNK_SIZE, is_plain, open_binary, open_text
+from ephemeris import to_seconds
+
+# Width of one observation field: F14.3 value, LLI digit, SSI digit
+OBS_FIELD_WIDTH = 16
+
+# Observation lines decoded per block by the vectorized parser
+DECODE_BLOCK_LINES = 8192
+
+# Bump when the per-PRN array layout changes to invalidate cached observations
+OBS_CACHE_VERSION = 1
+
+def obs_dtype(obs_types):
+    """
+    Structured dtype for one satellite's observations
+
+    One float64 column per observation type, plus the loss-of-lock indicator
+    and signal strength indicator of the carrier phase observation.
+    """
+    return np.dtype([('epoch', 'f8')] + [(obs_type, 'f8') for obs_type in obs_types] +
+                    [('LLI', 'i1'), ('SSI', 'i1')])
+
+class RinexObservations:
+    """RINEX 3 observations stored as per-PRN structured arrays sorted by epoch"""
+    def __init__(self):
+        self.obs_types = {}  # Format: {system: [observation types]}, e.g. {'G': ['C1C', 'L1C', 'D1C', 'S1C']}
+        self.data = {}  # Format: {prn: structured array of obs_dtype}
+        self.epochs = np.zeros(0)  # Sorted unique epochs, seconds since the GPS epoch
+        self.is_loaded = False
+
+    def load_data(self, rinex_file, cache=None, size=None):
+        """
+        Load a RINEX 3 observation file
+
+        Args:
+            rinex_file: Path to the observation file
+            cache: Optional FileCache; the parsed arrays are reused while the file is unchanged
+            size: Read only the first size bytes of the file, None for all of it;
+                  the cache is only used while that is the whole file
+        """
+        key = arrays = None
+        if cache is not None and cache.whole_file(rinex_file, size):
+            key = cache.key(f"obs-v{OBS_CACHE_VERSION}", rinex_file)
+            arrays = cache.load_arrays(key)
+        if arrays is not None and cache.whole_file(rinex_file, size):
+            self.obs_types = json.loads(str(arrays.pop('obs_types')))
+            self.data = arrays
+        else:
+            self.obs_types, self.data = parse_rinex_obs_fast(rinex_file, size)
+            # Not saved if the file has grown past size since the key was taken
+            if key is not None and cache.whole_file(rinex_file, size):
+                cache.save_arrays(key, dict(self.data, obs_types=np.array(json.dumps(self.obs_types))))
+        self.build_index()
+        self.is_loaded = True
+
+    def build_index(self):
+        """Collect the sorted epochs present in any satellite's observations"""
+        if self.data:
+            self.epochs = np.unique(np.concatenate([obs['epoch'] for obs in self.data.values()]))
+        else:
+            self.epochs = np.zeros(0)
+
+    def append(self, data):
+        """
+        Merge newly parsed observations into the per-PRN arrays
+
+        Args:
+            data: {prn: structured array of obs_dtype sorted by epoch}, usually
+                  epochs later than everything already loaded
+        """
+        for prn, obs in data.items():
+            if not len(obs):
+                continue
+            current = self.data.get(prn)
+            if current is None or not len(current):
+                self.data[prn] = obs
+                continue
+
+            merged = np.concatenate((current, obs))
+            # Only epochs arriving out of order need a re-sort
+            if obs['epoch'][0] < current['epoch'][-1]:
+                merged = merged[np.argsort(merged['epoch'], kind='stable')]
+            self.data[prn] = merged
+        self.build_index()
+
+    @property
+    def prns(self):
+        return sorted(self.data.keys())
+
+    def arc_index(self, phase='L1C', doppler='D1C', **kwargs):
+        """
+        Continuous carrier phase arcs of every PRN, see find_arcs
+
+        Returns:
+            dict: {prn: (n_arcs, 2) array of [start, stop) offsets into self.data[prn]}
+        """
+        arcs = {}
+        for prn, obs in self.data.items():
+            arcs[prn] = find_arcs(obs['epoch'], obs[phase],
+                                  obs[doppler] if doppler in obs.dtype.names else None,
+                                  obs['LLI'], **kwargs)
+        return arcs
+
+    def series(self, prn, start=None, stop=None):
+        """
+        Observations of a PRN with start <= epoch < stop, as a view
+
+        Args:
+            prn: Satellite PRN (e.g., 'G26')
+            start, stop: Datetimes or seconds since the GPS epoch; None leaves the side open
+        """
+        obs = self.data.get(prn)
+        if obs is None:
+            return np.zeros(0, dtype=obs_dtype(self.obs_types.get(prn[0], [])))
+
+        lo = 0 if start is None else np.searchsorted(obs['epoch'], _seconds(start), side='left')
+        hi = len(obs) if stop is None else np.searchsorted(obs['epoch'], _seconds(stop), side='left')
+        return obs[lo:hi]
+
+    def observation(self, prn, epoch):
+        """Observation record of a PRN at exactly this epoch (seconds), or None"""
+        obs = self.data.get(prn)
+        if obs is None:
+            return None
+
+        i = np.searchsorted(obs['epoch'], epoch, side='left')
+        if i < len(obs) and obs['epoch'][i] == epoch:
+            return obs[i]
+        return None
+
+class RinexFollower:
+    """
+    Incremental reader for a RINEX 3 observation file that is still being written
+
+    GNSS-SDR in real-time mode appends one epoch block (epoch record line plus
+    one line per satellite) at a time. Each poll() reads the bytes appended
+    since the last complete block and merges the new epochs into the
+    observations; a block whose lines are not all written yet, including a
+    partial last line, is left for the next poll.
+    """
+    def __init__(self, rinex_file, observations=None, poll_interval=0.2):
+        self.rinex_file = rinex_file
+        self.observations = observations if observations is not None else RinexObservations()
+        self.poll_interval = poll_interval  # Seconds between polls in follow()
+        self.offset = 0  # Byte offset just past the last complete epoch block
+        self.header_read = False
+
+    def poll(self):
+        """
+        Read the complete epoch blocks appended since the last poll
+
+        Returns:
+            int: Number of new epochs (event records not counted)
+        """
+        try:
+            size = os.path.getsize(self.rinex_file)
+        except FileNotFoundError:
+            return 0  # Receiver has not created the file yet
+
+        if size < self.offset:
+            # File was truncated or restarted: read it again from the top
+            print(f"{self.rinex_file} shrank, reloading from the start")
+            self.offset = 0
+            self.header_read = False
+            self.observations.data = {}
+            self.observations.build_index()
+        if size == self.offset:
+            return 0
+
+        with open(self.rinex_file, 'rb') as f:
+            f.seek(self.offset)
+            # latin-1 keeps one character per byte, so string offsets are byte offsets
+            text = f.read(size - self.offset).decode('latin-1')
+
+        pos = 0
+        if not self.header_read:
+            end = text.find("END OF HEADER")
+            pos = text.find("\n", end) + 1 if end >= 0 else 0
+            if not pos:
+                return 0
+            self.observations.obs_types = parse_rinex_obs_header(iter(text[:pos].splitlines(keepends=True)))
+            self.header_read = True
+
+        pos, rows, n_epochs = parse_rinex_obs_blocks(text, pos, self.observations.obs_types)
+        self.offset += pos
+        if rows:
+            self.observations.append(_rows_to_arrays(rows, self.observations.obs_types))
+        return n_epochs
+
+    def follow(self, timeout=None):
+        """
+        Poll until the file stops growing
+
+        Args:
+            timeout: Seconds without new epochs after which to stop, None to follow forever
+
+        Yields:
+            int: Number of new epochs, after each poll that found some
+        """
+        idle_since = time.monotonic()
+        while True:
+            n_epochs = self.poll()
+            if n_epochs:
+                idle_since = time.monotonic()
+                yield n_epochs
+            elif timeout is not None and time.monotonic() - idle_since > timeout:
+                return
+            time.sleep(self.poll_interval)
+
+class ObservationCube:
+    """
+    Observations of several antennas aligned on common epochs
+
+    values[e, a, p, o] is observable o of PRN p seen by antenna a at epoch e,
+    NaN where that antenna has no such observation.
+    """
+    def __init__(self, epochs, antennas, prns, observables):
+        self.epochs = epochs  # Sorted epochs, seconds since the GPS epoch
+        self.antennas = antennas  # Antenna names, e.g. ['ant0', 'ant1', ...]
+        self.prns = prns  # Format: ['G16', 'G26', ...]
+        self.observables = observables  # Format: ['C1C', 'L1C', 'D1C', 'S1C']
+        shape = (len(epochs), len(antennas), len(prns))
+        self.values = np.full(shape + (len(observables),), np.nan)
+        self.lli = np.zeros(shape, dtype=np.int8)  # LLI of the carrier phase observation
+        self.ssi = np.zeros(shape, dtype=np.int8)  # SSI of the carrier phase observation
+
+    @property
+    def mask(self):
+        """True where an observation exists, shape (epoch, antenna, PRN, observable)"""
+        return ~np.isnan(self.values)
+
+    def observable(self, name):
+        """(epoch, antenna, PRN) view of one observable, e.g. 'L1C'"""
+        return self.values[..., self.observables.index(name)]
+
+    def arc_index(self, phase='L1C', doppler='D1C', **kwargs):
+        """
+        Continuous carrier phase arcs per antenna and PRN, see find_arcs
+
+        Returns:
+            dict: {(antenna, prn): (n_arcs, 2) array of [start, stop) epoch rows}
+        """
+        phases = self.observable(phase)
+        dopplers = self.observable(doppler) if doppler in self.observables else None
+        arcs = {}
+        for a, antenna in enumerate(self.antennas):
+            for p, prn in enumerate(self.prns):
+                arcs[antenna, prn] = find_arcs(self.epochs, phases[:, a, p],
+                                               None if dopplers is None else dopplers[:, a, p],
+                                               self.lli[:, a, p], **kwargs)
+        return arcs
+
+def align_observations(sessions, antennas=None, epochs='common'):
+    """
+    Align the observations of several antennas into one ObservationCube
+
+    Args:
+        sessions: RinexObservations or RINEX observation file paths, one per antenna
+        antennas: Antenna names, defaults to 'ant0', 'ant1', ...
+        epochs: 'common' for the epochs every session has, 'all' for the union
+
+    Returns:
+        ObservationCube: dense (epoch, antenna, PRN, observable) values with NaN for gaps
+    """
+    loaded = []
+    for session in sessions:
+        if not isinstance(session, RinexObservations):
+            path, session = session, RinexObservations()
+            session.load_data(path)
+        loaded.append(session)
+    if antennas is None:
+        antennas = [f"ant{i}" for i in range(len(loaded))]
+
+    epoch_sets = [session.epochs for session in loaded]
+    if epochs == 'common':
+        grid = epoch_sets[0] if epoch_sets else np.zeros(0)
+        for session_epochs in epoch_sets[1:]:
+            grid = np.intersect1d(grid, session_epochs)
+    elif epochs == 'all':
+        grid = np.unique(np.concatenate(epoch_sets)) if epoch_sets else np.zeros(0)
+    else:
+        raise ValueError(f"Unknown epochs selection: {epochs}")
+
+    prns = sorted(set().union(*(session.data for session in loaded)))
+    observables = []
+    for session in loaded:
+        for types in session.obs_types.values():
+            observables.extend(t for t in types if t not in observables)
+
+    cube = ObservationCube(grid, antennas, prns, observables)
+    for a, session in enumerate(loaded):
+        for p, prn in enumerate(prns):
+            obs = session.data.get(prn)
+            if obs is None or not len(grid):
+                continue
+
+            # Rows whose epoch is on the grid
+            i = np.minimum(np.searchsorted(grid, obs['epoch']), len(grid) - 1)
+            on_grid = grid[i] == obs['epoch']
+            rows = i[on_grid]
+            for o, name in enumerate(observables):
+                if name in obs.dtype.names:
+                    cube.values[rows, a, p, o] = obs[name][on_grid]
+            cube.lli[rows, a, p] = obs['LLI'][on_grid]
+            cube.ssi[rows, a, p] = obs['SSI'][on_grid]
+
+    return cube
+
+def find_arcs(epochs, phase, doppler=None, lli=None, max_gap=None, threshold=None):
+    """
+    Split one satellite's carrier phase series into continuous arcs
+
+    A new arc starts after a missing phase sample, a time gap, a set
+    loss-of-lock bit, or a jump in the phase change that the Doppler
+    observation does not account for (cycle slip). All tests run on whole arrays.
+
+    Args:
+        epochs: Sample times in seconds, sorted
+        phase: Carrier phase (cycles), NaN where missing
+        doppler: Doppler (Hz), or None to skip the residual test. With the
+                 RINEX sign convention the phase changes by -Doppler * dt
+        lli: Loss of lock indicators, or None; bit 0 marks a possible slip
+        max_gap: Largest time step within an arc (s), None for 1.5 times
+                 the median sampling interval
+        threshold: Largest Doppler-predicted phase residual (cycles), None
+                   for five times its robust standard deviation (at least 1 cycle)
+
+    Returns:
+        numpy array: (n_arcs, 2) int array of [start, stop) sample offsets
+    """
+    phase = np.asarray(phase, dtype=np.float64)
+    samples = np.flatnonzero(~np.isnan(phase))
+    if not len(samples):
+        return np.zeros((0, 2), dtype=np.int64)
+
+    t = np.asarray(epochs, dtype=np.float64)[samples]
+    dt = np.diff(t)
+    if max_gap is None:
+        max_gap = 1.5 * np.median(dt) if len(dt) else 0.0
+
+    # Arc starts: first sample, after a skipped sample or a time gap, at a loss of lock
+    starts = np.zeros(len(samples), dtype=bool)
+    starts[0] = True
+    starts[1:] |= (np.diff(samples) > 1) | (dt > max_gap)
+    if lli is not None:
+        starts |= (np.asarray(lli)[samples] & 1) != 0
+
+    if doppler is not None:
+        d = np.asarray(doppler, dtype=np.float64)[samples]
+        residual = np.diff(phase[samples]) + (d[1:] + d[:-1]) / 2 * dt
+        usable = np.isfinite(residual) & ~starts[1:]
+        if usable.any():
+            offset = np.median(residual[usable])
+            residual = np.abs(residual - offset)
+            if threshold is None:
+                threshold = max(5 * 1.4826 * np.median(residual[usable]), 1.0)
+            starts[1:] |= usable & (residual > threshold)
+
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:] - 1, len(samples) - 1)
+    return np.column_stack((samples[first], samples[last] + 1))
+
+def _seconds(time):
+    return to_seconds(time) if isinstance(time, datetime) else float(time)
+
+def parse_rinex_obs_header(f):
+    """
+    Read a RINEX 3 observation header up to END OF HEADER
+
+    Returns:
+        dict: {system: [observation types]} from the SYS / # / OBS TYPES records
+    """
+    obs_types = {}
+    system = None
+
+    for line in f:
+        label = line[60:].strip()
+        if label == "SYS / # / OBS TYPES":
+            # Continuation lines leave the system and count blank
+            if line[0] != ' ':
+                system = line[0]
+                obs_types[system] = []
+            obs_types[system].extend(line[7:60].split())
+        elif label == "END OF HEADER":
+            break
+
+    return obs_types
+
+def parse_rinex_epoch(line):
+    """Parse an epoch record line ('> 2024 12 27 02 44 07.0000000  0  4') into (seconds, flag, satellites)"""
+    epoch = datetime(int(line[2:6]), int(line[7:9]), int(line[10:12]),
+                     int(line[13:15]), int(line[16:18]))
+    seconds = to_seconds(epoch) + float(line[18:29])
+    return seconds, int(line[31]), int(line[32:35])
+
+def parse_obs_line(line, n_types):
+    """Parse one satellite observation line into (values, LLI, SSI) lists, blanks as NaN/0"""
+    values, lli, ssi = [], [], []
+    for k in range(n_types):
+        start = 3 + k * OBS_FIELD_WIDTH
+        field = line[start:start + 14].strip()
+        values.append(float(field) if field else np.nan)
+        flag = line[start + 14:start + 15].strip()
+        lli.append(int(flag) if flag else 0)
+        flag = line[start + 15:start + 16].strip()
+        ssi.append(int(flag) if flag else 0)
+    return values, lli, ssi
+
+def phase_index(obs_types):
+    """Index of the carrier phase observation whose LLI/SSI are kept (first one otherwise)"""
+    for k, obs_type in enumerate(obs_types):
+        if obs_type.startswith('L'):
+            return k
+    return 0
+
+def parse_rinex_obs(rinex_file, size=None):
+    """
+    Parse a RINEX 3 observation file into per-PRN structured arrays
+
+    Args:
+        rinex_file: Path to RINEX 3.02 observation file
+        size: Read only the first size bytes of the file, None for all of it
+
+    Returns:
+        tuple: (obs_types, {prn: structured array of obs_dtype sorted by epoch})
+    """
+    rows = {}  # Format: {prn: [row tuples]}
+
+    with open_text(rinex_file, size) as f:
+        obs_types = parse_rinex_obs_header(f)
+        epoch = None
+        skip = 0
+
+        for line in f:
+            if skip:
+                skip -= 1
+                continue
+
+            if line[0] == '>':
+                try:
+                    epoch, flag, n_sats = parse_rinex_epoch(line)
+                except (ValueError, IndexError) as e:
+                    print(f"Error processing epoch line: {line.strip()} - {str(e)}")
+                    epoch = None
+                    continue
+                # Event flags above 1 are followed by header records, not observations
+                if flag > 1:
+                    skip = n_sats
+                    epoch = None
+                continue
+
+            if epoch is None:
+                continue
+            _add_obs_line(rows, line, epoch, obs_types)
+
+    return obs_types, _rows_to_arrays(rows, obs_types)
+
+def _add_obs_line(rows, line, epoch, obs_types):
+    """Parse one satellite observation line and append its row to rows[prn]"""
+    if not line.strip():
+        return
+
+    prn = line[0:3]
+    types = obs_types.get(prn[0])
+    if types is None:
+        return
+
+    try:
+        values, lli, ssi = parse_obs_line(line.rstrip('\r\n'), len(types))
+    except ValueError as e:
+        print(f"Error processing line: {line.strip()} - {str(e)}")
+        return
+
+    k = phase_index(types)
+    rows.setdefault(prn, []).append((epoch, *values, lli[k], ssi[k]))
+
+def _rows_to_arrays(rows, obs_types):
+    """Convert {prn: [row tuples]} into {prn: structured array sorted by epoch}"""
+    data = {}
+    for prn, prn_rows in rows.items():
+        obs = np.array(prn_rows, dtype=obs_dtype(obs_types[prn[0]]))
+        data[prn] = obs[np.argsort(obs['epoch'], kind='stable')]
+    return data
+
+def parse_rinex_obs_blocks(text, pos, obs_types):
+    """
+    Parse the complete epoch blocks of RINEX 3 observation text
+
+    Args:
+        text: Observation records, possibly ending in an unfinished block
+        pos: Offset in text of the first epoch record line
+        obs_types: {system: [observation types]} from the header
+
+    Returns:
+        tuple: (end, rows, n_epochs) where end is the offset just past the last
+               complete block, rows is {prn: [row tuples]} and n_epochs the
+               number of observation epochs parsed
+    """
+    rows = {}
+    n_epochs = 0
+
+    while True:
+        eol = text.find('\n', pos)
+        if eol < 0:
+            break
+        line = text[pos:eol]
+        if line[:1] != '>':
+            pos = eol + 1  # Stray line between blocks
+            continue
+
+        try:
+            epoch, flag, n_records = parse_rinex_epoch(line)
+        except (ValueError, IndexError) as e:
+            print(f"Error processing epoch line: {line.strip()} - {str(e)}")
+            pos = eol + 1
+            continue
+
+        # The block is complete once all its record lines are terminated
+        lines = []
+        end = eol + 1
+        while len(lines) < n_records:
+            eol = text.find('\n', end)
+            if eol < 0:
+                break
+            lines.append(text[end:eol])
+            end = eol + 1
+        if len(lines) < n_records:
+            break
+        pos = end
+
+        # Event flags above 1 are followed by header records, not observations
+        if flag > 1:
+            continue
+        for line in lines:
+            _add_obs_line(rows, line, epoch, obs_types)
+        n_epochs += 1
+
+    return pos, rows, n_epochs
+
+def read_rinex_obs_columns(rinex_file, size=None):
+    """
+    Decode all observation lines of a RINEX 3 file at once
+
+    The file is memory-mapped, line boundaries are found in bulk and the lines
+    are laid out as a fixed-width byte matrix whose numeric columns are decoded
+    with array arithmetic instead of per-field float() calls. Compressed files
+    are decompressed in chunks that each end before an epoch record, and the
+    chunks are decoded the same way.
+
+    Args:
+        rinex_file: Path to RINEX 3.02 observation file, optionally compressed
+        size: Read only the first size bytes of the file, None for all of it
+
+    Returns:
+        tuple: (obs_types, columns) where columns holds one entry per
+               observation line in file order: 'prn_index' into 'prns',
+               'epoch' (seconds), 'epoch_index', 'values', 'LLI', 'SSI'
+               (N x max types), and 'epoch_text', the raw timestamp bytes
+               of each epoch record
+
+    Raises:
+        ValueError: if a numeric field is not in the expected fixed format
+    """
+    if not is_plain(rinex_file):
+        return _read_compressed_obs_columns(rinex_file, size)
+
+    with open(rinex_file, 'rb') as f:
+        length = f.seek(0, 2) if size is None else min(f.seek(0, 2), size)
+        if not length:
+            return {}, _empty_columns(0)
+        with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b"END OF HEADER")
+            body_start = mm.find(b"\n", header_end) + 1 if header_end >= 0 else 0
+            header = mm[:body_start].decode('ascii', errors='replace')
+            obs_types = parse_rinex_obs_header(iter(header.splitlines(keepends=True)))
+
+            # Decoded straight from the mapped pages; the columns are new arrays,
+            # so the view is released before the map is closed
+            body = np.frombuffer(mm, dtype=np.uint8, offset=body_start)
+            try:
+                columns, error = _decode_body(body, obs_types), None
+            except ValueError as e:
+                # The traceback would keep the view alive past the map
+                columns, error = None, str(e)
+            del body
+
+    if error is not None:
+        raise ValueError(error)
+    return obs_types, columns
+
+def _read_compressed_obs_columns(rinex_file, size=None):
+    """read_rinex_obs_columns for a compressed file, decoded chunk by chunk"""
+    with open_binary(rinex_file, size) as f:
+        header = []
+        for line in f:
+            header.append(line.decode('ascii', errors='replace'))
+            if "END OF HEADER" in header[-1]:
+                break
+        obs_types = parse_rinex_obs_header(iter(header))
+
+        parts = []
+        pending = b""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            pending += chunk
+            # Cut before the last epoch record, whose lines may not all be read yet
+            cut = len(pending) if not chunk else pending.rfind(b"\n>") + 1
+            if cut > 0:
+                parts.append(_decode_body(np.frombuffer(pending[:cut], dtype=np.uint8), obs_types))
+                pending = pending[cut:]
+            if not chunk:
+                break
+
+    return obs_types, _merge_columns(parts, obs_types)
+
+def _merge_columns(parts, obs_types):
+    """Concatenate the columns of consecutive chunks of one file"""
+    n_types = max((len(types) for types in obs_types.values()), default=0)
+    parts = [part for part in parts if len(part['epoch_text'])]
+    if not parts:
+        return _empty_columns(n_types)
+
+    prns = np.unique(np.concatenate([part['prns'] for part in parts]))
+    epoch_offsets = np.cumsum([0] + [len(part['epoch_text']) for part in parts])
+    columns = {
+        'prns': prns,
+        'prn_index': np.concatenate([np.searchsorted(prns, part['prns'])[part['prn_index']]
+                                     for part in parts]),
+        'epoch_index': np.concatenate([part['epoch_index'] + offset
+                                       for part, offset in zip(parts, epoch_offsets)]),
+    }
+    for name in ('epoch', 'values', 'LLI', 'SSI', 'epoch_text'):
+        columns[name] = np.concatenate([part[name] for part in parts])
+    return columns
+
+def _decode_body(body, obs_types):
+    """Columns of the observation records in body, bytes following the header"""
+    n_types = max((len(types) for types in obs_types.values()), default=0)
+    width = 3 + n_types * OBS_FIELD_WIDTH
+    if not len(body):
+        return _empty_columns(n_types)
+
+    # Line boundaries; lengths exclude the '\n' and any '\r' before it. An
+    # unterminated last line ends at the end of the body.
+    ends = np.flatnonzero(body == ord('\n'))
+    if body[-1] != ord('\n'):
+        ends = np.append(ends, len(body))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts - (body[np.maximum(ends - 1, 0)] == ord('\r'))
+    lengths = np.maximum(lengths, 0)
+
+    is_epoch = body[starts] == ord('>')
+    epoch_lines = _line_matrix(body, starts, ends, lengths, is_epoch, 35)
+    flags = _decode_unsigned(epoch_lines[:, 31:32])
+    n_records = _decode_unsigned(epoch_lines[:, 32:35])
+    epoch_seconds = _epoch_seconds(epoch_lines)
+    epoch_text = np.ascontiguousarray(epoch_lines[:, 2:29]).view('S27').ravel()
+
+    # Observation lines belong to the latest epoch record; skip those after
+    # event records (flag > 1), which hold header lines instead
+    line_epoch = np.cumsum(is_epoch) - 1
+    keep = ~is_epoch & (line_epoch >= 0) & (lengths > 0)
+    epoch_rows = np.flatnonzero(is_epoch)
+    for k in np.flatnonzero(flags > 1):
+        row = epoch_rows[k]
+        keep[row + 1:row + 1 + int(n_records[k])] = False
+
+    systems = np.array([ord(system) for system in obs_types], dtype=np.uint8)
+    keep &= np.isin(body[starts], systems)
+    lines = _line_matrix(body, starts, ends, lengths, keep, width)
+
+    # Decode in blocks of lines so the temporaries stay in cache
+    blocks = [_decode_obs_lines(lines[lo:lo + DECODE_BLOCK_LINES], n_types)
+              for lo in range(0, len(lines), DECODE_BLOCK_LINES)] or [_decode_obs_lines(lines, n_types)]
+    prn_codes, values, lli, ssi = (np.concatenate(parts) for parts in zip(*blocks))
+    unique_codes, prn_index = np.unique(prn_codes, return_inverse=True)
+    prns = np.array([f"{chr(code // 100)}{code % 100:02d}" for code in unique_codes], dtype='U3')
+
+    epoch_index = line_epoch[keep]
+    columns = {
+        'prns': prns,
+        'prn_index': prn_index.ravel(),
+        'epoch': epoch_seconds[epoch_index],
+        'epoch_index': epoch_index,
+        'values': values,
+        'LLI': lli,
+        'SSI': ssi,
+        'epoch_text': epoch_text,
+    }
+    return columns
+
+def parse_rinex_obs_fast(rinex_file, size=None):
+    """
+    Vectorized equivalent of parse_rinex_obs
+
+    Falls back to the line-by-line parser when a field is not in the fixed
+    format, so malformed lines are reported and skipped the same way.
+    """
+    try:
+        obs_types, columns = read_rinex_obs_columns(rinex_file, size)
+    except ValueError:
+        return parse_rinex_obs(rinex_file, size)
+
+    # Group rows by PRN, each group sorted by epoch with file order kept on ties
+    prn_index = columns['prn_index']
+    if (np.diff(columns['epoch']) >= 0).all():
+        order = np.argsort(prn_index.astype(np.int16), kind='stable')  # Radix sort for small ints
+    else:
+        order = np.lexsort((columns['epoch'], prn_index))
+    bounds = np.searchsorted(prn_index[order], np.arange(len(columns['prns']) + 1))
+
+    data = {}
+    for i, prn in enumerate(columns['prns']):
+        prn = str(prn)
+        types = obs_types[prn[0]]
+        rows = order[bounds[i]:bounds[i + 1]]
+        k = phase_index(types)
+
+        obs = np.empty(len(rows), dtype=obs_dtype(types))
+        obs['epoch'] = columns['epoch'][rows]
+        values = columns['values'][rows]
+        for j, obs_type in enumerate(types):
+            obs[obs_type] = values[:, j]
+        obs['LLI'] = columns['LLI'][rows, k]
+        obs['SSI'] = columns['SSI'][rows, k]
+        data[prn] = obs
+
+    return obs_types, data
+
+def _empty_columns(n_types):
+    return {
+        'prns': np.zeros(0, dtype='U3'),
+        'prn_index': np.zeros(0, dtype=np.int64),
+        'epoch': np.zeros(0),
+        'epoch_index': np.zeros(0, dtype=np.int64),
+        'values': np.zeros((0, n_types)),
+        'LLI': np.zeros((0, n_types), dtype=np.int8),
+        'SSI': np.zeros((0, n_types), dtype=np.int8),
+        'epoch_text': np.zeros(0, dtype='S27'),
+    }
+
+def _line_matrix(body, starts, ends, lengths, selected, width):
+    """
+    Selected lines as an (N, width) byte matrix, blank-padded or cut to width
+
+    Rows are copied from a sliding-window view of the body, so only the
+    selected lines' bytes are touched.
+
+    Args:
+        body: uint8 array of the file body
+        starts, ends: Offsets of each line's first byte and its newline
+        lengths: Line lengths without line terminators
+        selected: Boolean mask of the lines to keep
+    """
+    starts, lengths = starts[selected], lengths[selected]
+    matrix = np.full((len(starts), width), ord(' '), dtype=np.uint8)
+    if not len(starts):
+        return matrix
+
+    # Lines ending within width bytes of the end of the body are copied one by one
+    inside = starts + width <= len(body)
+    if inside.any():
+        matrix[inside] = np.lib.stride_tricks.sliding_window_view(body, width)[starts[inside]]
+    for row in np.flatnonzero(~inside):
+        tail = body[starts[row]:]
+        matrix[row, :len(tail)] = tail
+
+    if (lengths < width).any():
+        matrix[np.arange(width) >= lengths[:, None]] = ord(' ')
+    return matrix
+
+def _obs_line_layout(n_types):
+    """
+    Column masks and digit weights of an observation line
+
+    Returns:
+        dict: boolean column masks 'value' (columns of the F14.3 values),
+              'sign' (columns that may hold blanks or a sign), 'point',
+              'decimals', 'flags' and 'pairs' (adjacent columns within one
+              value); 'weights' and 'fields' are (width, n_types) matrices
+              giving each column's weight in thousandths and its value field
+    """
+    width = 3 + n_types * OBS_FIELD_WIDTH
+    layout = {name: np.zeros(width, dtype=bool) for name in ('value', 'sign', 'point', 'decimals', 'flags')}
+    layout['pairs'] = np.zeros(width - 1, dtype=bool)
+    layout['weights'] = np.zeros((width, n_types))
+    layout['fields'] = np.zeros((width, n_types))
+
+    for k in range(n_types):
+        start = 3 + k * OBS_FIELD_WIDTH
+        layout['value'][start:start + 14] = True
+        layout['sign'][start:start + 10] = True
+        layout['point'][start + 10] = True
+        layout['decimals'][start + 11:start + 14] = True
+        layout['flags'][start + 14:start + 16] = True
+        layout['pairs'][start:start + 13] = True
+        layout['weights'][start:start + 10, k] = 10.0 ** np.arange(12, 2, -1)
+        layout['weights'][start + 11:start + 14, k] = (100, 10, 1)
+        layout['fields'][start:start + 14, k] = 1
+    return layout
+
+def _decode_obs_lines(lines, n_types):
+    """
+    Decode the PRN numbers and observation fields of an (N, width) line matrix
+
+    The fields are checked with whole-matrix byte comparisons. The digits of
+    each F14.3 value are then summed with their powers of ten into exact
+    integer thousandths (one matrix product for all fields) and divided by
+    1000 once, which rounds exactly like float() on the field text.
+
+    Returns:
+        tuple: (prn_codes, values, LLI, SSI); prn_codes is system letter * 100 + number
+
+    Raises:
+        ValueError: if any field is not in the fixed F14.3/I1/I1 format
+    """
+    layout = _obs_line_layout(n_types)
+    digits = lines - np.uint8(ord('0'))
+    is_digit = digits < 10
+    space = lines == ord(' ')
+    minus = lines == ord('-')
+    point = lines == ord('.')
+
+    # Allowed characters per column; blanks and a sign only before the digits,
+    # and the point in place exactly in the non-blank values
+    allowed = is_digit & ~layout['point']
+    allowed |= space & (layout['sign'] | layout['point'] | layout['decimals'] | layout['flags'])
+    allowed |= minus & layout['sign']
+    allowed |= point & layout['point']
+    allowed[:, 0] = True
+    points = np.flatnonzero(layout['point'])
+    if not (allowed.all() and
+            not (~space[:, :-1] & (space | minus)[:, 1:] & layout['pairs']).any() and
+            (point[:, points] == ~space[:, points + 3]).all()):
+        raise ValueError("Observation line not in fixed-width format")
+
+    digits *= is_digit
+    values = digits.astype(np.float64) @ layout['weights'] / 1000
+    negative = minus.astype(np.float64) @ layout['fields'] > 0
+    values[negative] = -values[negative]
+    values[space[:, points + 3]] = np.nan
+
+    lli = digits[:, points + 4].astype(np.int8)
+    ssi = digits[:, points + 5].astype(np.int8)
+    prn_codes = lines[:, 0].astype(np.int64) * 100 + digits[:, 1] * 10 + digits[:, 2]
+    return prn_codes, values, lli, ssi
+
+def _decode_unsigned(block, decimals=0):
+    """
+    Decode right-aligned unsigned fixed-width numbers (Iw or Fw.d) from a byte matrix
+
+    The digits are summed as an exact integer and divided by 10**decimals once,
+    which rounds exactly like float() on the field text.
+
+    Args:
+        block: (N, width) uint8 array, one field per row
+        decimals: Digits after the decimal point; the point sits at a fixed column
+
+    Returns:
+        numpy array: float64 values
+
+    Raises:
+        ValueError: if a field is not leading blanks followed by digits
+    """
+    width = block.shape[1]
+    digits = block - np.uint8(ord('0'))
+    is_digit = digits < 10
+    space = block == ord(' ')
+    weights = 10.0 ** np.arange(width - 1, -1, -1)
+
+    if decimals:
+        point = width - decimals - 1
+        if not (block[:, point] == ord('.')).all():
+            raise ValueError("Misplaced decimal point in fixed-width field")
+        is_digit[:, point] = True
+        weights[:point] /= 10
+        weights[point] = 0
+    if not ((is_digit | space).all() and is_digit[:, -1].all() and
+            not (~space[:, :-1] & space[:, 1:]).any()):
+        raise ValueError("Unexpected character in fixed-width field")
+
+    digits *= is_digit
+    values = digits.astype(np.float64) @ weights
+    if decimals:
+        values /= 10 ** decimals
+    return values
+
+def _epoch_seconds(epoch_lines):
+    """Seconds since the GPS epoch for an (N, width) matrix of epoch record lines"""
+    def field(start, stop):
+        return _decode_unsigned(epoch_lines[:, start:stop]).astype(np.int64)
+
+    dates = ((field(2, 6) - 1970).astype('datetime64[Y]') +
+             (field(7, 9) - 1).astype('timedelta64[M]')).astype('datetime64[D]')
+    dates = dates + (field(10, 12) - 1).astype('timedelta64[D]')
+    day_seconds = (dates - np.datetime64('1980-01-06')).astype(np.int64) * 86400
+
+    whole = day_seconds + field(13, 15) * 3600 + field(16, 18) * 60
+    return whole.astype(np.float64) + _decode_unsigned(epoch_lines[:, 18:29], decimals=7)
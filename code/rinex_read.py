@@ -1,9 +1,11 @@
+from compression import open_text
+
 def parse_rinex_302(filename, output_csv):
     # Initialize data structures
     data = []  # List to store all observations
     current_timestamp = None
     
-    with open(filename) as f:
+    with open_text(filename) as f:
         # Skip header until data section
         for line in f:
             if "END OF HEADER" in line:
@@ -0,0 +1,423 @@
+import csv
+import os
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# File extensions of the supported table formats
+TABLE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.h5': 'hdf5',
+    '.hdf5': 'hdf5',
+    '.npz': 'npz',
+}
+
+def table_format(path):
+    """Table format of a file from its extension, e.g. 'ant0.parquet' -> 'parquet'"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format {extension!r}, use one of {', '.join(TABLE_FORMATS)}")
+    return TABLE_FORMATS[extension]
+
+def write_table(path, columns):
+    """
+    Write a table of equal-length columns, format chosen by the file extension
+
+    CSV writes datetime64 columns as 'YYYY-MM-DD HH:MM:SS.ffffff' and floats
+    at full precision. The binary formats keep the column types:
+
+    - .parquet: datetime64 as timestamp[us], string columns dictionary encoded
+      (needs pyarrow)
+    - .h5/.hdf5: one dataset per column, datetime64 as int64 microseconds and
+      strings as fixed-length ASCII (needs h5py)
+    - .npz: one array per column (numpy only)
+
+    Args:
+        path: Output file
+        columns: {name: numpy array}, in output column order
+    """
+    writer = {'csv': _write_csv, 'parquet': _write_parquet, 'hdf5': _write_hdf5, 'npz': _write_npz}
+    writer[table_format(path)](path, {name: np.asarray(values) for name, values in columns.items()})
+
+def read_table(path, columns=None):
+    """
+    Read a table written by write_table
+
+    The binary formats read only the requested columns from the file.
+
+    Args:
+        path: Input file, format chosen by the extension
+        columns: Column names to load, None for all
+
+    Returns:
+        dict: {name: numpy array} in file column order (or the order of columns)
+    """
+    reader = {'csv': _read_csv, 'parquet': _read_parquet, 'hdf5': _read_hdf5, 'npz': _read_npz}
+    read = reader[table_format(path)]
+    if not os.path.isdir(path):
+        return read(path, columns)
+
+    # Part files of an appended table
+    parts = [read(part, columns) for part in _part_files(path)]
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def append_table(path, columns):
+    """
+    Append rows to a table written by write_table, or write it if missing
+
+    Only the new rows are written: CSV rows are appended to the file and
+    HDF5 datasets are extended. A .parquet or .npz table becomes a directory
+    of part files, one per append (part-000000.parquet, ...), which
+    read_table reads back as one table.
+    """
+    columns = {name: np.asarray(values) for name, values in columns.items()}
+    if not os.path.exists(path):
+        write_table(path, columns)
+        return
+
+    fmt = table_format(path)
+    if fmt == 'csv':
+        _write_csv_rows(path, columns)
+        return
+    if list(table_columns(path)) != list(columns):
+        raise ValueError(f"Columns of {path} differ from the appended rows")
+    if fmt == 'hdf5':
+        _append_hdf5(path, columns)
+        return
+
+    if not os.path.isdir(path):
+        # The first part is the table written by write_table
+        first = path + '.part'
+        os.replace(path, first)
+        os.mkdir(path)
+        os.replace(first, _part_name(path, 0))
+    _write_part(path, len(_part_files(path)), columns)
+
+def truncate_table(path, n_rows):
+    """Drop the rows after the first n_rows of a table written by write_table or append_table"""
+    fmt = table_format(path)
+    if fmt == 'csv':
+        with open(path, 'rb+') as f:
+            for _ in range(n_rows + 1):  # Header line and n_rows rows
+                if not f.readline():
+                    return
+            f.truncate()
+        return
+    if fmt == 'hdf5':
+        _truncate_hdf5(path, n_rows)
+        return
+
+    start = 0  # Rows in the parts before the current one
+    for index, part in enumerate(_part_files(path)):
+        part_rows = _count_rows(part)
+        if start >= n_rows and index:  # Parts of a table directory; the first one stays for the columns
+            os.remove(part)
+        elif start + part_rows > n_rows:
+            table = read_table(part)
+            table = {name: values[:n_rows - start] for name, values in table.items()}
+            if os.path.isdir(path):
+                _write_part(path, index, table)
+            else:
+                write_table(path, table)
+        start += part_rows
+
+def remove_table(path):
+    """Delete a table file, or the part directory of an appended .parquet/.npz table"""
+    if os.path.isdir(path):
+        for part in os.listdir(path):
+            os.remove(os.path.join(path, part))
+        os.rmdir(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def table_columns(path):
+    """Column names of a table written by write_table, without loading the data"""
+    fmt = table_format(path)
+    if fmt in ('parquet', 'npz'):
+        path = _part_files(path)[0]
+    if fmt == 'csv':
+        with open(path, newline='') as f:
+            return next(csv.reader(f))
+    if fmt == 'parquet':
+        if pq is None:
+            raise RuntimeError("Parquet input needs pyarrow (pip install pyarrow)")
+        return pq.read_schema(path).names
+    if fmt == 'hdf5':
+        if h5py is None:
+            raise RuntimeError("HDF5 input needs h5py (pip install h5py)")
+        with h5py.File(path, 'r') as f:
+            return [str(name) for name in f.attrs['columns']]
+    with np.load(path) as archive:
+        return list(archive.files)
+
+class NormalizedTable:
+    """
+    Flat view of an epochs table and an observations table that references it
+
+    Every observation row carries the integer id of its epoch in the `key`
+    column. Columns are read from the files on first access; an epoch column
+    is then repeated for each observation of the epoch, e.g.
+
+        table = NormalizedTable('ant0_epochs.npz', 'ant0_observations.npz')
+        table['Rx_X']  # Receiver X of every observation row
+        table.flat()   # All columns, as the flat output
+    """
+    def __init__(self, epochs_file, observations_file, key='Epoch'):
+        self.epochs_file = epochs_file
+        self.observations_file = observations_file
+        self.key = key
+        self.epoch_columns = table_columns(epochs_file)
+        self.observation_columns = table_columns(observations_file)
+        self.loaded = {}  # Format: {name: column expanded to observation rows}
+        self._rows = None  # Epochs table row of each observation
+
+    @property
+    def columns(self):
+        """Column names of the flat view, observation columns first"""
+        return self.observation_columns + [name for name in self.epoch_columns
+                                           if name not in self.observation_columns]
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            if name in self.observation_columns:
+                self.loaded[name] = read_table(self.observations_file, [name])[name]
+            elif name in self.epoch_columns:
+                self.loaded[name] = read_table(self.epochs_file, [name])[name][self.epoch_rows()]
+            else:
+                raise KeyError(name)
+        return self.loaded[name]
+
+    def epoch_rows(self):
+        """Row of the epochs table for each observation"""
+        if self._rows is None:
+            epoch_ids = read_table(self.epochs_file, [self.key])[self.key]
+            observation_ids = self[self.key]
+            order = np.argsort(epoch_ids, kind='stable')
+            rows = order[np.clip(np.searchsorted(epoch_ids, observation_ids, sorter=order),
+                                 0, len(epoch_ids) - 1)]
+            if len(rows) and not np.array_equal(epoch_ids[rows], observation_ids):
+                raise ValueError(f"Observations in {self.observations_file} reference epochs "
+                                 f"missing from {self.epochs_file}")
+            self._rows = rows
+        return self._rows
+
+    def flat(self, columns=None):
+        """
+        Load columns of the flat view
+
+        Args:
+            columns: Column names, None for all
+
+        Returns:
+            dict: {name: numpy array} with one row per observation
+        """
+        return {name: self[name] for name in (self.columns if columns is None else columns)}
+
+def _select(available, columns, path):
+    """Requested column names, checked against those in the file"""
+    if columns is None:
+        return list(available)
+    missing = [name for name in columns if name not in available]
+    if missing:
+        raise KeyError(f"Columns not in {path}: {', '.join(missing)}")
+    return list(columns)
+
+def _part_name(path, index):
+    """Part file `index` of an appended table directory"""
+    return os.path.join(path, f"part-{index:06d}{os.path.splitext(path)[1]}")
+
+def _part_files(path):
+    """Part files of an appended .parquet/.npz table in row order, [path] for a single file"""
+    if not os.path.isdir(path):
+        return [path]
+    extension = os.path.splitext(path)[1]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.startswith('part-') and name.endswith(extension)]
+
+def _write_part(path, index, columns):
+    """Write part file `index` of a table directory, replacing it atomically"""
+    part = _part_name(path, index)
+    writer = {'parquet': _write_parquet, 'npz': _write_npz}[table_format(path)]
+    writer(part + '.tmp', columns)
+    os.replace(part + '.tmp', part)
+
+def _count_rows(part):
+    """Number of rows of a .parquet/.npz table file"""
+    if table_format(part) == 'parquet':
+        if pq is None:
+            raise RuntimeError("Parquet input needs pyarrow (pip install pyarrow)")
+        return pq.ParquetFile(part).metadata.num_rows
+    with np.load(part) as archive:
+        return len(archive[archive.files[0]]) if archive.files else 0
+
+def _write_csv(path, columns):
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerow(list(columns))
+    _write_csv_rows(path, columns)
+
+def _write_csv_rows(path, columns):
+    """Append the rows of columns to a CSV file"""
+    if not len(next(iter(columns.values()), ())):
+        return
+    values = []
+    for array in columns.values():
+        if np.issubdtype(array.dtype, np.datetime64):
+            array = np.char.replace(np.datetime_as_string(array.astype('datetime64[us]'), unit='us'), 'T', ' ')
+        values.append(array.tolist())
+
+    with open(path, 'a', newline='') as f:
+        csv.writer(f).writerows(zip(*values))
+
+def _read_csv(path, columns):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        names = _select(header, columns, path)
+        indices = [header.index(name) for name in names]
+        values = [[] for _ in names]
+        for row in reader:
+            for column, i in zip(values, indices):
+                column.append(row[i])
+
+    table = {}
+    for name, column in zip(names, values):
+        array = np.array(column)
+        # Convert back to numbers or times where every value parses
+        for dtype in ('f8', 'datetime64[us]'):
+            try:
+                array = array.astype(dtype)
+                break
+            except ValueError:
+                continue
+        table[name] = array
+    return table
+
+def _write_parquet(path, columns):
+    if pa is None:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow); use .npz instead")
+
+    arrays = []
+    for array in columns.values():
+        if array.dtype.kind in 'US':
+            arrays.append(pa.array(array.astype(str)).dictionary_encode())
+        elif np.issubdtype(array.dtype, np.datetime64):
+            arrays.append(pa.array(array.astype('datetime64[us]'), type=pa.timestamp('us')))
+        else:
+            arrays.append(pa.array(array))
+    pq.write_table(pa.Table.from_arrays(arrays, names=list(columns)), path)
+
+def _read_parquet(path, columns):
+    if pq is None:
+        raise RuntimeError("Parquet input needs pyarrow (pip install pyarrow)")
+
+    names = _select(pq.read_schema(path).names, columns, path)
+    table = pq.read_table(path, columns=names)
+    result = {}
+    for name in names:
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        result[name] = column.to_numpy()
+        if result[name].dtype == object:
+            result[name] = result[name].astype(str)
+    return result
+
+def _write_hdf5(path, columns):
+    if h5py is None:
+        raise RuntimeError("HDF5 output needs h5py (pip install h5py); use .npz instead")
+
+    with h5py.File(path, 'w') as f:
+        f.attrs['columns'] = list(columns)
+        for name, array in columns.items():
+            # Resizable, so append_table can extend the datasets in place
+            dataset = f.create_dataset(_hdf5_key(name), data=_hdf5_values(array), maxshape=(None,),
+                                       chunks=True)
+            if np.issubdtype(array.dtype, np.datetime64):
+                dataset.attrs['unit'] = 'datetime64[us]'
+
+def _hdf5_key(name):
+    # '/' would create a group in HDF5
+    return name.replace('/', '_')
+
+def _hdf5_values(array):
+    """Column as stored in HDF5: datetime64 as int64 microseconds, strings as ASCII bytes"""
+    if np.issubdtype(array.dtype, np.datetime64):
+        return array.astype('datetime64[us]').astype(np.int64)
+    if array.dtype.kind == 'U':
+        return np.char.encode(array, 'ascii')
+    return array
+
+def _append_hdf5(path, columns):
+    if h5py is None:
+        raise RuntimeError("HDF5 output needs h5py (pip install h5py); use .npz instead")
+
+    with h5py.File(path, 'r+') as f:
+        _check_resizable(path, [f[_hdf5_key(name)] for name in columns])
+        for name, array in columns.items():
+            key = _hdf5_key(name)
+            values = _hdf5_values(array)
+            dataset = f[key]
+            if values.dtype.kind == 'S' and values.dtype.itemsize > dataset.dtype.itemsize:
+                # Longer strings than the column holds: widen the column
+                old, attrs = dataset[()], dict(dataset.attrs)
+                del f[key]
+                dataset = f.create_dataset(key, data=old.astype(values.dtype), maxshape=(None,), chunks=True)
+                dataset.attrs.update(attrs)
+            n = dataset.shape[0]
+            dataset.resize((n + len(values),))
+            dataset[n:] = values
+
+def _truncate_hdf5(path, n_rows):
+    if h5py is None:
+        raise RuntimeError("HDF5 input needs h5py (pip install h5py)")
+
+    with h5py.File(path, 'r+') as f:
+        datasets = [f[_hdf5_key(str(name))] for name in f.attrs['columns']]
+        if not datasets or datasets[0].shape[0] <= n_rows:
+            return
+        _check_resizable(path, datasets)
+        for dataset in datasets:
+            dataset.resize((n_rows,))
+
+def _check_resizable(path, datasets):
+    """Appends and truncation resize the datasets in place, never rewrite the file"""
+    if not all(dataset.maxshape == (None,) for dataset in datasets):
+        raise ValueError(f"{path} has fixed-size datasets (written by an older version); "
+                         "remove it and write it again to append to it")
+
+def _read_hdf5(path, columns):
+    if h5py is None:
+        raise RuntimeError("HDF5 input needs h5py (pip install h5py)")
+
+    result = {}
+    with h5py.File(path, 'r') as f:
+        for name in _select([str(name) for name in f.attrs['columns']], columns, path):
+            dataset = f[_hdf5_key(name)]
+            array = dataset[()]
+            if dataset.attrs.get('unit') == 'datetime64[us]':
+                array = array.astype('datetime64[us]')
+            elif array.dtype.kind == 'S':
+                array = np.char.decode(array, 'ascii')
+            result[name] = array
+    return result
+
+def _write_npz(path, columns):
+    # np.savez would append .npz to other extensions; write through a file object
+    with open(path, 'wb') as f:
+        np.savez(f, **columns)
+
+def _read_npz(path, columns):
+    # NpzFile reads each array from the archive only when it is accessed
+    with np.load(path) as archive:
+        return {name: archive[name] for name in _select(archive.files, columns, path)}
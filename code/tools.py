@@ -1,32 +1,103 @@
-import csv
 import math
 import numpy as np
-from datetime import datetime, timedelta
+from compression import open_text
+from geodesy import lla_to_ecef
+from nmea import convert_nmea_to_decimal, iter_nmea_data, parse_nmea_data, process_nmea_group, read_nmea_tables
+from ephemeris import EPHEMERIS_FIELDS, to_seconds, to_time_of_week
+from orbit import compute_satellite_positions
+from ephemeris_strategies import InterpolatedEphemeris, OrbitFitEphemeris
+from rinex_obs import RinexFollower, RinexObservations
 
 class RinexCache:
     """Cache for RINEX data to avoid multiple file reads"""
-    def __init__(self):
-        self.data = {}  # Format: {timestamp: {prn: (carrier_phase, rss)}}
+    def __init__(self, max_gap=None):
+        self.observations = RinexObservations()  # Per-PRN structured arrays of all observables
+        self.epochs = np.zeros(0)  # Sorted epoch times, seconds since the GPS epoch
+        self.max_gap = max_gap  # Max seconds to the nearest epoch, None for no limit
+        self.follower = None  # RinexFollower when tailing a file still being written
         self.is_loaded = False
 
-    def load_data(self, rinex_file):
-        """Load RINEX data into cache"""
-        rinex_data = parse_rinex_302(rinex_file)
-        
-        # Organize data by timestamp and PRN
-        for prn, carrier_phase, rss, timestamp in rinex_data:
-            if timestamp not in self.data:
-                self.data[timestamp] = {}
-            self.data[timestamp][prn] = (carrier_phase, rss)
+    def load_data(self, rinex_file, cache=None, size=None):
+        """Load RINEX data into cache, reusing the parsed arrays from an optional FileCache"""
+        self.observations.load_data(rinex_file, cache=cache, size=size)
+        self.build_index()
+        self.is_loaded = True
+    
+    def follow(self, rinex_file, poll_interval=0.2):
+        """
+        Load a RINEX file that GNSS-SDR is still writing, e.g. with real_time.conf
         
+        Loads what is there now; call poll() (or iterate self.follower.follow())
+        to pick up epochs appended later.
+        """
+        self.follower = RinexFollower(rinex_file, self.observations, poll_interval)
         self.is_loaded = True
+        return self.poll()
+    
+    def poll(self):
+        """Load epochs appended since the last poll; returns the number of new epochs"""
+        n_epochs = self.follower.poll()
+        if n_epochs:
+            self.build_index()
+        return n_epochs
+    
+    def build_index(self):
+        """Build the sorted epoch array used for time lookups"""
+        self.epochs = self.observations.epochs
+    
+    def bracketing(self, timestamp):
+        """Epoch times at or before and after timestamp (None if missing)"""
+        i = np.searchsorted(self.epochs, to_seconds(timestamp), side='right')
+        before = self.epochs[i - 1] if i > 0 else None
+        after = self.epochs[i] if i < len(self.epochs) else None
+        return before, after
+    
+    def nearest(self, timestamp):
+        """Epoch time closest to timestamp, or None beyond max_gap"""
+        if not len(self.epochs):
+            return None
+        
+        t = to_seconds(timestamp)
+        i = np.searchsorted(self.epochs, t, side='left')
+        # The earlier epoch wins ties
+        if i == len(self.epochs) or (i > 0 and t - self.epochs[i - 1] <= self.epochs[i] - t):
+            i -= 1
+        
+        if self.max_gap is not None and abs(self.epochs[i] - t) > self.max_gap:
+            return None
+        return self.epochs[i]
+    
+    def nearest_epochs(self, times):
+        """
+        Batch version of nearest
+        
+        Args:
+            times: Times in seconds since the GPS epoch
+        
+        Returns:
+            numpy array: Closest epoch time for each time, NaN beyond max_gap
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        if not len(self.epochs):
+            return np.full(len(times), np.nan)
+        
+        i = np.searchsorted(self.epochs, times, side='left')
+        before = self.epochs[np.maximum(i - 1, 0)]
+        after = self.epochs[np.minimum(i, len(self.epochs) - 1)]
+        # The earlier epoch wins ties
+        use_before = (i == len(self.epochs)) | ((i > 0) & (times - before <= after - times))
+        nearest = np.where(use_before, before, after)
+        
+        if self.max_gap is not None:
+            nearest = np.where(np.abs(nearest - times) > self.max_gap, np.nan, nearest)
+        return nearest
 
 def parse_rinex_302(filename):
     """Parse RINEX 3.02 observation file"""
     data = []  # List to store all observations
     current_timestamp = None
     
-    with open(filename) as f:
+    with open_text(filename) as f:
         # Skip header until data section
         for line in f:
             if "END OF HEADER" in line:
@@ -61,296 +132,118 @@ def parse_rinex_302(filename):
     
     return data
 
-def parse_nmea_data(nmea_file):
-    """Parse NMEA file to extract timestamp, position and satellite information"""
-    data_groups = []
-    current_group = []
-    current_timestamp = None
-    
-    with open(nmea_file, 'r') as f:
-        lines = f.readlines()
-        
-    for line in lines:
-        if not line.strip():
-            continue
-            
-        try:
-            # Start of a new group when we see RMC message
-            if line.startswith('$GPRMC'):
-                if current_group:
-                    # Process previous group if exists
-                    try:
-                        parsed_data = process_nmea_group(current_group)
-                        if parsed_data:
-                            data_groups.append(parsed_data)
-                    except (ValueError, IndexError) as e:
-                        print(f"Error processing NMEA group: {e}")
-                    
-                # Start new group
-                current_group = [line]
-            else:
-                # Add line to current group
-                current_group.append(line)
-                
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing NMEA line: {e}")
-            continue
-            
-    # Process last group
-    if current_group:
-        try:
-            parsed_data = process_nmea_group(current_group)
-            if parsed_data:
-                data_groups.append(parsed_data)
-        except (ValueError, IndexError) as e:
-            print(f"Error processing final NMEA group: {e}")
-            
-    return data_groups
-
-def process_nmea_group(group):
-    """Process a group of NMEA messages that belong together"""
-    if len(group) < 3:  # Need at least RMC, GGA and GSA
-        return None
-        
-    try:
-        # Parse RMC line for timestamp and validity
-        rmc_parts = group[0].split(',')
-        if len(rmc_parts) < 10 or rmc_parts[2] != 'A':
-            return None
-            
-        time_str = rmc_parts[1]
-        date_str = rmc_parts[9]
-        
-        # Parse GGA line for position
-        gga_parts = group[1].split(',')
-        if len(gga_parts) < 10:
-            return None
-            
-        try:
-            lat = float(gga_parts[2])
-            lat_dir = gga_parts[3]
-            lon = float(gga_parts[4])
-            lon_dir = gga_parts[5]
-            alt = float(gga_parts[9])
-        except ValueError:
-            return None
-        
-        # Convert coordinates
-        lat_dec = convert_nmea_to_decimal(lat, lat_dir)
-        lon_dec = convert_nmea_to_decimal(lon, lon_dir)
-        
-        # Process all GSV messages to get complete satellite info
-        satellites = []
-        signal_strength = {}
-        elevation_angles = {}    
-        azimuth_angles = {}     
-        
-        for line in group:
-            if line.startswith('$GPGSV'):
-                gsv_parts = line.split(',')
-                # Process satellite info from GSV message
-                for j in range(4, len(gsv_parts)-1, 4):
-                    if j+3 < len(gsv_parts):
-                        prn = gsv_parts[j]
-                        if prn:
-                            sat_id = f"G{prn}"
-                            satellites.append(sat_id)
-                            # Add ele, azi, rss
-                            try:
-                                elevation_angles[sat_id] = float(gsv_parts[j+1])
-                                azimuth_angles[sat_id] = float(gsv_parts[j+2])
-                                signal_strength[sat_id] = float(gsv_parts[j+3])
-                            except (ValueError, IndexError):
-                                continue
-        
-        # Build timestamp
-        timestamp = datetime.strptime(f"{date_str}{time_str}", "%d%m%y%H%M%S.%f")
-        
-        return {
-            'timestamp': timestamp,
-            'lat': lat_dec,
-            'lon': lon_dec,
-            'alt': alt,
-            'satellites': satellites,
-            'signal_strength': signal_strength,
-            'elevation_angles': elevation_angles,    
-            'azimuth_angles': azimuth_angles        
-        }
-        
-    except (ValueError, IndexError) as e:
-        raise ValueError(f"Error processing NMEA group: {e}")
-
-def convert_nmea_to_decimal(coord, direction):
-    """Convert NMEA coordinate format to decimal degrees"""
-    degrees = int(coord / 100)
-    minutes = coord - degrees * 100
-    decimal = degrees + minutes / 60
-    
-    if direction in ['S', 'W']:
-        decimal = -decimal
-    return decimal
-
-def lla_to_ecef(lat, lon, alt):
-    """Convert LLA coordinates to ECEF coordinates"""
-    # WGS84 ellipsoid parameters
-    a = 6378137.0  # semi-major axis
-    f = 1/298.257223563  # flattening
-    b = a * (1 - f)  # semi-minor axis
-    e = math.sqrt(1 - (b/a)**2)  # eccentricity
-    
-    # Convert to radians
-    lat_rad = math.radians(lat)
-    lon_rad = math.radians(lon)
-    
-    # Calculate radius of curvature in prime vertical
-    N = a / math.sqrt(1 - e**2 * math.sin(lat_rad)**2)
-    
-    # Calculate ECEF coordinates
-    x = (N + alt) * math.cos(lat_rad) * math.cos(lon_rad)
-    y = (N + alt) * math.cos(lat_rad) * math.sin(lon_rad)
-    z = (N * (1 - e**2) + alt) * math.sin(lat_rad)
-    
-    return x, y, z
-
-def find_satellite_data(broadcast_file, target_time, target_prn):
+def find_satellite_data(ephemeris_store, target_time, target_prn):
     """
     Find satellite data blocks before and after target time
     
     Args:
-        broadcast_file: Path to broadcast ephemeris file
+        ephemeris_store: Loaded EphemerisStore
         target_time: Target timestamp
         target_prn: Target satellite PRN (e.g., 'G26')
     
     Returns:
-        tuple: (before_epoch, before_block, after_epoch, after_block)
+        tuple: (before_epoch, before_eph, after_epoch, after_eph)
     """
-    # Stores all ephemeris data for the PRN
-    all_epochs = []
-    all_blocks = []
+    before_epoch, before_eph, after_epoch, after_eph = ephemeris_store.bracketing(target_prn, target_time)
     
-    try:
-        with open(broadcast_file, 'r') as f:
-            # Skip header
-            for line in f:
-                if "END OF HEADER" in line:
-                    break
-            
-            # Read and process the data
-            line_count = 0
-            current_block = []
-            
-            for line in f:
-                if line[0] == 'G' and line[1:3].isdigit():
-                    current_block = [line]
-                    line_count = 1
-                elif line_count > 0:
-                    current_block.append(line)
-                    line_count += 1
-                    
-                    if line_count == 8:
-                        prn = current_block[0][0:3]
-                        if prn == target_prn:
-                            try:
-                                first_line = current_block[0]
-                                year = int(first_line[3:8])
-                                month = int(first_line[9:11])
-                                day = int(first_line[12:14])
-                                hour = int(first_line[15:17])
-                                minute = int(first_line[18:20])
-                                second = int(first_line[21:23])
-                                
-                                epoch = datetime(year, month, day, hour, minute, second)
-                                
-                                # Collect data for all the PRN
-                                all_epochs.append(epoch)
-                                all_blocks.append(current_block.copy())
-                                        
-                            except ValueError as e:
-                                print(f"Error parsing time for {prn}: {e}")
-                        
-                        line_count = 0
-                        current_block = []
+    if before_eph is not None:
+        print(f"Found bracketing epochs for {target_prn}:")
+        print(f"Before: {before_epoch} (diff: {(target_time - before_epoch).total_seconds()}s)")
+        print(f"After: {after_epoch} (diff: {(after_epoch - target_time).total_seconds()}s)")
         
-        # if find data
-        if all_epochs:
-            # sort according to time
-            sorted_data = sorted(zip(all_epochs, all_blocks))
-            all_epochs, all_blocks = zip(*sorted_data)
-            
-            # Find the position of the target time in the sorted time series
-            for i in range(len(all_epochs)-1):
-                if all_epochs[i] <= target_time < all_epochs[i+1]:
-                    before_epoch = all_epochs[i]
-                    before_block = all_blocks[i]
-                    after_epoch = all_epochs[i+1]
-                    after_block = all_blocks[i+1]
-                    
-                    print(f"Found bracketing epochs for {target_prn}:")
-                    print(f"Before: {before_epoch} (diff: {(target_time - before_epoch).total_seconds()}s)")
-                    print(f"After: {after_epoch} (diff: {(after_epoch - target_time).total_seconds()}s)")
-                    
-                    return before_epoch, before_block, after_epoch, after_block
-    
-    except FileNotFoundError:
-        print(f"Error: Could not find broadcast file")
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        return before_epoch, before_eph, after_epoch, after_eph
     
     print(f"Could not find bracketing epochs for {target_prn}")
     return None, None, None, None
 
-def parse_broadcast_ephemeris(broadcast_file, target_time, available_sats):
+def parse_broadcast_ephemeris(ephemeris_store, target_time, available_sats, orbit_arcs=None, max_hold=0,
+                              strategy=None):
     """
-    Parse broadcast ephemeris file and find satellite positions using interpolation
+    Find satellite positions from broadcast ephemeris using interpolation
     
     Args:
-        broadcast_file: Path to broadcast ephemeris file
+        ephemeris_store: EphemerisStore loaded from the broadcast ephemeris file
         target_time: Target timestamp (datetime object)
         available_sats: List of available satellite PRNs
+        orbit_arcs: Optional OrbitArcs from interpolated_orbit_arcs; positions are
+                    then evaluated from the fitted arcs instead of solving Kepler's equation
+        max_hold: Without bracketing records, use the first/last record as is if it
+                  is within this many seconds (e.g. 7200 for a single decoded ephemeris)
+        strategy: Optional EphemerisStrategy (see ephemeris_strategies) to evaluate
+                  the positions with instead
     
     Returns:
         dict: Dictionary of satellite positions {PRN: {'x': x, 'y': y, 'z': z}}
     """
     satellite_data = {}
+    interpolated = {}  # Format: {prn: interpolated ephemeris}
     
     try:
-        print(f"Parsing broadcast file for time: {target_time}")
+        print(f"Looking up broadcast ephemeris for time: {target_time}")
         print(f"Looking for satellites: {available_sats}")
         
+        if orbit_arcs is not None or strategy is not None:
+            for prn in available_sats:
+                if strategy is not None:
+                    x, y, z = strategy.prn_positions(prn, to_seconds(target_time))[0]
+                else:
+                    x, y, z = orbit_arcs.positions(prn, to_seconds(target_time))[0]
+                if np.isnan(x):
+                    print(f"Could not find bracketing ephemeris data for {prn}")
+                    continue
+                satellite_data[prn] = {
+                    'x': float(x),
+                    'y': float(y),
+                    'z': float(z)
+                }
+            print(f"Found data for {len(satellite_data)} satellites")
+            return satellite_data
+        
         # Process each satellite
         for prn in available_sats:
             print(f"\nProcessing satellite {prn}")
             
             # Find bracketing ephemeris data（before and after target_time in ephemeris）
-            before_epoch, before_block, after_epoch, after_block = find_satellite_data(broadcast_file, target_time, prn)
+            before_epoch, before_eph, after_epoch, after_eph = find_satellite_data(ephemeris_store, target_time, prn)
             
-            if not all([before_epoch, before_block, after_epoch, after_block]):
-                print(f"Could not find bracketing ephemeris data for {prn}")
+            if before_eph is None or after_eph is None:
+                # Outside the span covered by the records, hold the closest one
+                closest_epoch, closest_eph = ephemeris_store.closest(prn, target_time, max_diff=max_hold)
+                if closest_eph is None:
+                    print(f"Could not find bracketing ephemeris data for {prn}")
+                    continue
+                print(f"Using ephemeris at {closest_epoch} for {prn}")
+                interpolated[prn] = closest_eph
                 continue
                 
             try:
                 # Interpolate ephemeris data(before and after target_time) to get the ephemeris data at target_time
-                interpolated_eph = interpolate_ephemeris(before_block, after_block, target_time)
+                interpolated_eph = interpolate_ephemeris(before_eph, after_eph, target_time)
                 
                 if interpolated_eph:
-                    # Compute precise satellite position using Keplerian orbital parameters at the target_time
-                    x, y, z = compute_satellite_position(interpolated_eph, target_time.timestamp())
-                    
-                    satellite_data[prn] = {
-                        'x': x,
-                        'y': y,
-                        'z': z
-                    }
-                    print(f"Successfully computed position for {prn} at {target_time}")
+                    interpolated[prn] = interpolated_eph
                 else:
                     print(f"Failed to interpolate ephemeris data for {prn}")
                     
             except Exception as e:
                 print(f"Error processing satellite {prn}: {str(e)}")
                 continue
+        
+        if interpolated:
+            # Compute precise positions of all satellites at the target_time in one batch
+            eph_params = {key: [eph[key] for eph in interpolated.values()] for key in EPHEMERIS_FIELDS}
+            positions = compute_satellite_positions(eph_params, to_time_of_week(to_seconds(target_time)))
+            
+            for prn, (x, y, z) in zip(interpolated, positions):
+                satellite_data[prn] = {
+                    'x': float(x),
+                    'y': float(y),
+                    'z': float(z)
+                }
+                print(f"Successfully computed position for {prn} at {target_time}")
     
     except Exception as e:
-        print(f"Error parsing broadcast file: {str(e)}")
+        print(f"Error reading broadcast ephemeris: {str(e)}")
         return {}
     
     print(f"Found data for {len(satellite_data)} satellites")
@@ -448,66 +341,13 @@ def compute_satellite_position(eph_data, time):
     
     return x, y, z
 
-def process_satellite_block(prn, data_lines, target_time, satellite_data):
-    """Process a complete satellite data block (8 lines) and compute precise position"""
+def process_satellite_block(prn, eph_data, target_time, satellite_data):
+    """Compute precise position from a parsed ephemeris record"""
     try:
-        # Parse first line for epoch and clock data
-        line1 = data_lines[0]
-        year = int(line1[3:8])
-        month = int(line1[9:11])
-        day = int(line1[12:14])
-        hour = int(line1[15:17])
-        minute = int(line1[18:20])
-        second = int(line1[21:23])
-        
-        epoch = datetime(year, month, day, hour, minute, second)
-        
-        # Parse orbital parameters according to the actual format
-        eph_data = {
-            'epoch': epoch,
-            # Line 1: Clock parameters
-            'clock_bias': float(line1[23:42]),      # -2.522906288505e-05
-            'clock_drift': float(line1[42:61]),     # -1.455191522837e-11
-            'clock_drift_rate': float(line1[61:80]), # 0.000000000000e+00
-            
-            # Line 2
-            'IODE': float(data_lines[1][0:23]),     # 6.800000000000e+01
-            'Crs': float(data_lines[1][23:42]),     # 2.596875000000e+01
-            'delta_n': float(data_lines[1][42:61]),  # 5.071639825584e-09
-            'M0': float(data_lines[1][61:80]),      # -1.701657829267e+00
-            
-            # Line 3
-            'Cuc': float(data_lines[2][0:23]),      # 1.104548573494e-06
-            'e': float(data_lines[2][23:42]),       # 9.773897123523e-03
-            'Cus': float(data_lines[2][42:61]),     # 9.480863809586e-06
-            'sqrt_a': float(data_lines[2][61:80]),  # 5.153752502441e+03
-            
-            # Line 4
-            'toe': float(data_lines[3][0:23]),      # 5.183840000000e+05
-            'Cic': float(data_lines[3][23:42]),     # 6.705522537231e-08
-            'OMEGA0': float(data_lines[3][42:61]),  # 2.363421419612e+00
-            'Cis': float(data_lines[3][61:80]),     # -1.359730958939e-07
-            
-            # Line 5
-            'i0': float(data_lines[4][0:23]),       # 9.298234122031e-01
-            'Crc': float(data_lines[4][23:42]),     # 1.748750000000e+02
-            'omega': float(data_lines[4][42:61]),   # 5.995726430872e-01
-            'OMEGA_dot': float(data_lines[4][61:80]),# -8.051049644248e-09
-            
-            # Line 6 (we might need some of these parameters later)
-            'idot': float(data_lines[5][0:23]),     # -3.396570052205e-10
-            'codes': float(data_lines[5][23:42]),   # 1.000000000000e+00
-            'week': float(data_lines[5][42:61]),    # 2.346000000000e+03
-            
-            # Line 7 (additional parameters if needed)
-            'accuracy': float(data_lines[6][0:23]),  # 2.000000000000e+00
-            'health': float(data_lines[6][23:42]),  # 0.000000000000e+00
-            'Tgd': float(data_lines[6][42:61]),     # 6.519258022308e-09
-            'IODC': float(data_lines[6][61:80])     # 6.800000000000e+01
-        }
+        epoch = eph_data['epoch']
         
         # Compute satellite position
-        x, y, z = compute_satellite_position(eph_data, target_time.timestamp())
+        x, y, z = compute_satellite_position(eph_data, to_time_of_week(to_seconds(target_time)))
         
         satellite_data[prn] = {
             'epoch': epoch,
@@ -518,63 +358,110 @@ def process_satellite_block(prn, data_lines, target_time, satellite_data):
         
         print(f"Successfully processed {prn} for epoch {epoch}")
         
-    except (ValueError, IndexError) as e:
+    except (KeyError, ValueError) as e:
         print(f"Error processing satellite {prn}: {str(e)}")
-        print("Data lines:")
-        for i, line in enumerate(data_lines):
-            print(f"Line {i+1}: {line.strip()}")
         return
 
 def get_carrier_phase_rss(rinex_cache, timestamp, prn):
-    """Get carrier phase and RSS for specific timestamp and PRN"""
-    timestamp_str = timestamp.strftime("%Y %m %d %H %M %S.%f")
+    """Get carrier phase and RSS for the RINEX epoch closest to timestamp and PRN"""
+    closest_time = rinex_cache.nearest(timestamp)
     
-    if timestamp_str in rinex_cache.data.keys():
-        if prn in rinex_cache.data[timestamp_str]:
-            return rinex_cache.data[timestamp_str][prn]
+    if closest_time is not None:
+        observation = rinex_cache.observations.observation(prn, closest_time)
+        if observation is not None:
+            return float(observation['L1C']), float(observation['S1C'])
     
-    closest_time = min(rinex_cache.data.keys(), 
-                      key=lambda x: abs(datetime.strptime(x[:-1], "%Y %m %d %H %M %S.%f") - timestamp))
+    return 0.0, 0.0
+
+def carrier_phase_rss(rinex_cache, times, prns):
+    """
+    Batch version of get_carrier_phase_rss
     
-    if prn in rinex_cache.data[closest_time]:
-        return rinex_cache.data[closest_time][prn]
+    Args:
+        rinex_cache: Loaded RinexCache
+        times: Times in seconds since the GPS epoch, one per observation
+        prns: Satellite PRNs (e.g., 'G26'), one per observation
     
-    return 0.0, 0.0
+    Returns:
+        tuple: (carrier phase, RSS) arrays, 0.0 where the RINEX file has no observation
+    """
+    prns = np.asarray(prns)
+    epochs = rinex_cache.nearest_epochs(times)
+    carrier_phase = np.zeros(len(prns))
+    rss = np.zeros(len(prns))
+    
+    for prn in np.unique(prns):
+        obs = rinex_cache.observations.data.get(str(prn))
+        if obs is None or not len(obs):
+            continue
+        mask = prns == prn
+        i = np.minimum(np.searchsorted(obs['epoch'], epochs[mask], side='left'), len(obs) - 1)
+        found = obs['epoch'][i] == epochs[mask]
+        carrier_phase[mask] = np.where(found, obs['L1C'][i], 0.0)
+        rss[mask] = np.where(found, obs['S1C'][i], 0.0)
+    
+    return carrier_phase, rss
+
+def satellite_positions(ephemeris_store, times, prns, orbit_arcs=None, max_hold=0, strategy=None):
+    """
+    Batch version of parse_broadcast_ephemeris for many (time, PRN) pairs
+    
+    Args:
+        ephemeris_store: EphemerisStore loaded from the broadcast ephemeris file
+        times: Times in seconds since the GPS epoch, one per pair
+        prns: Satellite PRNs (e.g., 'G26'), one per pair
+        orbit_arcs: Optional OrbitArcs from interpolated_orbit_arcs
+        max_hold: Hold the first/last record this many seconds, as in parse_broadcast_ephemeris
+        strategy: Optional EphemerisStrategy to evaluate the positions with instead
+    
+    Returns:
+        numpy array: (N, 3) ECEF coordinates in meters, NaN where no ephemeris applies
+    """
+    if strategy is None and orbit_arcs is None:
+        strategy = InterpolatedEphemeris(ephemeris_store, max_hold=max_hold)
+    if strategy is not None:
+        return strategy.positions(times, prns)
+    
+    times = np.asarray(times, dtype=np.float64)
+    prns = np.asarray(prns)
+    positions = np.full((len(prns), 3), np.nan)
+    for prn in np.unique(prns):
+        mask = prns == prn
+        positions[mask] = orbit_arcs.positions(str(prn), times[mask])
+    return positions
+
+def interpolated_orbit_arcs(ephemeris_store, window=900, tolerance=0.01, max_hold=0):
+    """
+    Chebyshev orbit arcs of the interpolated broadcast ephemeris model
+    
+    Args:
+        ephemeris_store: EphemerisStore loaded from the broadcast ephemeris file
+        window: Fit window length (s)
+        tolerance: Maximum fit error (m); the model itself carries a few mm of
+                   floating-point noise, so tolerances below ~1 cm are not reachable
+        max_hold: Hold the first/last record this many seconds, as in parse_broadcast_ephemeris
+    
+    Returns:
+        OrbitArcs: evaluates positions at times in seconds since the GPS epoch
+    """
+    # Arcs are cut at ephemeris epochs, where the interpolated parameters kink
+    return OrbitFitEphemeris(ephemeris_store, InterpolatedEphemeris(ephemeris_store, max_hold=max_hold),
+                             window=window, tolerance=tolerance).orbit_arcs
 
-def interpolate_ephemeris(before_block, after_block, target_time):
+def interpolate_ephemeris(before_eph, after_eph, target_time):
     """
     Interpolate ephemeris parameters for target time
     
     Args:
-        before_block: Ephemeris data block before target time
-        after_block: Ephemeris data block after target time
+        before_eph: Ephemeris record before target time
+        after_eph: Ephemeris record after target time
         target_time: Target timestamp
     
     Returns:
         dict: Interpolated ephemeris parameters
     """
-    # Process ephemeris blocks into dict 
-    before_eph = process_ephemeris_block(before_block)
-    after_eph = process_ephemeris_block(after_block)
-    
-    # Convert time strings to datetime objects
-    before_time = datetime(
-        int(before_block[0][3:8]),
-        int(before_block[0][9:11]),
-        int(before_block[0][12:14]),
-        int(before_block[0][15:17]),
-        int(before_block[0][18:20]),
-        int(before_block[0][21:23])
-    )
-    
-    after_time = datetime(
-        int(after_block[0][3:8]),
-        int(after_block[0][9:11]),
-        int(after_block[0][12:14]),
-        int(after_block[0][15:17]),
-        int(after_block[0][18:20]),
-        int(after_block[0][21:23])
-    )
+    before_time = before_eph['epoch']
+    after_time = after_eph['epoch']
     
     # Compute interpolation factor
     total_interval = (after_time - before_time).total_seconds()
@@ -583,59 +470,7 @@ def interpolate_ephemeris(before_block, after_block, target_time):
     
     # Interpolate ephemeris parameters
     interpolated_eph = {}
-    for key in before_eph.keys():
+    for key in EPHEMERIS_FIELDS:
         interpolated_eph[key] = before_eph[key] + (after_eph[key] - before_eph[key]) * t
     
     return interpolated_eph
-
-def process_ephemeris_block(data_lines):
-    """
-    Parse ephemeris data block into dictionary
-    
-    Args:
-        data_lines: List of 8 lines containing ephemeris data
-    
-    Returns:
-        dict: Parsed ephemeris parameters
-    """
-    try:
-        eph_data = {
-            # Line 1: Clock parameters
-            'clock_bias': float(data_lines[0][23:42]),      # -2.522906288505e-05
-            'clock_drift': float(data_lines[0][42:61]),     # -1.455191522837e-11
-            'clock_drift_rate': float(data_lines[0][61:80]), # 0.000000000000e+00
-            
-            # Line 2
-            'IODE': float(data_lines[1][0:23]),     # 6.800000000000e+01
-            'Crs': float(data_lines[1][23:42]),     # 2.596875000000e+01
-            'delta_n': float(data_lines[1][42:61]),  # 5.071639825584e-09
-            'M0': float(data_lines[1][61:80]),      # -1.701657829267e+00
-            
-            # Line 3
-            'Cuc': float(data_lines[2][0:23]),      # 1.104548573494e-06
-            'e': float(data_lines[2][23:42]),       # 9.773897123523e-03
-            'Cus': float(data_lines[2][42:61]),     # 9.480863809586e-06
-            'sqrt_a': float(data_lines[2][61:80]),  # 5.153752502441e+03
-            
-            # Line 4
-            'toe': float(data_lines[3][0:23]),      # 5.183840000000e+05
-            'Cic': float(data_lines[3][23:42]),     # 6.705522537231e-08
-            'OMEGA0': float(data_lines[3][42:61]),  # 2.363421419612e+00
-            'Cis': float(data_lines[3][61:80]),     # -1.359730958939e-07
-            
-            # Line 5
-            'i0': float(data_lines[4][0:23]),       # 9.298234122031e-01
-            'Crc': float(data_lines[4][23:42]),     # 1.748750000000e+02
-            'omega': float(data_lines[4][42:61]),   # 5.995726430872e-01
-            'OMEGA_dot': float(data_lines[4][61:80]),# -8.051049644248e-09
-            
-            # Line 6
-            'idot': float(data_lines[5][0:23]),     # -3.396570052205e-10
-        }
-        
-        return eph_data
-        
-    except (ValueError, IndexError) as e:
-        print(f"Error processing ephemeris block: {str(e)}")
-        return None
-
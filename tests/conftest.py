@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules in code/ import each other as top-level modules
+CODE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SAMPLE_DIR = os.path.join(os.path.dirname(CODE_DIR), '12_27_4_ants')
+
+sys.path.insert(0, CODE_DIR)
@@ -0,0 +1,34 @@
+import hashlib
+from checkpoint import Checkpoint, PrefixHasher, prefix_fingerprint
+
+def test_prefix_hasher_matches_prefix_fingerprint(tmp_path):
+    path = str(tmp_path / 'input.nmea')
+    data = bytes(range(256)) * 9000
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    hasher = PrefixHasher(path)
+    for size in (0, 1000, 1000, 1 << 20, 2000000, 5000, len(data), None):
+        assert hasher.fingerprint(size) == prefix_fingerprint(path, size)
+    assert hasher.fingerprint(len(data) + 10) == {'size': len(data), 'sha1': hashlib.sha1(data).hexdigest()}
+
+def test_checkpoint_growing_input(tmp_path):
+    path = str(tmp_path / 'input.nmea')
+    with open(path, 'wb') as f:
+        f.write(b"$GPRMC,1\n" * 1000)
+    checkpoint = Checkpoint(str(tmp_path / 'out.csv'))
+    checkpoint.start({'nmea': path}, growing=('nmea',), settings={})
+    size = len(b"$GPRMC,1\n" * 1000)
+    checkpoint.advance({'nmea': path}, {'nmea': size}, 10, 0.0, {'rows': 10}, complete=True)
+
+    with open(path, 'ab') as f:
+        f.write(b"$GPRMC,2\n")
+    resumed = Checkpoint(str(tmp_path / 'out.csv'))
+    resumed.load()
+    assert resumed.resumable({'nmea': path}, {}) is None
+    assert not resumed.up_to_date({'nmea': path})
+
+    with open(path, 'r+b') as f:
+        f.write(b"$GPRMC,3")  # Changed, not appended
+    resumed.load()
+    assert resumed.resumable({'nmea': path}, {}) == f"nmea file {path} changed"
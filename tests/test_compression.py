@@ -0,0 +1,50 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from conftest import DATA_DIR
+import compression
+from rinex_obs import parse_rinex_obs
+
+PLAIN = os.path.join(DATA_DIR, 'short.24O')
+HATANAKA = os.path.join(DATA_DIR, 'short.24D')  # PLAIN compressed with RNX2CRX
+
+def test_unlzw():
+    """compress (.Z) data, also with 10-bit codes and table clears, decodes to the original"""
+    with open(PLAIN, 'rb') as f:
+        plain = f.read()
+    for name in ('short.24O.Z', 'short_10bit.24O.Z'):
+        with open(os.path.join(DATA_DIR, name), 'rb') as f:
+            assert b"".join(compression._unlzw_chunks(f)) == plain
+        with compression.open_binary(os.path.join(DATA_DIR, name)) as f:
+            assert f.read() == plain
+
+def test_unlzw_rejects_other_data():
+    with open(PLAIN, 'rb') as f:
+        with pytest.raises(ValueError):
+            b"".join(compression._unlzw_chunks(f))
+
+needs_crx2rnx = pytest.mark.skipif(not (shutil.which('crx2rnx') or shutil.which('CRX2RNX')),
+                                   reason="CRX2RNX is not on the PATH")
+
+@needs_crx2rnx
+def test_hatanaka_matches_plain():
+    # CRX2RNX drops trailing blanks
+    with open(PLAIN, 'rb') as f:
+        plain = [line.rstrip() for line in f]
+    with compression.open_binary(HATANAKA) as f:
+        assert [line.rstrip() for line in f] == plain
+
+@needs_crx2rnx
+def test_hatanaka_observations():
+    obs_types, expected = parse_rinex_obs(PLAIN)
+    hatanaka_types, observations = parse_rinex_obs(HATANAKA)
+    assert hatanaka_types == obs_types
+    assert sorted(observations) == sorted(expected)
+    for prn, rows in expected.items():
+        np.testing.assert_array_equal(observations[prn], rows)
+
+def test_hatanaka_without_crx2rnx(monkeypatch):
+    monkeypatch.setattr(compression.shutil, 'which', lambda program: None)
+    with pytest.raises(RuntimeError, match="CRX2RNX"):
+        compression.open_binary(HATANAKA).read()
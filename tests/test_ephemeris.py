@@ -0,0 +1,34 @@
+import os
+import re
+from datetime import datetime
+import ephemeris
+from conftest import SAMPLE_DIR
+from ephemeris import parse_gnss_sdr_xml
+
+SESSION_XML = os.path.join(SAMPLE_DIR, '12_27_ant1', 'gps_ephemeris.xml')
+
+def test_gnss_sdr_xml_tree_stays_small(tmp_path, monkeypatch):
+    """Parsed records are removed from the tree, however many the file holds"""
+    with open(SESSION_XML) as f:
+        text = f.read()
+    items = re.findall(r"<item class_id.*?</item>|<item>.*?</item>", text, re.S)
+    start, end = text.index(items[0]), text.index(items[-1]) + len(items[-1])
+    path = tmp_path / 'gps_ephemeris.xml'
+    path.write_text(text[:start] + "\n".join(items * 400) + text[end:])
+
+    parsers = []
+    iterparse = ephemeris.ET.iterparse
+
+    def recording_iterparse(*args, **kwargs):
+        parsers.append(iterparse(*args, **kwargs))
+        return parsers[-1]
+
+    monkeypatch.setattr(ephemeris.ET, 'iterparse', recording_iterparse)
+    records = parse_gnss_sdr_xml(str(path), reference_time=datetime(2024, 12, 27))
+    monkeypatch.undo()
+
+    expected = parse_gnss_sdr_xml(SESSION_XML, reference_time=datetime(2024, 12, 27))
+    assert len(records) == 400 * len(expected)
+    assert records[:len(expected)].tobytes() == expected.tobytes()
+    # What is left of the tree: the root, the map, its count and item_version
+    assert sum(1 for _ in parsers[0].root.iter()) < 10
@@ -0,0 +1,128 @@
+import contextlib
+import io
+import os
+import numpy as np
+import pytest
+from conftest import SAMPLE_DIR
+import tools
+import tools_wo_interpolate
+from ephemeris import EphemerisStore, from_seconds, to_time_of_week
+from ephemeris_strategies import EphemerisStrategy, InterpolatedEphemeris, NearestEphemeris, OrbitFitEphemeris, ValidEphemeris
+from nmea import read_nmea_tables
+from position_memo import PositionMemo, set_process_memo
+
+@pytest.fixture(scope='module')
+def session():
+    store = EphemerisStore()
+    store.load_data(os.path.join(SAMPLE_DIR, 'brdc3620.24n'))
+    epochs, satellites = read_nmea_tables(os.path.join(SAMPLE_DIR, '12_27_ant1', 'nmea_pvt.nmea'))
+    # Every 100th epoch
+    satellites = satellites[satellites['epoch'] % 100 == 0]
+    times = epochs['time'][satellites['epoch']]
+    prns = np.char.add('G', np.char.zfill(satellites['prn'].astype(str), 2))
+    return store, times, prns
+
+def reference_positions(parse_broadcast_ephemeris, store, times, prns):
+    """Positions of the per-epoch reference path, NaN where it has none"""
+    positions = np.full((len(times), 3), np.nan)
+    for time in np.unique(times):
+        rows = np.flatnonzero(times == time)
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = parse_broadcast_ephemeris(store, from_seconds(time), prns[rows].tolist())
+        for row in rows:
+            if prns[row] in found:
+                positions[row] = [found[prns[row]][axis] for axis in 'xyz']
+    return positions
+
+def test_nearest_matches_closest_record(session):
+    store, times, prns = session
+    positions = NearestEphemeris(store).positions(times, prns)
+    assert np.isfinite(positions).all()
+    for time, prn, position in zip(times, prns, positions):
+        _, record = store.closest(prn, from_seconds(time), max_diff=3600)
+        expected = tools.compute_satellite_position(record, to_time_of_week(time))
+        np.testing.assert_allclose(position, expected, rtol=0, atol=1e-6)
+
+def test_nearest_matches_tools_wo_interpolate(session):
+    store, times, prns = session
+    expected = reference_positions(tools_wo_interpolate.parse_broadcast_ephemeris, store, times, prns)
+    np.testing.assert_allclose(NearestEphemeris(store).positions(times, prns), expected, rtol=0, atol=1e-6)
+
+def test_tools_wo_interpolate_reports_record_epoch(session):
+    store, times, prns = session
+    time = from_seconds(times[0])
+    available = prns[times == times[0]].tolist()
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = tools_wo_interpolate.parse_broadcast_ephemeris(store, time, available)
+    assert found
+    for prn, position in found.items():
+        assert list(position) == ['epoch', 'x', 'y', 'z']
+        assert position['epoch'] == store.closest(prn, time, max_diff=3600)[0]
+
+def test_interpolate_matches_tools(session):
+    store, times, prns = session
+    expected = reference_positions(tools.parse_broadcast_ephemeris, store, times, prns)
+    positions = InterpolatedEphemeris(store).positions(times, prns)
+    np.testing.assert_allclose(positions, expected, rtol=0, atol=1e-6)
+
+def test_orbit_fit_within_tolerance(session):
+    store, times, prns = session
+    interpolated = InterpolatedEphemeris(store)
+    positions = OrbitFitEphemeris(store, interpolated, window=900, tolerance=0.01).positions(times, prns)
+    expected = interpolated.positions(times, prns)
+    assert np.array_equal(np.isnan(positions), np.isnan(expected))
+    assert np.nanmax(np.linalg.norm(positions - expected, axis=1)) < 0.01
+
+def test_orbit_fit_ignores_memo_quantum(session):
+    """The arcs are fitted to exact positions, also while the memo rounds times"""
+    store, times, prns = session
+    times = times + 0.3  # Off the quantum
+    expected = OrbitFitEphemeris(store).positions(times, prns)
+    previous = set_process_memo(PositionMemo(quantum=1.0))
+    try:
+        rounded = InterpolatedEphemeris(store).positions(times, prns)
+        positions = OrbitFitEphemeris(store).positions(times, prns)
+    finally:
+        set_process_memo(previous)
+    # The memo does round the times of the record-based strategies...
+    assert np.nanmax(np.linalg.norm(rounded - expected, axis=1)) > 100
+    # ...but not those of the fitted arcs
+    np.testing.assert_array_equal(positions, expected)
+
+def test_valid_close_to_nearest(session):
+    """The valid and the closest record of a satellite give positions within a meter"""
+    store, times, prns = session
+    positions = ValidEphemeris(store).positions(times, prns)
+    found = np.isfinite(positions).all(axis=1)
+    assert found.any()
+    nearest = NearestEphemeris(store).positions(times[found], prns[found])
+    assert np.max(np.linalg.norm(positions[found] - nearest, axis=1)) < 1
+
+def test_strategy_needs_sources(session):
+    store, _, _ = session
+    with pytest.raises(TypeError):
+        EphemerisStrategy(store)
+
+def test_valid_selects_latest_usable_record(session):
+    """ValidEphemeris.sources agrees with checking every record at every time"""
+    store = session[0]
+    for prn in store.prns:
+        records = store.records(prn)
+        times = np.concatenate([np.linspace(records['time'][0] - 20000, records['time'][-1] + 20000, 500),
+                                records['time'], records['time'] + 7200])
+        toe = records['week'] * 604800 + records['toe']
+        transmitted = records['week'] * 604800 + records['transmission_time']
+        transmitted = np.where(records['transmission_time'] - records['toe'] > 302400,
+                               transmitted - 604800, transmitted)
+        half_fit = np.maximum(records['fit_interval'], 4) * 1800
+        for require_healthy in (True, False):
+            index, _ = ValidEphemeris(store, require_healthy).sources(prn, times)
+            for time, found in zip(times, index):
+                usable = (transmitted <= time) & (np.abs(time - toe) <= half_fit)
+                if require_healthy:
+                    usable &= records['health'] == 0
+                if not usable.any():
+                    assert found == -1
+                    continue
+                best = max(np.flatnonzero(usable), key=lambda j: (transmitted[j], toe[j], j))
+                assert found == best
@@ -0,0 +1,44 @@
+import contextlib
+import glob
+import io
+import os
+import numpy as np
+import pytest
+from conftest import CODE_DIR, SAMPLE_DIR
+from ephemeris import EphemerisStore
+from main import batch_columns, make_strategy, per_row_columns, process_antenna
+from nmea import read_nmea_tables
+from tools import RinexCache
+
+EPHEMERIS = os.path.join(SAMPLE_DIR, 'brdc3620.24n')
+
+def antenna_files(antenna):
+    antenna_dir = os.path.join(SAMPLE_DIR, f"12_27_{antenna}")
+    return os.path.join(antenna_dir, 'nmea_pvt.nmea'), glob.glob(os.path.join(antenna_dir, '*.24O'))[0]
+
+@pytest.mark.parametrize('antenna', ['ant0', 'ant1', 'ant2', 'ant3'])
+def test_bundled_outputs_are_current(tmp_path, antenna):
+    """code/data holds what `python code/main.py 12_27_4_ants` writes"""
+    nmea_file, rinex_file = antenna_files(antenna)
+    output_file = tmp_path / f"{antenna}.csv"
+    process_antenna(nmea_file, rinex_file, EPHEMERIS, str(output_file), use_cache=False)
+    with open(os.path.join(CODE_DIR, 'data', f"{antenna}.csv"), 'rb') as f:
+        assert output_file.read_bytes() == f.read()
+
+@pytest.mark.parametrize('strategy', ['orbit-fit', 'nearest'])
+def test_batch_matches_per_row(strategy):
+    """The rows of a whole sample session are the same either way"""
+    nmea_file, rinex_file = antenna_files('ant1')
+    nmea_epochs, nmea_satellites = read_nmea_tables(nmea_file)
+    store = EphemerisStore()
+    store.load_data(EPHEMERIS)
+    rinex_cache = RinexCache(max_gap=1.0)
+    rinex_cache.load_data(rinex_file)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        per_row = per_row_columns(nmea_epochs, nmea_satellites, make_strategy(store, strategy), rinex_cache)
+    batch = batch_columns(nmea_epochs, nmea_satellites, make_strategy(store, strategy), rinex_cache)
+    assert list(batch) == list(per_row)
+    assert len(batch['PRN']) > 10000
+    for name in per_row:
+        np.testing.assert_array_equal(batch[name], per_row[name], err_msg=name)
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from ephemeris import leap_seconds, to_seconds
+from nmea import _nmea_table_rows, nmea_checksum, nmea_time, read_nmea_tables
+
+RMC = '$GPRMC,024224.19,A,2218.2843243,N,11410.7912126,E,11.26,208.15,271224,0.0,E,A'
+GGA = '$GPGGA,024224.19,2218.2843243,N,11410.7912126,E,1,04,1.0,60.057,M,0.000,M,0.0,'
+GSA = '$GPGSA,A,3,26,29,31,32,,,,,,,,,5.1,2.9,4.2,1'
+
+def gsv(number, total, *prns):
+    """One $GPGSV page listing prns, with elevation prn, azimuth 10 * prn and SNR 40"""
+    blocks = ''.join(f",{prn:02d},{prn},{10 * prn:03d},40" for prn in prns)
+    return f"$GPGSV,{total},{number},{len(prns)}{blocks},1"
+
+def satellites_of(*pages):
+    row = _nmea_table_rows([RMC, GGA, GSA, *pages])
+    assert row is not None
+    return list(row[1])
+
+def test_gsv_pages_in_sequence():
+    assert satellites_of(gsv(1, 3, 1, 2, 3, 4), gsv(2, 3, 5, 6, 7, 8), gsv(3, 3, 9)) == list(range(1, 10))
+    assert _nmea_table_rows([RMC, GGA, GSA, gsv(1, 1, 26)])[1] == {26: (26.0, 260.0, 40.0)}
+
+def test_gsv_pages_out_of_order(capsys):
+    # Page 3 before page 2 is skipped; page 2 still follows page 1
+    assert satellites_of(gsv(1, 3, 1, 2, 3, 4), gsv(3, 3, 9), gsv(2, 3, 5, 6, 7, 8)) == list(range(1, 9))
+    assert "Skipping out of sequence GSV page 3/3" in capsys.readouterr().out
+    # A page 1 starts the sequence over
+    assert satellites_of(gsv(1, 2, 1, 2), gsv(2, 2, 3), gsv(1, 2, 4, 5), gsv(2, 2, 6)) == [4, 5, 6]
+
+def test_gsv_pages_missing(capsys):
+    # Nothing after a missing page is used
+    assert satellites_of(gsv(1, 3, 1, 2, 3, 4), gsv(3, 3, 9)) == [1, 2, 3, 4]
+    # Without page 1 no page is in sequence
+    assert satellites_of(gsv(2, 3, 5, 6, 7, 8), gsv(3, 3, 9)) == []
+    assert capsys.readouterr().out.count("Skipping out of sequence") == 3
+
+def test_gsv_without_rmc(tmp_path):
+    """Satellites listed before an epoch's $GPRMC do not belong to any epoch"""
+    sentences = [gsv(1, 2, 1, 2), gsv(2, 2, 3),                   # Before the first $GPRMC
+                 RMC, GGA, GSA, gsv(1, 1, 26),
+                 RMC.replace(',A,', ',V,', 1), GGA, gsv(1, 1, 5),  # No valid fix
+                 RMC.replace('024224.19', '024224.29'), GGA, GSA, gsv(2, 2, 29)]
+    path = tmp_path / "nmea_pvt.nmea"
+    path.write_bytes(b"".join(b"%s*%02X\r\n" % (s.encode(), nmea_checksum(s[1:].encode())) for s in sentences))
+
+    epochs, satellites = read_nmea_tables(str(path))
+    assert len(epochs) == 2
+    assert satellites['epoch'].tolist() == [0] and satellites['prn'].tolist() == [26]
+    np.testing.assert_allclose(np.diff(epochs['time']), 0.1, rtol=0, atol=1e-6)
+
+def assert_strptime(date_str, time_str):
+    timestamp, seconds = nmea_time(date_str, time_str)
+    expected = datetime.strptime(date_str + time_str, "%d%m%y%H%M%S.%f")
+    assert timestamp == expected
+    assert seconds == to_seconds(expected) + leap_seconds(expected)
+
+def test_nmea_time_matches_strptime():
+    rng = np.random.default_rng(14)
+    start = datetime(1999, 1, 1)
+    for days, microseconds, digits in zip(rng.integers(0, 10000, 500), rng.integers(0, 86400 * 10**6, 500),
+                                          rng.integers(1, 7, 500)):
+        t = start + timedelta(days=int(days), microseconds=int(microseconds))
+        assert_strptime(t.strftime("%d%m%y"), t.strftime("%H%M%S.%f")[:7 + digits])
+
+@pytest.mark.parametrize('before, after', [
+    (('311224', '235959.95'), ('010125', '000000.05')),  # Date and year rollover
+    (('311216', '235959.90'), ('010117', '000000.00')),  # Leap second 2016-12-31
+    (('300615', '235959.99'), ('010715', '000000.00')),  # Leap second 2015-06-30
+])
+def test_nmea_time_across_midnight(before, after):
+    assert_strptime(*before)
+    assert_strptime(*after)
+    leap = leap_seconds(nmea_time(*after)[0]) - leap_seconds(nmea_time(*before)[0])
+    utc_step = (nmea_time(*after)[0] - nmea_time(*before)[0]).total_seconds()
+    assert nmea_time(*after)[1] - nmea_time(*before)[1] == pytest.approx(utc_step + leap, abs=1e-6)
+
+@pytest.mark.parametrize('date_str, time_str', [
+    ('271224', '240000.00'), ('271224', '026000.00'), ('271224', '024360.00'),
+    ('271224', '024355'), ('271224', '02435a.00'), ('271224', '024355.1234567'),
+    ('321224', '024355.49'), ('271324', '024355.49'),
+])
+def test_nmea_time_rejects_invalid_fields(date_str, time_str):
+    with pytest.raises(ValueError):
+        datetime.strptime(date_str + time_str, "%d%m%y%H%M%S.%f")
+    with pytest.raises(ValueError):
+        nmea_time(date_str, time_str)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import pytest
+from conftest import SAMPLE_DIR
+from nmea import nmea_checksum, parse_nmea_data
+from nmea_live import MAX_LINE_LENGTH, _read_epochs, ingest_nmea, serve_nmea_replay
+
+@pytest.fixture(scope='module')
+def nmea_lines():
+    with open(os.path.join(SAMPLE_DIR, '12_27_ant1', 'nmea_pvt.nmea'), 'rb') as f:
+        return f.readlines()[:2000]
+
+def nmea_file(tmp_path, lines):
+    path = tmp_path / "nmea_pvt.nmea"
+    path.write_bytes(b"".join(lines))
+    return str(path)
+
+async def collect(queue, delay=0):
+    """Epochs from the queue until the None that ends the source"""
+    epochs = []
+    while (data := await queue.get()) is not None:
+        epochs.append(data)
+        await asyncio.sleep(delay)
+    return epochs
+
+def test_replay_round_trip(tmp_path, nmea_lines):
+    path = nmea_file(tmp_path, nmea_lines)
+
+    async def run():
+        server = await serve_nmea_replay(path, speed=1e6)
+        port = server.sockets[0].getsockname()[1]
+        # A slow consumer and a queue of two epochs: reading is held back, nothing is lost
+        queue = asyncio.Queue(maxsize=2)
+        async with server:
+            ingest = asyncio.create_task(ingest_nmea(f"127.0.0.1:{port}", queue, max_latency=0.5))
+            epochs = await collect(queue, delay=0.0005)
+            await ingest
+        return epochs
+
+    expected = parse_nmea_data(path)
+    assert len(expected) > 400
+    assert asyncio.run(run()) == expected
+
+def test_max_latency_flush(tmp_path, nmea_lines):
+    """A group without its $GPGSV is handed on after max_latency, while the source stays open"""
+    async def run():
+        close = asyncio.Event()
+
+        async def incomplete_epoch(reader, writer):
+            writer.write(b"".join(nmea_lines[:3]))  # $GPRMC, $GPGGA, $GPGSA
+            await writer.drain()
+            await close.wait()
+            writer.close()
+
+        server = await asyncio.start_server(incomplete_epoch, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        queue = asyncio.Queue()
+        async with server:
+            ingest = asyncio.create_task(ingest_nmea(f"127.0.0.1:{port}", queue, max_latency=0.1))
+            data = await asyncio.wait_for(queue.get(), 5)
+            assert not close.is_set()
+            close.set()
+            assert await asyncio.wait_for(queue.get(), 5) is None
+            await ingest
+        return data
+
+    assert [asyncio.run(run())] == parse_nmea_data(nmea_file(tmp_path, nmea_lines[:3]))
+
+def over_long_stream(nmea_lines):
+    """Four epochs, the second with an over-long line after its $GPGGA"""
+    body = b"$GPGSV," + b"9" * (MAX_LINE_LENGTH + 1000)
+    long_line = b"%s*%02X\r\n" % (body, nmea_checksum(body[1:]))
+    return b"".join(nmea_lines[:6]) + long_line + b"".join(nmea_lines[6:16])
+
+@pytest.mark.parametrize('chunk', [None, 100], ids=['whole', 'chunked'])
+def test_over_long_line(tmp_path, nmea_lines, chunk, capsys):
+    """readline recovers after an over-long line; only the epoch it was part of is dropped"""
+    data = over_long_stream(nmea_lines)
+
+    async def run():
+        reader = asyncio.StreamReader(limit=MAX_LINE_LENGTH)
+        queue = asyncio.Queue()
+
+        async def feed():
+            # In chunks the limit is hit before the end of the line has arrived
+            step = chunk or len(data)
+            for start in range(0, len(data), step):
+                reader.feed_data(data[start:start + step])
+                await asyncio.sleep(0)
+            reader.feed_eof()
+
+        feeder = asyncio.create_task(feed())
+        await _read_epochs(reader, queue, max_latency=5)
+        await feeder
+        queue.put_nowait(None)
+        return await collect(queue)
+
+    expected = parse_nmea_data(nmea_file(tmp_path, nmea_lines[:16]))
+    assert asyncio.run(run()) == [expected[0]] + expected[2:]
+    assert "Skipping over-long NMEA line" in capsys.readouterr().out
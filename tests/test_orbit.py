@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pytest
+from conftest import SAMPLE_DIR
+import tools
+from ephemeris import EphemerisStore
+from orbit import compute_satellite_positions
+
+# Offsets (s) from toe: at and right around it, and over the fit interval
+OFFSETS = np.array([0, 1e-3, -1e-3, 0.5, -0.5, 1, -1, 30, -30, 900, -900, 3600, -3600, 7200, -7200])
+
+@pytest.fixture(scope='module')
+def records():
+    store = EphemerisStore()
+    store.load_data(os.path.join(SAMPLE_DIR, 'brdc3620.24n'))
+    return [store.ephemeris(record) for prn in store.prns for record in store.records(prn)]
+
+def assert_parity(records, times):
+    """Array and scalar positions of every record at its times agree to 1 mm"""
+    eph_params = {name: np.repeat([eph[name] for eph in records], len(times[0])) for name in records[0]
+                  if name != 'epoch'}
+    positions = compute_satellite_positions(eph_params, np.concatenate(times))
+    expected = [tools.compute_satellite_position(eph, float(time))
+                for eph, record_times in zip(records, times) for time in record_times]
+    np.testing.assert_allclose(positions, expected, rtol=0, atol=1e-3)
+
+def test_positions_match_scalar(records):
+    assert len({eph['epoch'] for eph in records}) > 1
+    assert_parity(records, [eph['toe'] + OFFSETS for eph in records])
+
+@pytest.mark.parametrize('toe', [604800 - 1800, 1800], ids=['toe-at-week-end', 'toe-at-week-start'])
+def test_positions_match_scalar_across_week_crossing(records, toe):
+    """Time of week wraps around between toe and the time"""
+    shifted = [{**eph, 'toe': float(toe)} for eph in records]
+    times = [(toe + OFFSETS) % 604800 for _ in shifted]
+    assert any((record_times < 302400).any() and (record_times > 302400).any() for record_times in times)
+    assert_parity(shifted, times)
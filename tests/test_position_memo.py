@@ -0,0 +1,34 @@
+import numpy as np
+import position_memo
+from position_memo import PositionMemo
+
+def keys(memo, n, offset=0):
+    times = 1.4e9 + np.arange(offset, offset + n, dtype=np.float64)
+    return memo.keys('G05', np.full(n, 17), np.full(n, 12345, dtype=np.uint64), times)
+
+def test_no_process_memo_by_default():
+    assert position_memo.process_memo() is None
+
+def test_lookup_store():
+    memo = PositionMemo(slots=1024)
+    positions, found = memo.lookup(keys(memo, 10))
+    assert not found.any() and memo.table is None  # Allocated on the first store
+
+    stored = np.arange(30, dtype=np.float64).reshape(10, 3)
+    memo.store(keys(memo, 10), stored)
+    positions, found = memo.lookup(keys(memo, 20))
+    assert found.tolist() == [True] * 10 + [False] * 10
+    np.testing.assert_array_equal(positions[:10], stored)
+    assert (memo.hits, memo.misses, memo.entries()) == (10, 20, 10)
+
+def test_full_memo_is_no_longer_used(capsys):
+    memo = PositionMemo(slots=64)
+    memo.store(keys(memo, 100), np.zeros((100, 3)))
+    assert memo.full and memo.entries() == 64
+    assert "Position memo full" in capsys.readouterr().out
+
+    # Lookups no longer probe the table, stores are dropped
+    _, found = memo.lookup(keys(memo, 10))
+    assert not found.any()
+    memo.store(keys(memo, 10, offset=1000), np.zeros((10, 3)))
+    assert memo.entries() == 64 and "(full)" in memo.summary()
@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import pytest
+import main
+from conftest import SAMPLE_DIR
+from main import process_antenna
+from nmea import read_nmea_tables
+
+ANTENNA_DIR = os.path.join(SAMPLE_DIR, '12_27_ant1')
+EPHEMERIS = os.path.join(SAMPLE_DIR, 'brdc3620.24n')
+OBSERVATIONS = os.path.join(ANTENNA_DIR, 'GSDR362l07.24O')
+
+def run(nmea_file, output_file, cache_dir, resume=False, observations=OBSERVATIONS):
+    return process_antenna(nmea_file, observations, EPHEMERIS, str(output_file),
+                           cache_dir=str(cache_dir), resume=resume)
+
+def write_cut(path, source, cut):
+    """Copy the first cut bytes of source to path; returns all of source"""
+    with open(source, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:cut])
+    return data
+
+def assert_same_output(output_file, nmea_file, tmp_path, observations=OBSERVATIONS):
+    """output_file is what a run on the complete inputs writes"""
+    os.makedirs(tmp_path / 'full')
+    full_file = tmp_path / 'full' / 'ant1.csv'
+    run(nmea_file, full_file, tmp_path / 'cache', observations=observations)
+    with open(output_file, 'rb') as resumed, open(full_file, 'rb') as full:
+        assert resumed.read() == full.read()
+
+@pytest.mark.parametrize('cut', [300000, 300100, 450000])
+def test_resume_growing_nmea(tmp_path, cut):
+    """A run on a partly written NMEA file, resumed once it is complete, gives the full output"""
+    nmea_file = str(tmp_path / 'nmea_pvt.nmea')
+    data = write_cut(nmea_file, os.path.join(ANTENNA_DIR, 'nmea_pvt.nmea'), cut)  # Cut within a $GPRMC group
+    os.makedirs(tmp_path / 'out')
+    run(nmea_file, tmp_path / 'out' / 'ant1.csv', tmp_path / 'cache')
+
+    with open(nmea_file, 'ab') as f:
+        f.write(data[cut:])
+    summary = run(nmea_file, tmp_path / 'out' / 'ant1.csv', tmp_path / 'cache', resume=True)
+    assert summary['new_epochs'] < summary['epochs']
+    assert_same_output(tmp_path / 'out' / 'ant1.csv', nmea_file, tmp_path)
+
+@pytest.mark.parametrize('cut', [0.3, 0.7])
+def test_resume_growing_rinex(tmp_path, cut):
+    """Rows past the end of a partly written RINEX file are written again once it has their epochs"""
+    observations = str(tmp_path / 'GSDR362l07.24O')
+    data = write_cut(observations, OBSERVATIONS, int(cut * os.path.getsize(OBSERVATIONS)))
+    nmea_file = os.path.join(ANTENNA_DIR, 'nmea_pvt.nmea')
+    output_file = tmp_path / 'ant1.csv'
+    first = run(nmea_file, output_file, tmp_path / 'cache', observations=observations)
+
+    with open(observations, 'wb') as f:
+        f.write(data)
+    summary = run(nmea_file, output_file, tmp_path / 'cache', resume=True, observations=observations)
+    assert 0 < summary['new_epochs'] < summary['epochs'] == first['epochs']
+    assert_same_output(output_file, nmea_file, tmp_path, observations)
+
+def test_resume_input_grows_while_read(tmp_path, monkeypatch):
+    """The checkpoint records the bytes that were parsed, not what the file has grown to since"""
+    cut = 300100
+    nmea_file = str(tmp_path / 'nmea_pvt.nmea')
+    data = write_cut(nmea_file, os.path.join(ANTENNA_DIR, 'nmea_pvt.nmea'), cut)
+    cut_epochs = len(read_nmea_tables(nmea_file)[0])
+
+    def growing_read_nmea_tables(*args, **kwargs):
+        with open(nmea_file, 'ab') as f:
+            f.write(data[cut:])  # The receiver writes on while the file is parsed
+        return read_nmea_tables(*args, **kwargs)
+
+    monkeypatch.setattr(main, 'read_nmea_tables', growing_read_nmea_tables)
+    os.makedirs(tmp_path / 'out')
+    output_file = tmp_path / 'out' / 'ant1.csv'
+    summary = run(nmea_file, output_file, tmp_path / 'cache')
+    monkeypatch.undo()
+    assert summary['epochs'] == cut_epochs
+    with open(tmp_path / 'out' / 'ant1.checkpoint.json') as f:
+        assert json.load(f)['inputs']['nmea']['size'] == cut
+
+    summary = run(nmea_file, output_file, tmp_path / 'cache', resume=True)
+    assert summary['epochs'] > cut_epochs
+    assert_same_output(output_file, nmea_file, tmp_path)
+
+def test_resume_up_to_date(tmp_path):
+    nmea_file = os.path.join(ANTENNA_DIR, 'nmea_pvt.nmea')
+    first = run(nmea_file, tmp_path / 'ant1.csv', tmp_path / 'cache')
+    with open(tmp_path / 'ant1.csv', 'rb') as f:
+        written = f.read()
+    again = run(nmea_file, tmp_path / 'ant1.csv', tmp_path / 'cache', resume=True)
+    assert (again['epochs'], again['new_epochs'], again['rows']) == (first['epochs'], 0, first['rows'])
+    with open(tmp_path / 'ant1.csv', 'rb') as f:
+        assert f.read() == written
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from ephemeris import from_seconds
+from tools import RinexCache
+
+START = 1419302544.0  # 2024-12-27 02:42:24 in GPS seconds
+# 1 Hz epochs with a gap of 8 s
+EPOCHS = START + np.array([0, 1, 2, 10, 11], dtype=np.float64)
+
+def cache(max_gap=None):
+    rinex_cache = RinexCache(max_gap=max_gap)
+    rinex_cache.epochs = EPOCHS
+    return rinex_cache
+
+# Format: (offset from START, nearest epoch offset without max_gap, with max_gap=2)
+CASES = [
+    (0, 0, 0), (1, 1, 1), (11, 11, 11),    # Exact hits
+    (0.4, 0, 0), (0.6, 1, 1),
+    (1.5, 1, 1), (6, 2, None),             # Ties: the earlier epoch wins
+    (4, 2, 2), (4.5, 2, None), (8, 10, 10),  # In the gap
+    (-2, 0, 0), (-3, 0, None),             # Before the first epoch
+    (13, 11, 11), (100, 11, None),         # After the last epoch
+]
+
+@pytest.mark.parametrize('offset, expected, expected_with_gap', CASES)
+def test_nearest(offset, expected, expected_with_gap):
+    time = START + offset
+    assert cache().nearest(from_seconds(time)) == START + expected
+    found = cache(max_gap=2).nearest(from_seconds(time))
+    assert found == (None if expected_with_gap is None else START + expected_with_gap)
+
+def test_nearest_epochs_matches_nearest():
+    offsets = np.array([offset for offset, _, _ in CASES])
+    for max_gap in (None, 2):
+        nearest = cache(max_gap).nearest_epochs(START + offsets)
+        expected = [cache(max_gap).nearest(from_seconds(START + offset)) for offset in offsets]
+        np.testing.assert_array_equal(nearest, [np.nan if e is None else e for e in expected])
+
+def test_bracketing():
+    rinex_cache = cache()
+    for offset, before, after in ((0, 0, 1), (1.5, 1, 2), (2, 2, 10), (5, 2, 10), (10, 10, 11)):
+        assert rinex_cache.bracketing(from_seconds(START + offset)) == (START + before, START + after)
+    assert rinex_cache.bracketing(from_seconds(START - 1)) == (None, START)
+    assert rinex_cache.bracketing(from_seconds(START + 11)) == (START + 11, None)
+
+def test_empty_cache():
+    rinex_cache = RinexCache(max_gap=2)
+    assert rinex_cache.nearest(from_seconds(START)) is None
+    assert np.isnan(rinex_cache.nearest_epochs([START, START + 1])).all()
+    assert rinex_cache.bracketing(from_seconds(START)) == (None, None)
@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pytest
+from table_io import append_table, read_table, remove_table, table_columns, truncate_table
+
+def block(start, stop):
+    return {'Timestamp': np.datetime64('2024-12-27T02:42:24', 'us') + np.arange(start, stop).astype('timedelta64[s]'),
+            'PRN': np.array([f"G{i % 32 + 1:02d}" for i in range(start, stop)]),
+            'Carrier_Phase(cycles)': np.arange(start, stop) * 0.25}
+
+def formats():
+    yield 'csv'
+    yield 'npz'
+    for extension, module in (('parquet', 'pyarrow'), ('h5', 'h5py')):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        yield extension
+
+@pytest.mark.parametrize('extension', list(formats()))
+def test_append_truncate(tmp_path, extension):
+    path = str(tmp_path / f"table.{extension}")
+    for start, stop in ((0, 5), (5, 5), (5, 12), (12, 20)):
+        append_table(path, block(start, stop))
+    assert table_columns(path) == list(block(0, 0))
+
+    expected = block(0, 20)
+    table = read_table(path)
+    for name, values in expected.items():
+        np.testing.assert_array_equal(table[name], values)
+    np.testing.assert_array_equal(read_table(path, ['PRN'])['PRN'], expected['PRN'])
+
+    truncate_table(path, 8)
+    append_table(path, block(8, 10))
+    np.testing.assert_array_equal(read_table(path)['Carrier_Phase(cycles)'], np.arange(10) * 0.25)
+
+    truncate_table(path, 0)
+    assert len(read_table(path)['PRN']) == 0
+    remove_table(path)
+    assert not os.path.exists(path)
+
+def test_appended_parts(tmp_path):
+    path = str(tmp_path / "table.npz")
+    for start in range(0, 30, 10):
+        append_table(path, block(start, start + 10))
+    # Each append writes one part; earlier parts are not rewritten
+    assert sorted(os.listdir(path)) == ['part-000000.npz', 'part-000001.npz', 'part-000002.npz']
+    truncate_table(path, 15)
+    assert sorted(os.listdir(path)) == ['part-000000.npz', 'part-000001.npz']
+    assert len(read_table(path)['PRN']) == 15
+
+def test_fixed_size_hdf5_is_not_rewritten(tmp_path):
+    h5py = pytest.importorskip('h5py')
+    path = str(tmp_path / "table.h5")
+    with h5py.File(path, 'w') as f:
+        f.attrs['columns'] = ['PRN']
+        f.create_dataset('PRN', data=np.array([b'G01', b'G02']))
+    with pytest.raises(ValueError):
+        append_table(path, {'PRN': np.array(['G03'])})
+    with pytest.raises(ValueError):
+        truncate_table(path, 1)
+    assert read_table(path)['PRN'].tolist() == ['G01', 'G02']
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+import numpy as np
+from ephemeris import GPS_UTC_LEAP_SECONDS, from_seconds, leap_seconds, seconds_to_utc, to_seconds, utc_to_seconds
+from nmea import nmea_time
+
+def test_nmea_time_is_gps_time():
+    timestamp, seconds = nmea_time('271224', '024355.49')
+    assert timestamp == datetime(2024, 12, 27, 2, 43, 55, 490000)
+    assert seconds == to_seconds(timestamp) + GPS_UTC_LEAP_SECONDS
+    assert seconds == utc_to_seconds(timestamp)
+
+def test_leap_seconds():
+    assert leap_seconds(datetime(1980, 1, 6)) == 0
+    assert leap_seconds(datetime(2016, 12, 31, 23, 59, 59)) == 17
+    assert leap_seconds(datetime(2017, 1, 1)) == 18
+
+def test_seconds_to_utc_inverts_utc_to_seconds():
+    utc = [datetime(1985, 3, 1), datetime(2016, 12, 31, 23, 59, 59), datetime(2017, 1, 1), datetime(2024, 12, 27, 2, 43)]
+    seconds = np.array([utc_to_seconds(t) for t in utc])
+    assert [from_seconds(t) for t in seconds_to_utc(seconds)] == utc
+
+def test_leap_second_boundary_round_trip():
+    """2016-12-31T23:59:59 to 2017-01-01 UTC: GPS time runs on through the inserted leap second"""
+    before = datetime(2016, 12, 31, 23, 59, 59)
+    after = datetime(2017, 1, 1)
+    assert utc_to_seconds(after) - utc_to_seconds(before) == 2  # 23:59:60 in between
+
+    utc = [before - timedelta(seconds=1.5), before, before + timedelta(seconds=0.9), after,
+           after + timedelta(seconds=0.1), after + timedelta(seconds=1)]
+    seconds = np.array([utc_to_seconds(t) for t in utc])
+    assert [from_seconds(t) for t in seconds_to_utc(seconds)] == utc
+
+    for t, gps in zip(utc, seconds):
+        timestamp, nmea_seconds = nmea_time(t.strftime("%d%m%y"), t.strftime("%H%M%S.%f"))
+        assert timestamp == t and nmea_seconds == gps